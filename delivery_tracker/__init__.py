@@ -0,0 +1 @@
+default_app_config = 'delivery_tracker.apps.DeliveryTrackerConfig'
@@ -1,3 +1,164 @@
-from django.contrib import admin
+from django.conf.urls import url
+from django.contrib import admin, messages
+from django.shortcuts import redirect, render
+from django.utils import timezone
 
-# Register your models here.
+from delivery_tracker.exports import csv_response, export_rows
+from delivery_tracker.forms import ProductImportUploadForm
+from delivery_tracker.importers import guess_format, import_products
+from delivery_tracker.models import (
+    ArchivedPurchaseOrder, ArchivedPurchaseOrderStatusChange, ArchivedProduct,
+    PurchaseOrder, PurchaseOrderStatus, PurchaseOrderStatusChange, Product
+)
+from delivery_tracker.search import SEARCH_FIELDS, filter_ids
+from delivery_tracker.transitions import transition_orders
+
+
+def export_orders_csv(modeladmin, request, queryset):
+    filename = 'orders-%s.csv' % timezone.now().strftime('%Y%m%d-%H%M%S')
+    return csv_response(export_rows(queryset), filename)
+export_orders_csv.short_description = 'Export selected orders with products'
+
+
+def transition_action(to_code):
+    def action(modeladmin, request, queryset):
+        result = transition_orders(queryset, to_code, changed_by=request.user)
+        modeladmin.message_user(
+            request, 'Moved to %s: %d, not allowed from their status: %d' %
+            (to_code, result.moved, result.skipped))
+    action.__name__ = 'move_to_%s' % to_code
+    action.short_description = 'Move selected orders to %s' % (
+        to_code.replace('_', ' '), )
+    return action
+
+
+TRANSITION_TARGETS = [
+    PurchaseOrderStatus.REQUESTED,
+    PurchaseOrderStatus.AWAITING_PAYMENT,
+    PurchaseOrderStatus.IN_PROGRESS,
+    PurchaseOrderStatus.AWAITING_DELIVERY,
+    PurchaseOrderStatus.PARTIALLY_RECEIVED,
+    PurchaseOrderStatus.RECEIVED,
+    PurchaseOrderStatus.CANCELLED,
+]
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'shipping_cost_cents', 'coupon')
+    list_filter = ('status', )
+    list_select_related = ('user', 'status')
+    raw_id_fields = ('user', )
+    search_fields = SEARCH_FIELDS
+    actions = [export_orders_csv] + [transition_action(code)
+                                     for code in TRANSITION_TARGETS]
+
+    def get_search_results(self, request, queryset, search_term):
+        # orders containing a matching product
+        if not search_term:
+            return queryset, False
+        products = filter_ids(Product.objects.all(), search_term)
+        return queryset.filter(
+            id__in=products.values('purchase_order_id')), False
+
+
+@admin.register(PurchaseOrderStatusChange)
+class PurchaseOrderStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('created_date', 'purchase_order', 'from_status',
+                    'to_status', 'changed_by', 'comment')
+    list_select_related = ('from_status', 'to_status', 'changed_by')
+    raw_id_fields = ('purchase_order', 'changed_by')
+    date_hierarchy = 'created_date'
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'purchase_order', 'name', 'vendor_code',
+                    'quantity', 'price_cents')
+    list_select_related = ('user', )
+    raw_id_fields = ('user', 'purchase_order')
+    search_fields = SEARCH_FIELDS
+    change_list_template = 'admin/delivery_tracker/product/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            url(r'^import/$', self.admin_site.admin_view(self.import_view),
+                name='delivery_tracker_product_import'),
+        ]
+        return urls + super(ProductAdmin, self).get_urls()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_ids(queryset, search_term), False
+
+    def import_view(self, request):
+        if request.method == 'POST':
+            form = ProductImportUploadForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                result = import_products(
+                    upload.file,
+                    guess_format(upload.name),
+                    form.user,
+                    purchase_order=form.purchase_order,
+                    new_order=form.cleaned_data['new_order'],
+                    chunk_size=form.cleaned_data['chunk_size'],
+                )
+                for line_no, errors in result.errors:
+                    for field, field_errors in sorted(errors.items()):
+                        messages.warning(request, 'Line %d: %s: %s' % (
+                            line_no, field, ' '.join(field_errors)))
+                messages.info(request, 'Imported: %d, rejected: %d' %
+                              (result.created, result.error_count))
+                return redirect('admin:delivery_tracker_product_changelist')
+        else:
+            form = ProductImportUploadForm()
+
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            form=form,
+            title='Import products',
+        )
+        return render(request, 'admin/delivery_tracker/product/import.html',
+                      context)
+
+
+class ReadOnlyMixin(object):
+    """Archived rows are only moved by delivery_tracker.archive."""
+
+    def get_readonly_fields(self, request, obj=None):
+        return [f.name for f in self.model._meta.fields]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ArchivedProductInline(ReadOnlyMixin, admin.TabularInline):
+    model = ArchivedProduct
+    fields = ('name', 'vendor_code', 'product_link', 'color', 'size',
+              'quantity', 'price_cents')
+    extra = 0
+
+
+class ArchivedStatusChangeInline(ReadOnlyMixin, admin.TabularInline):
+    model = ArchivedPurchaseOrderStatusChange
+    fk_name = 'purchase_order'
+    extra = 0
+
+
+@admin.register(ArchivedPurchaseOrder)
+class ArchivedPurchaseOrderAdmin(ReadOnlyMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'shipping_cost_cents',
+                    'status_changed_date', 'archived_date')
+    list_filter = ('status', )
+    list_select_related = ('user', 'status')
+    search_fields = ('=id', 'user__username', 'product_set__name',
+                     'product_set__vendor_code')
+    date_hierarchy = 'archived_date'
+    inlines = [ArchivedProductInline, ArchivedStatusChangeInline]
+    actions = None
@@ -0,0 +1,167 @@
+"""
+Read-only JSON API of the cabinet under ``/tracker/api/``.
+
+Every response carries a weak ETag and a Last-Modified date built from the
+user's cache version (see delivery_tracker.caching), which changes with
+every change to the user's orders, products or profile. A request whose
+If-None-Match (or, without it, If-Modified-Since) still matches is answered
+with 304 before the view runs. The user id comes from the session and the
+version from the cache, so a 304 costs at most the session read (none with
+'cached_db' sessions). The cache must be shared by all workers (check
+delivery_tracker.E001), or a version bumped in one worker would go
+unnoticed in the others.
+"""
+from functools import wraps
+
+from django.contrib.auth import SESSION_KEY
+from django.http import (
+    HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse
+)
+from django.utils.http import http_date, parse_http_date_safe
+
+from delivery_tracker import statuses
+from delivery_tracker.archive import order_page
+from delivery_tracker.caching import get_user_version
+from delivery_tracker.models import ArchivedPurchaseOrder, UserOrderSummary
+from delivery_tracker.summary import cached_cabinet_counters
+
+
+PRODUCT_FIELDS = ('id', 'product_link', 'shop_link', 'vendor_code', 'name',
+                  'color', 'size', 'quantity', 'price_cents', 'note')
+
+
+def session_user_id(request):
+    try:
+        return int(request.session[SESSION_KEY])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def user_etag(resource, user_id, version):
+    return 'W/"%s-%d-%d"' % (resource, user_id, version)
+
+
+def etag_matches(header, etag):
+    """Weak comparison against an If-None-Match header."""
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:]
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(request, etag, version):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    since = parse_http_date_safe(
+        request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    # HTTP dates have whole seconds, versions milliseconds
+    return since is not None and version // 1000 <= since
+
+
+def user_versioned(resource):
+    """
+    Serve a GET view of the logged in user's data conditionally on the
+    user's version. The version is read before the view runs: a change
+    made meanwhile only makes the next request miss.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return HttpResponseNotAllowed(['GET', 'HEAD'])
+            user_id = session_user_id(request)
+            if user_id is None:
+                return JsonResponse({'error': 'Authentication required'},
+                                    status=401)
+            version = get_user_version(user_id)
+            etag = user_etag(resource, user_id, version)
+            if not_modified(request, etag, version):
+                response = HttpResponseNotModified()
+            elif not request.user.is_authenticated():
+                # the session is stale, e.g. the password was changed
+                return JsonResponse({'error': 'Authentication required'},
+                                    status=401)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(version // 1000)
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+@user_versioned('profile')
+def profile(request):
+    user = request.user
+    return JsonResponse({
+        'id': user.pk,
+        'email': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'date_joined': user.date_joined.isoformat(),
+    })
+
+
+@user_versioned('order-summary')
+def order_summary(request):
+    by_status = []
+    for row in (UserOrderSummary.objects.filter(user=request.user)
+                .order_by('status_id')):
+        by_status.append({
+            'status': statuses.by_id(row.status_id).code,
+            'order_count': row.order_count,
+            'total_cents': row.total_cents,
+        })
+    return JsonResponse({
+        'counters': [
+            {'label': label, 'order_count': count, 'total_cents': total}
+            for label, count, total in cached_cabinet_counters(request.user)
+        ],
+        'statuses': by_status,
+    })
+
+
+@user_versioned('orders')
+def order_list(request):
+    status = request.GET.get('status', '')
+    status_id = None
+    if status:
+        try:
+            status_id = statuses.id_for(status)
+        except KeyError:
+            return JsonResponse({'error': 'Unknown status'}, status=400)
+    after = request.GET.get('after', '')
+    page, next_after = order_page(
+        request.user,
+        status_id=status_id,
+        after=int(after) if after.isdigit() else None,
+        include_archived=request.GET.get('archived') == '1',
+    )
+    return JsonResponse({
+        'orders': [{
+            'id': order.pk,
+            'status': statuses.by_id(order.status_id).code,
+            'shipping_cost_cents': order.shipping_cost_cents,
+            'shipping_zone': order.shipping_zone,
+            'weight_grams': order.weight_grams,
+            'coupon': order.coupon,
+            'user_comment': order.user_comment,
+            'archived': isinstance(order, ArchivedPurchaseOrder),
+            'products': [
+                dict((field, getattr(product, field))
+                     for field in PRODUCT_FIELDS)
+                for product in order.product_set.all()
+            ],
+        } for order in page],
+        'next_after': next_after,
+    })
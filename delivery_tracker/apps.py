@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class DeliveryTrackerConfig(AppConfig):
     name = 'delivery_tracker'
+
+    def ready(self):
+        from delivery_tracker import checks, signals, sqlite  # noqa
+        from delivery_tracker.perf import install_template_timer
+        install_template_timer()
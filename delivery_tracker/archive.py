@@ -0,0 +1,152 @@
+"""
+Cold storage of finished orders.
+
+Customers hardly ever look at received or cancelled orders again, so
+``archive_orders`` moves the ones whose status has not changed for
+ORDER_ARCHIVE_AFTER_DAYS into ``purchase_order_archive``, together with
+their products and status history, keeping their ids. Every batch is
+copied with INSERT ... SELECT and deleted with plain DELETEs in one
+transaction, so no per-row signals run; the summaries of the owners are
+rebuilt afterwards. The hot tables then only grow with the orders in
+progress.
+
+Archived rows are read only. ``order_page`` merges them into the order
+history on request.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from delivery_tracker import statuses
+from delivery_tracker.models import (
+    ArchivedPurchaseOrder, ArchivedPurchaseOrderStatusChange, ArchivedProduct,
+    PurchaseOrder, PurchaseOrderStatus, PurchaseOrderStatusChange, Product
+)
+from delivery_tracker.summary import rebuild_summaries
+from delivery_tracker.utils import keyset_page
+
+
+ARCHIVED_STATUSES = (PurchaseOrderStatus.RECEIVED,
+                     PurchaseOrderStatus.CANCELLED)
+
+# (hot model, archive model, column holding the order id)
+ARCHIVED_TABLES = (
+    (PurchaseOrder, ArchivedPurchaseOrder, 'id'),
+    (Product, ArchivedProduct, 'purchase_order_id'),
+    (PurchaseOrderStatusChange, ArchivedPurchaseOrderStatusChange,
+     'purchase_order_id'),
+)
+
+
+def archivable_orders(days=None):
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    return PurchaseOrder.objects.filter(
+        status_id__in=statuses.ids_for(ARCHIVED_STATUSES),
+        status_changed_date__lt=cutoff,
+    )
+
+
+def _move_sql(model, archive_model, order_column, count):
+    """INSERT ... SELECT and DELETE of the rows of ``count`` orders."""
+    qn = connection.ops.quote_name
+    columns = [f.column for f in model._meta.concrete_fields]
+    placeholders = ', '.join(['%s'] * count)
+    extra_columns, extra_values = [], []
+    if archive_model is ArchivedPurchaseOrder:
+        extra_columns, extra_values = ['archived_date'], ['%s']
+    insert = 'INSERT INTO %s (%s) SELECT %s FROM %s WHERE %s IN (%s)' % (
+        qn(archive_model._meta.db_table),
+        ', '.join(qn(c) for c in columns + extra_columns),
+        ', '.join([qn(c) for c in columns] + extra_values),
+        qn(model._meta.db_table), qn(order_column), placeholders,
+    )
+    delete = 'DELETE FROM %s WHERE %s IN (%s)' % (
+        qn(model._meta.db_table), qn(order_column), placeholders)
+    return insert, delete
+
+
+def archive_batch(orders, order_ids, now=None):
+    """
+    Move those of the orders ``order_ids`` that are still in the archivable
+    queryset ``orders``, with their rows, in one transaction. Returns their
+    ``(id, user_id)``.
+    """
+    now = now or timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # the conditions are checked again and the rows locked inside the
+        # transaction: an order reopened since ``order_ids`` were picked
+        # stays, and so do its products and history. SQLite has no row
+        # locks, its write fails instead if another one committed since.
+        moved = list(orders.filter(id__in=order_ids).select_for_update()
+                     .values_list('id', 'user_id'))
+        moved_ids = [order_id for order_id, _ in moved]
+        if not moved_ids:
+            return []
+        for model, archive_model, order_column in ARCHIVED_TABLES:
+            insert, _ = _move_sql(model, archive_model, order_column,
+                                  len(moved_ids))
+            extra = [now] if archive_model is ArchivedPurchaseOrder else []
+            cursor.execute(insert, extra + moved_ids)
+        # children first, the orders last
+        for model, archive_model, order_column in reversed(ARCHIVED_TABLES):
+            _, delete = _move_sql(model, archive_model, order_column,
+                                  len(moved_ids))
+            cursor.execute(delete, moved_ids)
+    return moved
+
+
+def archive_orders(days=None, batch_size=None, limit=None):
+    """
+    Archive the finished orders older than ``days``, ``batch_size`` orders
+    per transaction and at most ``limit`` in total. Returns the number of
+    archived orders.
+    """
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    orders = archivable_orders(days)
+    now = timezone.now()
+    archived = 0
+    last_id = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size,
+                                                    limit - archived)
+        batch = list(orders.filter(id__gt=last_id).order_by('id')
+                     .values_list('id', flat=True)[:size])
+        if not batch:
+            break
+        moved = archive_batch(orders, batch, now)
+        if moved:
+            rebuild_summaries(sorted(set(user_id for _, user_id in moved)))
+        archived += len(moved)
+        last_id = batch[-1]
+    return archived
+
+
+def order_page(user, status_id=None, after=None, page_size=None,
+               include_archived=False):
+    """
+    ``keyset_page`` of the user's orders, newest first, with the archived
+    ones merged in when ``include_archived`` is set: each table is paged
+    on its own and the pages are merged. Ids are never reused, so both
+    tables share one keyset. Every order has ``product_set``.
+    """
+    page_size = page_size or settings.ORDERS_PAGE_SIZE
+    querysets = [PurchaseOrder.objects.filter(user=user)]
+    if include_archived:
+        querysets.append(ArchivedPurchaseOrder.objects.filter(user=user))
+    items = []
+    more = False
+    for queryset in querysets:
+        if status_id is not None:
+            queryset = queryset.filter(status_id=status_id)
+        page, next_after = keyset_page(
+            queryset.prefetch_related('product_set'), after, page_size)
+        items.extend(page)
+        more = more or next_after is not None
+    items.sort(key=lambda order: order.id, reverse=True)
+    if len(items) > page_size:
+        items = items[:page_size]
+        more = True
+    return items, items[-1].id if more else None
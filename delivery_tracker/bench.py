@@ -0,0 +1,254 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of an unsorted list of numbers."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = int(round(p / 100.0 * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """Milliseconds summary of a list of durations in seconds."""
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def timed(func, repeat):
+    """Call ``func(i)`` ``repeat`` times and return the durations."""
+    samples = []
+    for i in range(repeat):
+        start = time.time()
+        func(i)
+        samples.append(time.time() - start)
+    return samples
+
+
+def _fake_value(field, rnd):
+    internal_type = field.get_internal_type()
+    if field.null:
+        return None
+    if internal_type in ('IntegerField', 'SmallIntegerField',
+                         'PositiveIntegerField', 'BigIntegerField'):
+        return rnd.randint(1, 10)
+    if internal_type == 'FloatField':
+        return round(rnd.random() * 100, 2)
+    if internal_type == 'BooleanField':
+        return False
+    return ''
+
+
+def fake_rows(model, count, overrides=None, seed=0):
+    """
+    Return ``(columns, rows)`` for every concrete column of ``model`` but
+    the primary key, ``rows`` being a generator of ``count`` lists.
+    ``overrides`` maps a column name to a callable ``(index, random)``;
+    foreign keys need one.
+    """
+    overrides = overrides or {}
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+
+    def rows():
+        rnd = random.Random(seed)
+        for i in range(count):
+            yield [
+                overrides[f.column](i, rnd) if f.column in overrides
+                else _fake_value(f, rnd)
+                for f in fields
+            ]
+
+    return [f.column for f in fields], rows()
+
+
+def insert_sql(model, columns):
+    return 'INSERT INTO "%s" (%s) VALUES (%s)' % (
+        model._meta.db_table,
+        ', '.join('"%s"' % c for c in columns),
+        ', '.join('?' for _ in columns),
+    )
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run the block against a freshly migrated throwaway copy of the default
+    database, stored in a temporary file so that server threads share it.
+    """
+    from django.db import connection
+
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    connection.settings_dict['TEST']['NAME'] = path
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST']['NAME'] = old_test_name
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def seed_tracker_data(users, orders_per_user, products_per_order,
+                      inactive_users=0, password='secret123'):
+    """
+    Fill the current database with users, registration links, orders and
+    products through ``bulk_create``. Returns the created active users.
+    All users share one password hash so seeding does not spend minutes
+    in PBKDF2.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from delivery_tracker import statuses
+    from delivery_tracker.models import (
+        PurchaseOrder, Product, UserRegistrationLink
+    )
+    from delivery_tracker.summary import rebuild_summaries
+    from delivery_tracker.utils import link_hash
+
+    rnd = random.Random(0)
+    now = timezone.now()
+    password_hash = make_password(password)
+    status_ids = [s.pk for s in statuses.all_statuses()]
+
+    User.objects.bulk_create([
+        User(username='bench%d@example.com' % i, password=password_hash,
+             first_name='User %d' % i, is_active=i >= inactive_users,
+             date_joined=now)
+        for i in range(users + inactive_users)
+    ])
+    created = list(User.objects.filter(username__startswith='bench')
+                   .order_by('id'))
+    UserRegistrationLink.objects.bulk_create([
+        UserRegistrationLink(user=user, created_date=now,
+                             slug='bench%027d' % user.pk)
+        for user in created if not user.is_active
+    ])
+    active = [user for user in created if user.is_active]
+
+    PurchaseOrder.objects.bulk_create([
+        PurchaseOrder(user=user, status_id=rnd.choice(status_ids),
+                      shipping_cost_cents=rnd.randint(0, 5000))
+        for user in active for _ in range(orders_per_user)
+    ])
+    links = ['http://shop.example.com/item/%d' % j
+             for j in range(products_per_order)]
+    link_hashes = [link_hash(link) for link in links]
+    products = []
+    for order_id, user_id in PurchaseOrder.objects.values_list('id',
+                                                              'user_id'):
+        for j in range(products_per_order):
+            products.append(Product(
+                purchase_order_id=order_id, user_id=user_id,
+                product_link=links[j], link_hash=link_hashes[j],
+                name='Item %d' % j, quantity=rnd.randint(1, 3),
+                price_cents=rnd.randint(100, 20000),
+            ))
+            if len(products) >= 5000:
+                Product.objects.bulk_create(products)
+                products = []
+    Product.objects.bulk_create(products)
+    rebuild_summaries()
+    return active
+
+
+class StubShop(object):
+    """
+    A local stand-in for the shops: ``/item/<n>`` answers a product page
+    with schema.org markup after ``delay`` seconds. ``padding`` bytes of
+    markup precede the product data, and ``write_size`` splits the page
+    into separate writes like a large real page. Runs in a thread, use it
+    as a context manager. ``requests`` counts the pages served.
+    """
+
+    def __init__(self, delay=0.0, padding=0, write_size=None):
+        import threading
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+
+        shop = self
+        self.delay = delay
+        self.padding = padding
+        self.write_size = write_size
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                with shop._lock:
+                    shop.requests += 1
+                time.sleep(shop.delay)
+                number = self.path.rstrip('/').rsplit('/', 1)[-1]
+                if not self.path.startswith('/item/') or not number.isdigit():
+                    self.send_error(404)
+                    return
+                body = shop.page(int(number), shop.padding).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                size = shop.write_size or len(body)
+                for start in range(0, len(body), size):
+                    self.wfile.write(body[start:start + size])
+                    self.wfile.flush()
+                    if shop.write_size:
+                        time.sleep(0.001)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+            request_queue_size = 128
+
+            def handle_error(self, request, client_address):
+                # clients that timed out hang up before the page is written
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    HTTPServer.handle_error(self, request, client_address)
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @staticmethod
+    def page(number, padding=0):
+        return (
+            '<html><head><title>Shop - Item %(n)d</title></head><body>'
+            '<p>%(padding)s</p>'
+            '<div itemscope itemtype="http://schema.org/Product">'
+            '<h1 itemprop="name">Item %(n)d</h1>'
+            '<span itemprop="sku">SKU-%(n)05d</span>'
+            '<span itemprop="price" content="%(n)d.99">%(n)d,99 EUR</span>'
+            '</div></body></html>' % {'n': number, 'padding': 'x' * padding}
+        )
+
+    def url(self, number):
+        return 'http://127.0.0.1:%d/item/%d' % (self.server.server_address[1],
+                                                number)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,37 @@
+"""
+Per-user cache versions.
+
+Everything cached for a user (cabinet counters, API responses) includes the
+user's version in its key. Saving the user's orders, products or profile
+bumps the version, so stale entries are never read again and simply expire.
+
+Versions are millisecond timestamps: a version lost from the cache comes
+back newer than any entry built with it, and it doubles as the time of the
+user's last change.
+"""
+import time
+
+from django.core.cache import cache
+
+
+USER_VERSION_KEY = 'delivery_tracker:user_version:%d'
+
+
+def _now_version():
+    return int(time.time() * 1000)
+
+
+def get_user_version(user_id):
+    key = USER_VERSION_KEY % user_id
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    key = USER_VERSION_KEY % user_id
+    version = max(_now_version(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
+    return version
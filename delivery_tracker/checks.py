@@ -0,0 +1,30 @@
+"""
+System checks of the deployment settings.
+"""
+from django.conf import settings
+from django.core import checks
+
+
+# cache backends whose entries other processes can not see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The per-user versions of delivery_tracker.caching, on which the API
+    answers 304, and the status registry stamp must be seen by every
+    worker. DEBUG runs a single process and may keep them locally.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        'The default cache is local to the process (%s).' % backend,
+        hint='Use a cache shared by all workers, e.g. memcached, so that '
+             'version stamps bumped in one worker are seen by the others.',
+        id='delivery_tracker.E001',
+    )]
@@ -0,0 +1,40 @@
+"""
+Text and HTML bodies of the emails we send.
+
+Every email is a pair of templates, ``delivery_tracker/email/<name>.txt``
+and ``.html``. The pair is loaded and compiled on first use and kept for
+the life of the process (unless DEBUG, so that edits show up), then both
+parts are rendered with the same context.
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template.loader import get_template
+
+
+TEMPLATE_PATTERN = 'delivery_tracker/email/%s.%s'
+
+_compiled = {}
+
+
+def email_templates(name):
+    """``(text template, html template)`` of the email ``name``."""
+    pair = _compiled.get(name)
+    if pair is None:
+        pair = (get_template(TEMPLATE_PATTERN % (name, 'txt')),
+                get_template(TEMPLATE_PATTERN % (name, 'html')))
+        if not settings.DEBUG:
+            _compiled[name] = pair
+    return pair
+
+
+def render_email(name, context):
+    """``(text body, html body)`` of the email ``name``."""
+    text, html = email_templates(name)
+    return text.render(context), html.render(context)
+
+
+@receiver(setting_changed)
+def clear_compiled(setting, **kwargs):
+    if setting in ('TEMPLATES', 'DEBUG'):
+        _compiled.clear()
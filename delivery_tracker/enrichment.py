@@ -0,0 +1,365 @@
+"""
+Fills product names, vendor codes and prices from the shops' pages.
+
+The pages are fetched concurrently on an asyncio loop with plain
+``asyncio.open_connection`` streams: at most ``concurrency`` requests are
+in flight, requests to one host are spaced by ``host_interval`` seconds
+and every request is cut after ``timeout`` seconds. Responses are kept on
+disk under the canonical link, so a rerun only fetches new links. Every
+distinct link is fetched once however many products point at it, and
+the products are then updated with one UPDATE per link and field.
+
+Only empty fields are filled: a name or vendor code typed by the user and
+a non-zero price are kept.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import ssl
+import time
+from decimal import Decimal, InvalidOperation
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from delivery_tracker.caching import bump_user_version
+from delivery_tracker.models import Product
+from delivery_tracker.summary import rebuild_summaries
+from delivery_tracker.utils import canonical_link, to_cents
+
+
+MAX_REDIRECTS = 3
+MAX_BODY = 2 * 1024 * 1024
+
+
+class FetchError(Exception):
+    pass
+
+
+class EnrichmentResult(object):
+
+    def __init__(self):
+        self.links = 0
+        self.fetched = 0
+        self.cached = 0
+        self.failed = 0
+        self.updated = 0
+
+
+class ResponseCache(object):
+    """Page bodies in ``directory``, one JSON file per link."""
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, url):
+        path = self.path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)['body']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, url, body):
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'body': body}, f)
+        os.replace(tmp, path)
+
+
+class ProductPageParser(HTMLParser):
+    """
+    Picks the product data out of the usual markup: schema.org
+    ``itemprop`` attributes, Open Graph / product meta tags and the title.
+    """
+    META = {
+        'og:title': 'name',
+        'product:price:amount': 'price',
+        'og:price:amount': 'price',
+        'product:retailer_item_id': 'vendor_code',
+    }
+    ITEMPROPS = {'name': 'name', 'price': 'price', 'sku': 'vendor_code',
+                 'mpn': 'vendor_code'}
+
+    def __init__(self):
+        super(ProductPageParser, self).__init__(convert_charrefs=True)
+        self.found = {}
+        self.title = None
+        self._text_for = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        field = None
+        if tag == 'meta':
+            field = self.META.get(attrs.get('property') or attrs.get('name'))
+        if field is None:
+            field = self.ITEMPROPS.get(attrs.get('itemprop'))
+        if field is not None and field not in self.found:
+            if attrs.get('content'):
+                self.found[field] = attrs['content'].strip()
+            elif tag != 'meta':
+                self._text_for, self._text = field, []
+        elif tag == 'title' and self.title is None:
+            self._text_for, self._text = 'title', []
+
+    def handle_data(self, data):
+        if self._text_for is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if self._text_for is None:
+            return
+        text = ' '.join(''.join(self._text).split())
+        if self._text_for == 'title':
+            self.title = text
+        elif text:
+            self.found.setdefault(self._text_for, text)
+        self._text_for = None
+
+    def result(self):
+        data = dict(self.found)
+        if 'name' not in data and self.title:
+            data['name'] = self.title
+        return data
+
+
+def parse_price(text):
+    """``'1 299,90 EUR'`` -> 129990 cents, None if there is no number."""
+    match = re.search(r'\d[\d\s.,]*', text or '')
+    if not match:
+        return None
+    number = re.sub(r'\s', '', match.group()).rstrip('.,')
+    if ',' in number and '.' in number:
+        # the last separator is the decimal one
+        if number.rfind(',') > number.rfind('.'):
+            number = number.replace('.', '').replace(',', '.')
+        else:
+            number = number.replace(',', '')
+    elif ',' in number:
+        head, _, tail = number.rpartition(',')
+        number = ('%s.%s' % (head.replace(',', ''), tail) if len(tail) != 3
+                  else number.replace(',', ''))
+    try:
+        return to_cents(Decimal(number))
+    except InvalidOperation:
+        return None
+
+
+def parse_product_page(html):
+    """``{'name', 'vendor_code', 'price_cents'}``, whichever were found."""
+    parser = ProductPageParser()
+    parser.feed(html)
+    parser.close()
+    data = parser.result()
+    parsed = {}
+    if data.get('name'):
+        parsed['name'] = data['name'][:255]
+    if data.get('vendor_code'):
+        parsed['vendor_code'] = data['vendor_code'][:64]
+    price = parse_price(data.get('price'))
+    if price:
+        parsed['price_cents'] = price
+    return parsed
+
+
+class Fetcher(object):
+
+    def __init__(self, loop, concurrency, host_interval, timeout):
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(concurrency, loop=loop)
+        self.host_interval = host_interval
+        self.timeout = timeout
+        self.host_locks = {}
+        self.host_next = {}
+
+    @asyncio.coroutine
+    def wait_for_host(self, host):
+        """Space the requests to one host by ``host_interval``."""
+        lock = self.host_locks.setdefault(host, asyncio.Lock(loop=self.loop))
+        with (yield from lock):
+            delay = self.host_next.get(host, 0) - self.loop.time()
+            if delay > 0:
+                yield from asyncio.sleep(delay, loop=self.loop)
+            self.host_next[host] = self.loop.time() + self.host_interval
+
+    @asyncio.coroutine
+    def fetch(self, url):
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not parts.hostname:
+                raise FetchError('Not a web address: %s' % url)
+            yield from self.wait_for_host(parts.hostname)
+            with (yield from self.semaphore):
+                status, headers, body = yield from asyncio.wait_for(
+                    self.request(parts), self.timeout, loop=self.loop)
+            if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                url = urljoin(url, headers['location'])
+                continue
+            if status != 200:
+                raise FetchError('HTTP %d from %s' % (status, url))
+            return body.decode(self.charset(headers), 'replace')
+        raise FetchError('Too many redirects from %s' % url)
+
+    @asyncio.coroutine
+    def request(self, parts):
+        https = parts.scheme == 'https'
+        port = parts.port or (443 if https else 80)
+        reader, writer = yield from asyncio.open_connection(
+            parts.hostname, port, loop=self.loop,
+            ssl=ssl.create_default_context() if https else None)
+        try:
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            # HTTP/1.0 so the body is never chunked and ends with the
+            # connection
+            writer.write((
+                'GET %s HTTP/1.0\r\nHost: %s\r\nUser-Agent: %s\r\n'
+                'Accept: text/html\r\nConnection: close\r\n\r\n'
+                % (path, parts.netloc, settings.ENRICHMENT_USER_AGENT)
+            ).encode('latin-1'))
+            status_line = yield from reader.readline()
+            try:
+                status = int(status_line.split()[1])
+            except (IndexError, ValueError):
+                raise FetchError('Bad response from %s' % parts.netloc)
+            headers = {}
+            while True:
+                line = yield from reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            # read() returns what is buffered, the page ends at EOF
+            chunks = []
+            size = 0
+            while size < MAX_BODY:
+                chunk = yield from reader.read(MAX_BODY - size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            return status, headers, b''.join(chunks)
+        finally:
+            writer.close()
+
+    def charset(self, headers):
+        match = re.search(r'charset=([\w-]+)',
+                          headers.get('content-type', ''))
+        return match.group(1) if match else 'utf-8'
+
+
+def fetch_pages(urls, concurrency, host_interval, timeout, cache=None):
+    """
+    ``({url: html}, fetched, cached, failed)`` for the canonical ``urls``.
+    """
+    pages = {}
+    counts = {'fetched': 0, 'cached': 0, 'failed': 0}
+    to_fetch = []
+    for url in urls:
+        body = cache.get(url) if cache is not None else None
+        if body is None:
+            to_fetch.append(url)
+        else:
+            pages[url] = body
+            counts['cached'] += 1
+
+    loop = asyncio.new_event_loop()
+    fetcher = Fetcher(loop, concurrency, host_interval, timeout)
+
+    @asyncio.coroutine
+    def fetch_one(url):
+        try:
+            body = yield from fetcher.fetch(url)
+        except (FetchError, OSError, asyncio.TimeoutError, ssl.SSLError):
+            counts['failed'] += 1
+            return
+        pages[url] = body
+        counts['fetched'] += 1
+        if cache is not None:
+            cache.set(url, body)
+
+    try:
+        if to_fetch:
+            loop.run_until_complete(asyncio.gather(
+                *[fetch_one(url) for url in to_fetch], loop=loop))
+    finally:
+        loop.close()
+    return pages, counts['fetched'], counts['cached'], counts['failed']
+
+
+def empty(field):
+    return Q(**{'%s__isnull' % field: True}) | Q(**{field: ''})
+
+
+def enrich_products(products=None, concurrency=None, host_interval=None,
+                    timeout=None, cache_dir=None):
+    """Fetch the pages of ``products`` (all by default) and fill them in."""
+    products = Product.objects.all() if products is None else products
+    cache_dir = cache_dir or settings.ENRICHMENT_CACHE_DIR
+    cache = ResponseCache(cache_dir, settings.ENRICHMENT_CACHE_TTL)
+
+    links = {}
+    for product_id, link in products.values_list('id', 'product_link'):
+        if link:
+            links.setdefault(canonical_link(link), []).append(product_id)
+
+    result = EnrichmentResult()
+    result.links = len(links)
+    pages, result.fetched, result.cached, result.failed = fetch_pages(
+        list(links),
+        concurrency or settings.ENRICHMENT_CONCURRENCY,
+        (settings.ENRICHMENT_HOST_INTERVAL if host_interval is None
+         else host_interval),
+        timeout or settings.ENRICHMENT_TIMEOUT,
+        cache,
+    )
+
+    # the owners of updated rows: the API serves them by their version, and
+    # the order totals of the repriced ones change
+    changed_users, priced_users = set(), set()
+    batch = settings.ENRICHMENT_BATCH_SIZE
+    with transaction.atomic():
+        for url, body in pages.items():
+            data = parse_product_page(body)
+            ids = links[url]
+            # a few hundred ids per link at most, chunked for SQLite
+            for start in range(0, len(ids), batch):
+                same_link = Product.objects.filter(
+                    id__in=ids[start:start + batch])
+                for field in ('name', 'vendor_code'):
+                    if field in data:
+                        blank = same_link.filter(empty(field))
+                        changed_users.update(
+                            blank.values_list('user_id', flat=True))
+                        result.updated += blank.update(
+                            **{field: data[field]})
+                if 'price_cents' in data:
+                    unpriced = same_link.filter(price_cents=0)
+                    priced_users.update(
+                        unpriced.values_list('user_id', flat=True))
+                    result.updated += unpriced.update(
+                        price_cents=data['price_cents'])
+    # bumps the versions of the rebuilt users
+    user_ids = sorted(priced_users)
+    for start in range(0, len(user_ids), batch):
+        rebuild_summaries(user_ids[start:start + batch])
+    for user_id in changed_users - priced_users:
+        bump_user_version(user_id)
+    return result
@@ -0,0 +1,119 @@
+"""
+Accounting export of all orders with their product lines.
+
+Rows are produced lazily: orders are read in keyset chunks of
+``ORDER_EXPORT_CHUNK_SIZE`` ids with one more query for the products of
+each chunk, so memory depends on the chunk size and not on the table
+size. SQLite has no server side cursors and Django fetches its results
+whole, so chunking the queries is what keeps the export flat.
+"""
+import csv
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from delivery_tracker import statuses
+from delivery_tracker.models import PurchaseOrder, Product
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+HEADER = [
+    'order_id', 'order_status', 'user', 'shipping_cost', 'coupon',
+    'product_id', 'product_name', 'vendor_code', 'color', 'size',
+    'quantity', 'price', 'product_link',
+]
+
+ORDER_FIELDS = ('id', 'status_id', 'user__username', 'shipping_cost_cents',
+                'coupon')
+PRODUCT_FIELDS = ('purchase_order_id', 'id', 'name', 'vendor_code', 'color',
+                  'size', 'quantity', 'price_cents', 'product_link')
+
+
+def cents_to_amount(cents):
+    """Fixed two decimals for accounting, ``1999`` -> ``'19.99'``."""
+    if cents is None:
+        return ''
+    sign = '-' if cents < 0 else ''
+    return '%s%d.%02d' % ((sign, ) + divmod(abs(cents), 100))
+
+
+def export_rows(orders=None, chunk_size=None):
+    """
+    Yield the header and then a row per product, orders without products
+    get one row with empty product columns.
+    """
+    orders = PurchaseOrder.objects.all() if orders is None else orders
+    chunk_size = chunk_size or settings.ORDER_EXPORT_CHUNK_SIZE
+    yield HEADER
+
+    after = 0
+    while True:
+        chunk = list(orders.filter(id__gt=after).order_by('id')
+                     .values_list(*ORDER_FIELDS)[:chunk_size])
+        if not chunk:
+            return
+        products = {}
+        # the chunk's orders as a subquery: only the exported orders, with
+        # a parameter count that does not grow with the chunk size
+        chunk_orders = orders.filter(id__gt=after, id__lte=chunk[-1][0])
+        for row in (Product.objects
+                    .filter(purchase_order_id__in=chunk_orders.values('id'))
+                    .order_by('id').values_list(*PRODUCT_FIELDS)):
+            products.setdefault(row[0], []).append(row[1:])
+        after = chunk[-1][0]
+
+        for order_id, status_id, username, shipping, coupon in chunk:
+            order_columns = [order_id, statuses.by_id(status_id).code,
+                             username, cents_to_amount(shipping),
+                             coupon or '']
+            lines = products.get(order_id)
+            if not lines:
+                yield order_columns + [''] * 8
+                continue
+            for (product_id, name, vendor_code, color, size, quantity,
+                 price, link) in lines:
+                yield order_columns + [
+                    product_id, name or '', vendor_code or '', color or '',
+                    size or '', quantity, cents_to_amount(price), link,
+                ]
+
+
+class Echo(object):
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(rows, filename):
+    response = StreamingHttpResponse(csv_lines(rows),
+                                     content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
+
+
+def write_xlsx(rows, fileobj):
+    """
+    Write ``rows`` as a workbook to ``fileobj``. XLSX is a zip archive and
+    can not be streamed, but xlsxwriter's constant_memory mode flushes
+    every finished row to a temporary file. Needs the optional xlsxwriter
+    package.
+    """
+    if xlsxwriter is None:
+        raise RuntimeError('XLSX export needs the xlsxwriter package')
+    workbook = xlsxwriter.Workbook(fileobj, {'constant_memory': True,
+                                             'in_memory': False})
+    sheet = workbook.add_worksheet('Orders')
+    for row_no, row in enumerate(rows):
+        sheet.write_row(row_no, 0, row)
+    workbook.close()
@@ -1,8 +1,11 @@
 import re
+from decimal import Decimal
 
 from django import forms
 from django.contrib.auth.models import User
 
+from delivery_tracker.models import PurchaseOrder
+
 
 class UserForm(forms.ModelForm):
     class Meta:
@@ -60,3 +63,86 @@ class UserInfoForm(forms.Form):
     # phone = forms.CharField(max_length=20)
     # email_notifications = forms.BooleanField()
     # documents = forms.CharField(max_length=255)
+
+
+class ProductImportForm(forms.Form):
+    """
+    Schema of one row of a product import file. The importer cleans values
+    with these fields directly instead of building a form per row.
+    """
+    product_link = forms.CharField(max_length=1024)
+    shop_link = forms.CharField(max_length=1024, required=False)
+    vendor_code = forms.CharField(max_length=64, required=False)
+    name = forms.CharField(max_length=255, required=False)
+    color = forms.CharField(max_length=32, required=False)
+    size = forms.CharField(max_length=32, required=False)
+    quantity = forms.IntegerField(min_value=1)
+    # euro, stored as cents
+    price = forms.DecimalField(min_value=0, max_digits=12, decimal_places=2)
+    discount_code = forms.CharField(max_length=64, required=False)
+    discount_in_shop = forms.CharField(max_length=64, required=False)
+    note = forms.CharField(max_length=255, required=False)
+
+
+class ProductImportUploadForm(forms.Form):
+    file = forms.FileField()
+    user_email = forms.EmailField(max_length=75)
+    purchase_order = forms.IntegerField(required=False)
+    new_order = forms.BooleanField(required=False)
+    chunk_size = forms.IntegerField(min_value=1, required=False)
+
+    def clean_user_email(self):
+        try:
+            self.user = User.objects.get(
+                username=self.cleaned_data['user_email'])
+        except User.DoesNotExist:
+            raise forms.ValidationError("No user with such email")
+        return self.cleaned_data['user_email']
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        # see importers.guess_format
+        if upload.name.lower().endswith('.json'):
+            raise forms.ValidationError(
+                "JSON documents are not supported, upload JSON Lines (.jsonl)")
+        return upload
+
+    def clean(self):
+        cleaned_data = super(ProductImportUploadForm, self).clean()
+        self.purchase_order = None
+        order_id = cleaned_data.get('purchase_order')
+        if order_id is not None and hasattr(self, 'user'):
+            try:
+                self.purchase_order = PurchaseOrder.objects.get(
+                    pk=order_id, user=self.user)
+            except PurchaseOrder.DoesNotExist:
+                self.add_error('purchase_order',
+                               "No order with such id for this user")
+        return cleaned_data
+
+
+class ShippingQuoteForm(forms.Form):
+    zone = forms.ChoiceField()
+    # kilograms
+    weight = forms.DecimalField(min_value=Decimal('0.001'), max_value=1000,
+                                max_digits=7, decimal_places=3)
+    # centimeters, for the volumetric weight
+    length = forms.IntegerField(min_value=1, max_value=300, required=False)
+    width = forms.IntegerField(min_value=1, max_value=300, required=False)
+    height = forms.IntegerField(min_value=1, max_value=300, required=False)
+
+    def __init__(self, *args, **kwargs):
+        zones = kwargs.pop('zones')
+        super(ShippingQuoteForm, self).__init__(*args, **kwargs)
+        self.fields['zone'].choices = [
+            (zone.code, zone.name)
+            for zone in sorted(zones.values(), key=lambda z: z.code)
+        ]
+
+    def parcel(self):
+        """``(zone, grams, cm3)`` of the cleaned data."""
+        data = self.cleaned_data
+        volume = None
+        if data['length'] and data['width'] and data['height']:
+            volume = data['length'] * data['width'] * data['height']
+        return data['zone'], int(data['weight'] * 1000), volume
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the iteration count taken from PASSWORD_PBKDF2_ITERATIONS.
+
+    The algorithm name is unchanged, so existing hashes keep working and
+    are rehashed with the configured work factor on the next successful
+    login (Django calls ``must_update`` from ``check_password``).
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,177 @@
+"""
+Bulk import of products from CSV or JSON Lines files.
+
+The file is read as a stream: rows are validated one by one against
+``ProductImportForm`` and written with ``bulk_create`` in chunks, each chunk
+in its own transaction, so memory use does not depend on the file size.
+Rows without a name or vendor code take them from products other users
+already added with the same canonical link.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from delivery_tracker import statuses
+from delivery_tracker.caching import bump_user_version
+from delivery_tracker.forms import ProductImportForm
+from delivery_tracker.models import (
+    PurchaseOrder, PurchaseOrderStatus, Product
+)
+from delivery_tracker.summary import refresh_summary
+from delivery_tracker.utils import link_hash, to_cents
+
+
+FORMATS = ('csv', 'jsonl')
+
+
+class ImportResult(object):
+
+    def __init__(self, max_errors):
+        self.created = 0
+        self.error_count = 0
+        # (line number, {field: [messages]}), only the first max_errors
+        self.errors = []
+        self.max_errors = max_errors
+        self.purchase_order = None
+
+    def add_error(self, line_no, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_no, errors))
+
+
+def guess_format(filename):
+    """
+    Format of an import file by its name, None for a ``.json`` document:
+    only JSON Lines are read as a stream, one object per line.
+    """
+    name = filename.lower()
+    if name.endswith('.jsonl'):
+        return 'jsonl'
+    if name.endswith('.json'):
+        return None
+    return 'csv'
+
+
+def iter_records(fileobj, fmt, encoding='utf-8'):
+    """Yield ``(line number, dict)`` from a binary file object."""
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = e
+            yield line_no, record
+    else:
+        raise ValueError('Unknown import format: %s' % fmt)
+
+
+def _clean_record(fields, defaults, record):
+    values = {}
+    errors = {}
+    for name, field in fields.items():
+        value = record.get(name)
+        if value is None or value == '':
+            if name in defaults:
+                # optional column that is absent or empty in this row
+                values[name] = defaults[name]
+                continue
+        elif not isinstance(value, str):
+            value = str(value)
+        try:
+            values[name] = field.clean(value)
+        except ValidationError as e:
+            errors[name] = e.messages
+    return values, errors
+
+
+def import_products(fileobj, fmt, user, purchase_order=None, new_order=False,
+                    chunk_size=None, max_errors=1000):
+    """
+    Import products for ``user``, attaching them to ``purchase_order`` or to
+    a new order if ``new_order`` is set. Invalid rows are skipped and
+    reported in the result.
+    """
+    chunk_size = chunk_size or settings.PRODUCT_IMPORT_CHUNK_SIZE
+    result = ImportResult(max_errors)
+    if new_order:
+        purchase_order = PurchaseOrder.objects.create(
+            user=user,
+            status_id=statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        )
+    result.purchase_order = purchase_order
+
+    fields = ProductImportForm.base_fields
+    defaults = dict(
+        (name, None if Product._meta.get_field(name).null else '')
+        for name, field in fields.items() if not field.required
+    )
+
+    chunk = []
+    for line_no, record in iter_records(fileobj, fmt):
+        if not isinstance(record, dict):
+            result.add_error(line_no, {'__all__': ['Not a JSON object']})
+            continue
+        values, errors = _clean_record(fields, defaults, record)
+        if errors:
+            result.add_error(line_no, errors)
+            continue
+        values['price_cents'] = to_cents(values.pop('price'))
+        values['link_hash'] = link_hash(values['product_link'])
+        chunk.append(Product(user=user, purchase_order=purchase_order,
+                             **values))
+        if len(chunk) >= chunk_size:
+            result.created += _write_chunk(chunk)
+            chunk = []
+    if chunk:
+        result.created += _write_chunk(chunk)
+
+    # bulk_create skips the signals that maintain the cabinet counters and
+    # the user's cache version, unassigned products included
+    if purchase_order is not None:
+        refresh_summary(purchase_order.user_id, purchase_order.status_id)
+    bump_user_version(user.pk)
+    return result
+
+
+def known_metadata(hashes):
+    """``{link hash: (name, vendor code)}`` of already known products."""
+    known = {}
+    rows = (Product.objects
+            .exclude(name__isnull=True).exclude(name='')
+            .order_by('-id')
+            .values_list('link_hash', 'name', 'vendor_code')
+            .same_items(hashes, hashed=True))
+    for hash_, name, vendor_code in rows:
+        # the newest product wins
+        known.setdefault(hash_, (name, vendor_code))
+    return known
+
+
+def _fill_known_metadata(chunk):
+    missing = [p for p in chunk if not p.name or not p.vendor_code]
+    if not missing:
+        return
+    known = known_metadata(p.link_hash for p in missing)
+    for product in missing:
+        name, vendor_code = known.get(product.link_hash, (None, None))
+        product.name = product.name or name
+        product.vendor_code = product.vendor_code or vendor_code
+
+
+def _write_chunk(chunk):
+    _fill_known_metadata(chunk)
+    with transaction.atomic():
+        Product.objects.bulk_create(chunk)
+    return len(chunk)
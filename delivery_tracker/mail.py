@@ -0,0 +1,119 @@
+"""
+Persistent outbox for the emails we send to users.
+
+Views only put a row into ``outgoing_email`` with ``queue_mail`` and return;
+the ``send_queued_mail`` management command drains the table in batches over
+one SMTP connection and retries failed messages with exponential backoff.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from delivery_tracker.models import OutgoingEmail
+from delivery_tracker.perf import timer
+
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, from_email, recipient_list,
+               html_message=None):
+    """Same signature as ``send_mail`` but only stores the message."""
+    now = timezone.now()
+    # only the INSERT into the outbox, the SMTP time is the worker's
+    with timer('mail_queue'):
+        return OutgoingEmail.objects.create(
+            created_date=now,
+            send_after=now,
+            subject=subject,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=','.join(recipient_list),
+            body_text=message,
+            body_html=html_message or '',
+        )
+
+
+def retry_delay(attempts):
+    delay = settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+    return datetime.timedelta(
+        seconds=min(delay, settings.EMAIL_QUEUE_MAX_RETRY_DELAY)
+    )
+
+
+def _build_message(email, connection):
+    msg = EmailMultiAlternatives(
+        email.subject,
+        email.body_text,
+        email.from_email,
+        email.recipient_list(),
+        connection=connection,
+    )
+    if email.body_html:
+        msg.attach_alternative(email.body_html, 'text/html')
+    return msg
+
+
+def _defer(email, error, now):
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.STATUS_FAILED
+        logger.error('Giving up on email %s: %s', email.pk, error)
+    else:
+        email.send_after = now + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status',
+                              'send_after'])
+
+
+def send_queued_mail(batch_size=None, connection=None):
+    """
+    Send one batch of due emails and return ``(sent, failed)``.
+
+    Only one worker is expected to drain the outbox at a time.
+    """
+    batch_size = batch_size or settings.EMAIL_QUEUE_BATCH_SIZE
+    now = timezone.now()
+    batch = list(
+        OutgoingEmail.objects
+        .filter(status=OutgoingEmail.STATUS_PENDING, send_after__lte=now)
+        .order_by('send_after', 'id')[:batch_size]
+    )
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # the server is down, not the messages at fault: back off the whole
+        # batch without spending their attempts
+        logger.warning('Could not connect to the mail server: %s', e)
+        OutgoingEmail.objects.filter(
+            pk__in=[email.pk for email in batch]
+        ).update(last_error=str(e), send_after=now + retry_delay(1))
+        return 0, len(batch)
+
+    sent_ids = []
+    failed = 0
+    try:
+        for email in batch:
+            try:
+                _build_message(email, connection).send()
+            except Exception as e:
+                _defer(email, str(e), now)
+                failed += 1
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        connection.close()
+
+    OutgoingEmail.objects.filter(pk__in=sent_ids).update(
+        status=OutgoingEmail.STATUS_SENT,
+        sent_date=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    return len(sent_ids), failed
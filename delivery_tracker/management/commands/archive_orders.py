@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = ('Moves received and cancelled orders whose status did not '
+            'change for ORDER_ARCHIVE_AFTER_DAYS into the archive tables')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Archive at most this many orders')
+
+    def handle(self, *args, **options):
+        archived = archive_orders(options['days'], options['batch_size'],
+                                  options['limit'])
+        self.stdout.write('Archived orders: %d' % archived)
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from delivery_tracker.bench import (
+    scratch_database, seed_tracker_data, summarize, timed
+)
+
+
+ENDPOINTS = ('api_profile', 'api_order_summary', 'api_orders')
+
+
+class Command(BaseCommand):
+    help = ('Seeds a scratch database and compares full 200 responses of '
+            'the JSON API with conditional 304 ones: latency, queries and '
+            'bytes per request')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--orders-per-user', type=int, default=50)
+        parser.add_argument('--products-per-order', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                PERF_INSTRUMENTATION=False):
+            start = time.time()
+            users = seed_tracker_data(options['users'],
+                                      options['orders_per_user'],
+                                      options['products_per_order'])
+            report = {'seed_seconds': round(time.time() - start, 2)}
+            client = Client()
+            client.force_login(users[0])
+            for name in ENDPOINTS:
+                report[name] = self.run(client, reverse(name),
+                                        options['requests'])
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, client, url, requests):
+        etag = client.get(url)['ETag']
+        result = {}
+        for label, headers, status in (
+                ('200', {}, 200),
+                ('304', {'HTTP_IF_NONE_MATCH': etag}, 304)):
+            def request(i):
+                response = client.get(url, **headers)
+                assert response.status_code == status, (
+                    url, response.status_code)
+
+            # a full log (seeding fills it) would hide new queries
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, **headers)
+            query_count = len(queries)
+            result[label] = summarize(timed(request, requests))
+            result[label]['queries'] = query_count
+            result[label]['bytes'] = len(response.content)
+        return result
@@ -0,0 +1,110 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from delivery_tracker import statuses
+from delivery_tracker.archive import archive_orders, order_page
+from delivery_tracker.bench import (
+    fake_rows, insert_sql, scratch_database, summarize, timed
+)
+from delivery_tracker.models import (
+    ArchivedPurchaseOrder, PurchaseOrder, PurchaseOrderStatus, Product
+)
+from delivery_tracker.totals import status_totals
+
+
+OLD_DATE = '2000-01-01 00:00:00'
+
+
+class Command(BaseCommand):
+    help = ('Grows the finished order history of a scratch database step '
+            'by step and reports the latency of a customer\'s order page '
+            'with the history in the hot tables and after archiving it')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--active-orders-per-user', type=int, default=5)
+        parser.add_argument('--products-per-order', type=int, default=3)
+        parser.add_argument('--history', type=int, action='append',
+                            help='Finished orders in total after a step, '
+                                 'can be repeated; 100000, 300000 and '
+                                 '1000000 by default')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        report = []
+        with scratch_database():
+            with transaction.atomic():
+                user_ids = self.seed_users(options)
+                self.seed_orders(user_ids, options['users'] *
+                                 options['active_orders_per_user'],
+                                 PurchaseOrderStatus.IN_PROGRESS, options)
+            history = 0
+            for target in options['history'] or [100000, 300000, 1000000]:
+                with transaction.atomic():
+                    self.seed_orders(user_ids, target - history,
+                                     PurchaseOrderStatus.RECEIVED, options)
+                history = target
+                step = {
+                    'history_orders': history,
+                    'hot_orders_before': PurchaseOrder.objects.count(),
+                    'before_archive': self.measure(user_ids, options),
+                }
+                start = time.time()
+                archive_orders(days=30)
+                step['archive_seconds'] = round(time.time() - start, 2)
+                step['hot_orders_after'] = PurchaseOrder.objects.count()
+                step['archived_orders'] = ArchivedPurchaseOrder.objects.count()
+                step['after_archive'] = self.measure(user_ids, options)
+                report.append(step)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def seed_users(self, options):
+        User.objects.bulk_create([
+            User(username='bench%d@example.com' % i)
+            for i in range(options['users'])
+        ])
+        return list(User.objects.order_by('id').values_list('id', flat=True))
+
+    def seed_orders(self, user_ids, count, status_code, options):
+        status_id = statuses.id_for(status_code)
+        per_order = options['products_per_order']
+        connection.ensure_connection()
+        db = connection.connection
+        last_order = (PurchaseOrder.objects.order_by('-id')
+                      .values_list('id', flat=True).first() or 0)
+        columns, rows = fake_rows(PurchaseOrder, count, {
+            'user_id': lambda i, rnd: user_ids[i % len(user_ids)],
+            'status_id': lambda i, rnd: status_id,
+            'status_changed_date': lambda i, rnd: OLD_DATE,
+        })
+        db.executemany(insert_sql(PurchaseOrder, columns), rows)
+        first_order = PurchaseOrder.objects.filter(
+            id__gt=last_order).order_by('id').values_list(
+            'id', flat=True).first()
+        columns, rows = fake_rows(Product, count * per_order, {
+            'purchase_order_id': lambda i, rnd: first_order + i // per_order,
+            'user_id': lambda i, rnd: user_ids[(i // per_order) %
+                                               len(user_ids)],
+            'price_cents': lambda i, rnd: rnd.randint(100, 20000),
+        })
+        db.executemany(insert_sql(Product, columns), rows)
+
+    def measure(self, user_ids, options):
+        """
+        The order page, and the per-user totals aggregate that summary
+        rebuilds and product imports run over all of the user's orders.
+        """
+        rnd = random.Random(0)
+        return {
+            'order_page': summarize(timed(
+                lambda i: order_page(rnd.choice(user_ids)),
+                options['repeat'])),
+            'user_totals': summarize(timed(
+                lambda i: status_totals([rnd.choice(user_ids)]),
+                options['repeat'])),
+        }
@@ -0,0 +1,54 @@
+import json
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.bench import StubShop
+from delivery_tracker.enrichment import ResponseCache, fetch_pages
+from delivery_tracker.utils import normalize_url
+
+
+class Command(BaseCommand):
+    help = ('Fetches pages from a local stub shop at several concurrency '
+            'levels and reports pages per second, then the cached rerun')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200)
+        parser.add_argument('--delay', type=float, default=0.05,
+                            help='Seconds the stub shop takes per page')
+        parser.add_argument('--concurrency', type=int, action='append',
+                            dest='levels',
+                            help='Concurrency level, can be repeated')
+
+    def handle(self, *args, **options):
+        levels = options['levels'] or [1, 5, 10, 25, 50]
+        report = {'pages': options['pages'], 'delay': options['delay'],
+                  'concurrency': {}}
+        with StubShop(delay=options['delay']) as shop, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            urls = [normalize_url(shop.url(i))
+                    for i in range(options['pages'])]
+            # one stub host, so no per-host spacing here
+            for level in levels:
+                start = time.time()
+                pages, fetched, cached, failed = fetch_pages(
+                    urls, level, 0, 30)
+                elapsed = time.time() - start
+                report['concurrency'][level] = {
+                    'seconds': round(elapsed, 3),
+                    'pages_per_second': round(fetched / elapsed, 1),
+                    'failed': failed,
+                }
+
+            cache = ResponseCache(cache_dir, 60)
+            fetch_pages(urls, max(levels), 0, 30, cache)
+            start = time.time()
+            pages, fetched, cached, failed = fetch_pages(
+                urls, max(levels), 0, 30, cache)
+            report['cached_rerun'] = {
+                'seconds': round(time.time() - start, 3),
+                'cached': cached,
+                'fetched': fetched,
+            }
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
@@ -0,0 +1,86 @@
+import json
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from delivery_tracker import statuses
+from delivery_tracker.bench import fake_rows, insert_sql, scratch_database
+from delivery_tracker.exports import csv_lines, export_rows
+from delivery_tracker.models import PurchaseOrder, Product
+
+
+class Command(BaseCommand):
+    help = ('Streams the order export out of scratch databases of growing '
+            'size and reports time and peak Python memory for each')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, action='append',
+                            help='Product counts to try, can be repeated; '
+                                 '100000 and 1000000 by default')
+        parser.add_argument('--products-per-order', type=int, default=5)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        report = []
+        for products in options['products'] or [100000, 1000000]:
+            with scratch_database():
+                seed_start = time.time()
+                with transaction.atomic():
+                    self.seed(products, options)
+                result = self.export(options)
+                result['products'] = products
+                result['seed_seconds'] = round(time.time() - seed_start -
+                                               result['seconds'], 1)
+                report.append(result)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def seed(self, products, options):
+        User.objects.bulk_create([
+            User(username='bench%d@example.com' % i)
+            for i in range(options['users'])
+        ])
+        first_user = User.objects.order_by('id')[0].pk
+        status_ids = [s.pk for s in statuses.all_statuses()]
+        per_order = options['products_per_order']
+        orders = products // per_order
+
+        connection.ensure_connection()
+        db = connection.connection
+        columns, rows = fake_rows(PurchaseOrder, orders, {
+            'user_id': lambda i, rnd: first_user + i % options['users'],
+            'status_id': lambda i, rnd: rnd.choice(status_ids),
+        })
+        db.executemany(insert_sql(PurchaseOrder, columns), rows)
+        first_order = PurchaseOrder.objects.order_by('id')[0].pk
+        columns, rows = fake_rows(Product, products, {
+            'purchase_order_id': lambda i, rnd: first_order + i // per_order,
+            'user_id': lambda i, rnd: (
+                first_user + (i // per_order) % options['users']),
+            'price_cents': lambda i, rnd: rnd.randint(100, 20000),
+        })
+        db.executemany(insert_sql(Product, columns), rows)
+
+    def export(self, options):
+        rows = size = 0
+        tracemalloc.start()
+        start = time.time()
+        try:
+            for line in csv_lines(export_rows(
+                    chunk_size=options['chunk_size'])):
+                rows += 1
+                size += len(line)
+            elapsed = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'rows': rows,
+            'csv_mb': round(size / 1024.0 / 1024, 1),
+            'seconds': round(elapsed, 1),
+            'rows_per_second': round(rows / elapsed),
+            'peak_python_mb': round(peak / 1024.0 / 1024, 2),
+        }
@@ -0,0 +1,147 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from delivery_tracker.bench import fake_rows, insert_sql, summarize, timed
+from delivery_tracker.models import PurchaseOrder, Product
+
+
+USER_PARAM = -101
+STATUS_PARAM = -202
+ORDER_PARAM = -303
+
+
+def access_paths():
+    """The per-user lookups the composite indexes are meant for."""
+    return [
+        ('orders of a user in a status',
+         PurchaseOrder.objects.filter(user_id=USER_PARAM,
+                                      status_id=STATUS_PARAM)),
+        ('unassigned products of a user',
+         Product.objects.filter(user_id=USER_PARAM,
+                                purchase_order__isnull=True)),
+        ('products of a user in an order',
+         Product.objects.filter(user_id=USER_PARAM,
+                                purchase_order_id=ORDER_PARAM)),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Seeds a scratch SQLite database with orders and products and '
+            'compares query plans and timings without and with the '
+            'composite (user, ...) indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None,
+                            help='Scratch database file, a temporary one '
+                                 'by default')
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--products', type=int, default=3000000)
+        parser.add_argument('--statuses', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database has to be SQLite, '
+                               'its DDL is reused for the scratch database')
+
+        path = options['path']
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+        try:
+            self.run(path, options)
+        finally:
+            if options['path'] is None:
+                os.remove(path)
+
+    def run(self, path, options):
+        db = sqlite3.connect(path)
+        with connection.schema_editor(collect_sql=True) as editor:
+            editor.create_model(PurchaseOrder)
+            editor.create_model(Product)
+        db.executescript('\n'.join(editor.collected_sql))
+
+        start = time.time()
+        self.seed(db, options)
+        self.stdout.write('Seeded %(orders)d orders and %(products)d products'
+                          ' for %(users)d users' % options +
+                          ' in %.1fs' % (time.time() - start))
+
+        composite = self.composite_indexes(db)
+        for name, _ in composite:
+            db.execute('DROP INDEX "%s"' % name)
+        db.execute('ANALYZE')
+        self.report(db, 'Without composite indexes', options)
+
+        for _, sql in composite:
+            db.execute(sql)
+        db.execute('ANALYZE')
+        self.report(db, 'With composite indexes', options)
+        db.close()
+
+    def seed(self, db, options):
+        users, orders = options['users'], options['orders']
+
+        def order_of(i):
+            # every fifth product is not assigned to an order yet
+            return None if i % 5 == 0 else (i * 7919) % orders + 1
+
+        columns, rows = fake_rows(PurchaseOrder, orders, {
+            'user_id': lambda i, rnd: i % users + 1,
+            'status_id': lambda i, rnd: rnd.randint(1, options['statuses']),
+        })
+        db.executemany(insert_sql(PurchaseOrder, columns), rows)
+
+        columns, rows = fake_rows(Product, options['products'], {
+            'purchase_order_id': lambda i, rnd: order_of(i),
+            'user_id': lambda i, rnd: (
+                i % users + 1 if order_of(i) is None
+                else (order_of(i) - 1) % users + 1
+            ),
+        })
+        db.executemany(insert_sql(Product, columns), rows)
+        db.commit()
+
+    def composite_indexes(self, db):
+        indexes = []
+        for table in (PurchaseOrder._meta.db_table, Product._meta.db_table):
+            for row in db.execute('PRAGMA index_list("%s")' % table):
+                name = row[1]
+                columns = db.execute(
+                    'PRAGMA index_info("%s")' % name).fetchall()
+                if len(columns) > 1:
+                    sql = db.execute(
+                        'SELECT sql FROM sqlite_master WHERE name = ?',
+                        (name, )).fetchone()[0]
+                    indexes.append((name, sql))
+        return indexes
+
+    def report(self, db, title, options):
+        self.stdout.write('\n== %s' % title)
+        rnd = random.Random(1)
+        for label, queryset in access_paths():
+            sql, params = queryset.values_list('id').query.sql_with_params()
+            sql = sql.replace('%s', '?')
+
+            def bind():
+                values = {
+                    USER_PARAM: rnd.randint(1, options['users']),
+                    STATUS_PARAM: rnd.randint(1, options['statuses']),
+                    ORDER_PARAM: rnd.randint(1, options['orders']),
+                }
+                return [values.get(p, p) for p in params]
+
+            plan = db.execute('EXPLAIN QUERY PLAN ' + sql, bind()).fetchall()
+            samples = timed(lambda i: db.execute(sql, bind()).fetchall(),
+                            options['repeat'])
+            self.stdout.write('\n%s\n  %s' % (label, sql))
+            for row in plan:
+                self.stdout.write('  plan: %s' % row[-1])
+            self.stdout.write('  timing: %s' % summarize(samples))
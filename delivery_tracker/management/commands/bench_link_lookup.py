@@ -0,0 +1,65 @@
+import random
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from delivery_tracker.bench import fake_rows, insert_sql, summarize, timed
+from delivery_tracker.models import Product
+from delivery_tracker.utils import link_hash
+
+
+def shop_link(i):
+    return ('https://Shop%d.example.com/catalog/item-%d?color=red'
+            '&utm_source=newsletter&utm_campaign=%d' % (i % 50, i, i % 7))
+
+
+class Command(BaseCommand):
+    help = ('Seeds an in-memory SQLite database with products and compares '
+            'finding the products of a link by scanning product_link with '
+            'the indexed link_hash lookup')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500000)
+        parser.add_argument('--distinct', type=int, default=100000,
+                            help='Distinct shop items among the products')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The default database has to be SQLite, '
+                               'its DDL is reused for the scratch database')
+        db = sqlite3.connect(':memory:')
+        with connection.schema_editor(collect_sql=True) as editor:
+            editor.create_model(Product)
+        db.executescript('\n'.join(editor.collected_sql))
+
+        distinct = options['distinct']
+        columns, rows = fake_rows(Product, options['products'], {
+            'user_id': lambda i, rnd: i % 1000 + 1,
+            'product_link': lambda i, rnd: shop_link(i % distinct),
+            'link_hash': lambda i, rnd: link_hash(shop_link(i % distinct)),
+        })
+        db.executemany(insert_sql(Product, columns), rows)
+        db.execute('ANALYZE')
+
+        rnd = random.Random(1)
+        lookups = [
+            # and this one only finds the very same spelling
+            ('product_link scan', 'SELECT id FROM product '
+             'WHERE product_link = ?', lambda link: link),
+            ('link_hash index', 'SELECT id FROM product '
+             'WHERE link_hash = ?', link_hash),
+        ]
+        for label, sql, key in lookups:
+            def lookup(i):
+                link = shop_link(rnd.randrange(distinct))
+                db.execute(sql, [key(link)]).fetchall()
+
+            plan = db.execute('EXPLAIN QUERY PLAN ' + sql, ['x']).fetchall()
+            self.stdout.write('\n%s\n  %s' % (label, sql))
+            for row in plan:
+                self.stdout.write('  plan: %s' % row[-1])
+            self.stdout.write('  timing: %s' % summarize(
+                timed(lookup, options['repeat'])))
+        db.close()
@@ -0,0 +1,77 @@
+import json
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from delivery_tracker.bench import scratch_database, seed_tracker_data
+
+
+PASSWORD = 'secret123'
+
+
+class Command(BaseCommand):
+    help = ('Replays a credential stuffing burst against the login view and '
+            'reports CPU time per attempt with and without throttling')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=500)
+        parser.add_argument('--ips', type=int, default=5,
+                            help='Number of attacking client addresses')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--iterations', type=int, action='append',
+                            help='PBKDF2 work factors to compare, can be '
+                                 'repeated; the configured one by default')
+
+    def handle(self, *args, **options):
+        report = []
+        with scratch_database(), override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            seed_tracker_data(options['users'], 0, 0, password=PASSWORD)
+            for iterations in options['iterations'] or [None]:
+                for throttled in (False, True):
+                    report.append(self.attack(iterations, throttled, options))
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def attack(self, iterations, throttled, options):
+        overrides = {'LOGIN_THROTTLE_ENABLED': throttled}
+        if iterations:
+            overrides['PASSWORD_PBKDF2_ITERATIONS'] = iterations
+        rnd = random.Random(0)
+        client = Client()
+        rejected = 0
+        cache.clear()
+        with override_settings(**overrides):
+            # checks against existing users cost what their stored hash
+            # says, so the seeded users get one of the tested work factor
+            User.objects.filter(username__startswith='bench').update(
+                password=make_password(PASSWORD))
+            wall_start = time.time()
+            cpu_start = time.process_time()
+            for _ in range(options['attempts']):
+                response = client.post(
+                    '/tracker/login/',
+                    {'username': 'bench%d@example.com' %
+                                 rnd.randint(0, options['users'] * 2),
+                     'password': 'guess%d' % rnd.randint(0, 10 ** 6)},
+                    REMOTE_ADDR='10.0.0.%d' % rnd.randint(1, options['ips']),
+                )
+                assert response.status_code in (200, 429), (
+                    response.status_code)
+                rejected += response.status_code == 429
+            cpu = time.process_time() - cpu_start
+            wall = time.time() - wall_start
+        cache.clear()
+        return {
+            'iterations': iterations or 'default',
+            'throttling': throttled,
+            'attempts': options['attempts'],
+            'rejected': rejected,
+            'cpu_ms_per_attempt': round(cpu * 1000 / options['attempts'], 3),
+            'attempts_per_second': round(options['attempts'] / wall, 1),
+        }
@@ -0,0 +1,86 @@
+import json
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from delivery_tracker.bench import (
+    fake_rows, insert_sql, scratch_database, summarize, timed
+)
+from delivery_tracker.models import Product
+from delivery_tracker.search import (
+    fallback_search, fts_available, search_products
+)
+
+
+WORDS = ('jacket coat dress shirt boots sneakers scarf gloves hat belt bag '
+         'wallet watch lamp mug kettle blender cable charger case cover '
+         'wool cotton leather linen silk denim black white red blue green '
+         'winter summer rain travel kids sport classic slim oversized').split()
+
+
+class Command(BaseCommand):
+    help = ('Seeds a scratch database with products and compares the FTS5 '
+            'search with the icontains (LIKE) fallback')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            if not fts_available():
+                raise CommandError('SQLite was built without FTS5')
+            with transaction.atomic():
+                self.seed(options['products'])
+            report = self.run(options)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def seed(self, count):
+        user = User.objects.create_user('bench@example.com')
+
+        def words(rnd, n):
+            return ' '.join(rnd.choice(WORDS) for _ in range(n))
+
+        columns, rows = fake_rows(Product, count, {
+            'purchase_order_id': lambda i, rnd: None,
+            'user_id': lambda i, rnd: user.pk,
+            'name': lambda i, rnd: words(rnd, 3).capitalize(),
+            'vendor_code': lambda i, rnd: '%s-%d' % (
+                rnd.choice(WORDS)[:2].upper(), rnd.randint(1, 9999)),
+            'note': lambda i, rnd: words(rnd, 6) if i % 4 == 0 else None,
+            'shop_link': lambda i, rnd: 'http://shop%d.example.com/' % (
+                i % 50),
+        }, seed=1)
+        connection.ensure_connection()
+        connection.connection.executemany(insert_sql(Product, columns), rows)
+
+    def run(self, options):
+        rnd = random.Random(2)
+        repeat = options['repeat']
+        vendor_codes = list(Product.objects.order_by('?').values_list(
+            'vendor_code', flat=True)[:repeat])
+        # LIKE stops early on frequent words, FTS wins on selective ones
+        workloads = {
+            'common_word': [rnd.choice(WORDS) for _ in range(repeat)],
+            'two_words': ['%s %s' % (rnd.choice(WORDS), rnd.choice(WORDS))
+                          for _ in range(repeat)],
+            'vendor_code': vendor_codes,
+            'no_match': ['missing%d' % i for i in range(repeat)],
+        }
+        engines = {
+            'fts5': lambda q: search_products(q),
+            'like': lambda q: fallback_search(q, Product.objects.all()),
+        }
+        size = options['page_size']
+        report = {}
+        for workload, queries in sorted(workloads.items()):
+            for name, engine in sorted(engines.items()):
+                def first_page(i):
+                    list(engine(queries[i])[:size])
+
+                report['%s %s' % (workload, name)] = summarize(
+                    timed(first_page, len(queries)))
+        return report
@@ -0,0 +1,96 @@
+import json
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from delivery_tracker.bench import (
+    scratch_database, seed_tracker_data, summarize, timed
+)
+
+
+SCENARIOS = [
+    ('cabinet', 'GET', '/tracker/cabinet/', None),
+    ('personal_data', 'GET', '/tracker/cabinet/personal_data/', None),
+    ('personal_data_post', 'POST', '/tracker/cabinet/personal_data/',
+     {'profile_changes': '1', 'first_name': 'Bench', 'last_name': 'User',
+      'email': 'bench0@example.com'}),
+]
+
+
+class Command(BaseCommand):
+    help = ('Compares the per request overhead of the session strategies '
+            'from SESSION_ENGINES on the cabinet views and on bare session '
+            'loads and saves')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--strategy', action='append', dest='strategies',
+                            help='Only run this strategy, can be repeated')
+
+    def handle(self, *args, **options):
+        report = {}
+        with scratch_database(), override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            users = seed_tracker_data(1, 20, 5)
+            for strategy in sorted(settings.SESSION_ENGINES):
+                if (options['strategies'] and
+                        strategy not in options['strategies']):
+                    continue
+                cache.clear()
+                with override_settings(
+                        SESSION_STRATEGY=strategy,
+                        SESSION_ENGINE=settings.SESSION_ENGINES[strategy]):
+                    report[strategy] = self.run(users[0], options)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, user, options):
+        result = {}
+        client = Client()
+        client.force_login(user)
+        for name, method, url, data in SCENARIOS:
+            def request(i):
+                if method == 'GET':
+                    response = client.get(url)
+                else:
+                    response = client.post(url, data)
+                assert response.status_code < 400, (name,
+                                                    response.status_code)
+
+            request(0)  # warm up the cache backed strategies
+            with CaptureQueriesContext(connection) as queries:
+                samples = timed(request, options['requests'])
+            result[name] = summarize(samples)
+            result[name].update(self.query_counts(queries, options))
+
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        session_key = client.session.session_key
+
+        def load(i):
+            store_class(session_key).load()
+
+        def save(i):
+            store = store_class(session_key)
+            store['bench'] = i
+            store.save()
+
+        for name, func in (('session_load', load), ('session_save', save)):
+            with CaptureQueriesContext(connection) as queries:
+                samples = timed(func, options['requests'])
+            result[name] = summarize(samples)
+            result[name].update(self.query_counts(queries, options))
+        return result
+
+    def query_counts(self, queries, options):
+        session_queries = [q for q in queries.captured_queries
+                           if 'django_session' in q['sql']]
+        return {
+            'queries_per_request': round(
+                len(queries) / float(options['requests']), 2),
+            'session_queries_per_request': round(
+                len(session_queries) / float(options['requests']), 2),
+        }
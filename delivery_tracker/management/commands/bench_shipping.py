@@ -0,0 +1,57 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from delivery_tracker import shipping
+
+
+class Command(BaseCommand):
+    help = ('Reports shipping quotes per second: uncached single quotes, '
+            'the LRU cached quote and quote_batch')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parcels', type=int, default=200000)
+        parser.add_argument('--distinct', type=int, default=2000,
+                            help='Distinct parcels, what the cache can hit')
+
+    def handle(self, *args, **options):
+        tariffs = shipping.get_tariffs()
+        rnd = random.Random(0)
+        zones = sorted(tariffs.zones)
+        distinct = [
+            (rnd.choice(zones), rnd.randint(100, 40000),
+             rnd.choice([None, rnd.randint(1000, 200000)]))
+            for _ in range(options['distinct'])
+        ]
+        parcels = [rnd.choice(distinct) for _ in range(options['parcels'])]
+
+        def uncached():
+            quote = tariffs.quote
+            for parcel in parcels:
+                quote(*parcel)
+
+        def cached():
+            shipping.quote.cache_clear()
+            quote = shipping.quote
+            for parcel in parcels:
+                quote(*parcel)
+
+        def batch():
+            shipping.quote_batch(parcels)
+
+        report = {}
+        for name, func in (('uncached', uncached), ('lru_cached', cached),
+                           ('batch', batch)):
+            start = time.time()
+            func()
+            elapsed = time.time() - start
+            report[name] = {
+                'quotes_per_second': round(len(parcels) / elapsed),
+                'seconds': round(elapsed, 3),
+            }
+        info = shipping.quote.cache_info()
+        report['lru_cached']['hit_ratio'] = round(
+            info.hits / float(info.hits + info.misses), 3)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
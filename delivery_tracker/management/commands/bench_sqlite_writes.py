@@ -0,0 +1,99 @@
+import json
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.test.utils import override_settings
+
+from delivery_tracker import statuses
+from delivery_tracker.bench import (
+    scratch_database, seed_tracker_data, summarize
+)
+from delivery_tracker.models import PurchaseOrder, PurchaseOrderStatus
+
+
+def write_worker(worker, user_ids, writes, results):
+    """
+    Signup and profile save like writes from a forked process: create an
+    order (which refreshes the summary) and update a user, each in its own
+    transaction.
+    """
+    # the parent's connection must not be shared with the child
+    connection.close()
+    requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+    samples = []
+    errors = 0
+    for i in range(writes):
+        user_id = user_ids[(worker + i) % len(user_ids)]
+        start = time.time()
+        try:
+            with transaction.atomic():
+                PurchaseOrder.objects.create(user_id=user_id,
+                                             status_id=requested)
+            User.objects.filter(pk=user_id).update(
+                first_name='Worker %d write %d' % (worker, i))
+        except OperationalError:
+            errors += 1
+            continue
+        samples.append(time.time() - start)
+    connection.close()
+    results.put((samples, errors))
+
+
+class Command(BaseCommand):
+    help = ('Hammers a scratch SQLite database with writes from several '
+            'processes and reports throughput and "database is locked" '
+            'errors with the default and the SQLITE_PRAGMAS connections')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, action='append',
+                            help='Process counts to try, can be repeated; '
+                                 '1, 2, 4 and 8 by default')
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Write transactions pairs per process')
+        parser.add_argument('--users', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Only SQLite databases are supported')
+        report = []
+        for label, pragmas in (('default', []),
+                               ('tuned', settings.SQLITE_PRAGMAS)):
+            # journal_mode=WAL sticks to the file, so every configuration
+            # gets a fresh database
+            with override_settings(SQLITE_PRAGMAS=pragmas), \
+                    scratch_database():
+                users = seed_tracker_data(options['users'], 0, 0)
+                user_ids = [u.pk for u in users]
+                for workers in options['workers'] or [1, 2, 4, 8]:
+                    result = self.run(workers, user_ids, options)
+                    result.update({'pragmas': label, 'workers': workers})
+                    report.append(result)
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, workers, user_ids, options):
+        connection.close()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=write_worker,
+                args=(n, user_ids, options['writes'], results))
+            for n in range(workers)
+        ]
+        begin = time.time()
+        for p in processes:
+            p.start()
+        collected = [results.get() for _ in processes]
+        for p in processes:
+            p.join()
+        elapsed = time.time() - begin
+
+        samples = [s for worker_samples, _ in collected
+                   for s in worker_samples]
+        result = summarize(samples) if samples else {'count': 0}
+        result['errors'] = sum(errors for _, errors in collected)
+        result['writes_per_second'] = round(len(samples) / elapsed, 1)
+        return result
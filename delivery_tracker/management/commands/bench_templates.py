@@ -0,0 +1,88 @@
+import copy
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from delivery_tracker.bench import summarize, timed
+from delivery_tracker.emails import TEMPLATE_PATTERN, render_email
+from delivery_tracker.summary import CABINET_COUNTERS
+
+
+EMAILS = {
+    'finish_registration': {
+        'registration_link': 'example.com/tracker/finish_registration/x/'},
+    'restore_password': {'new_password': 'secret123'},
+}
+
+CACHED_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+
+def loader_configs():
+    """``{name: TEMPLATES}`` without and with the cached loader."""
+    uncached = copy.deepcopy(settings.TEMPLATES)
+    uncached[0]['OPTIONS'].pop('loaders', None)
+    uncached[0]['APP_DIRS'] = True
+    cached = copy.deepcopy(uncached)
+    del cached[0]['APP_DIRS']
+    cached[0]['OPTIONS']['loaders'] = CACHED_LOADERS
+    return {'app_directories': uncached, 'cached': cached}
+
+
+class Command(BaseCommand):
+    help = ('Reports render time per email (two render_to_string calls and '
+            'the emails service) and per page (base.html, cabinet.html) '
+            'without and with the cached template loader')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        report = {}
+        for name, templates in sorted(loader_configs().items()):
+            with override_settings(TEMPLATES=templates, DEBUG=False):
+                report[name] = self.run(options['repeat'])
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+
+    def run(self, repeat):
+        result = {}
+        for name, context in sorted(EMAILS.items()):
+            def render_pair(i):
+                render_to_string(TEMPLATE_PATTERN % (name, 'txt'), context)
+                render_to_string(TEMPLATE_PATTERN % (name, 'html'), context)
+
+            def render_service(i):
+                render_email(name, context)
+
+            result['email %s render_to_string' % name] = summarize(
+                timed(render_pair, repeat))
+            result['email %s render_email' % name] = summarize(
+                timed(render_service, repeat))
+
+        request = RequestFactory().get('/tracker/cabinet/')
+        request.user = User(username='bench@example.com', first_name='Bench')
+        pages = [
+            ('delivery_tracker/base.html', {}),
+            ('delivery_tracker/cabinet.html', {
+                'counters': [(label, 3, 12345)
+                             for label, _ in CABINET_COUNTERS],
+                'awaiting_payment': 4,
+                'cabinet_cache_timeout': settings.CABINET_CACHE_TIMEOUT,
+            }),
+        ]
+        for template_name, context in pages:
+            def render_page(i):
+                render_to_string(template_name, context, request=request)
+
+            result['page %s' % template_name] = summarize(
+                timed(render_page, repeat))
+        return result
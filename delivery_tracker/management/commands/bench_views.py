@@ -0,0 +1,220 @@
+import json
+import platform
+import subprocess
+import threading
+import time
+from http.client import HTTPConnection
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.test.utils import override_settings
+
+from delivery_tracker.bench import (
+    scratch_database, seed_tracker_data, summarize
+)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def scenarios():
+    """``(name, method, url, POST data or None, logged in)``"""
+    return [
+        ('login', 'GET', reverse('login'), None, False),
+        ('login_post', 'POST', reverse('login'),
+         {'username': 'bench0@example.com', 'password': 'wrong'}, False),
+        ('register', 'GET', reverse('register'), None, False),
+        ('register_post', 'POST', reverse('register'),
+         {'username': 'new%(i)d@example.com', 'password': 'secret123'},
+         False),
+        # a followed link is deleted, so every request after the first one
+        # would be rejected anyway: measure the rejection of an unknown link
+        ('finish_registration_rejected', 'GET',
+         reverse('finish_registration', args=['unknown']), None, False),
+        ('cabinet', 'GET', reverse('cabinet'), None, True),
+        ('cabinet_orders', 'GET', reverse('cabinet_orders'), None, True),
+        ('personal_data', 'GET', reverse('cabinet_personal_data'), None,
+         True),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Seeds a scratch database, drives the tracker views through the '
+            'test client and a local WSGI server and prints latency '
+            'percentiles and throughput as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--inactive-users', type=int, default=50)
+        parser.add_argument('--orders-per-user', type=int, default=20)
+        parser.add_argument('--products-per-order', type=int, default=5)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Parallel clients against the WSGI server')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario, can be repeated')
+        parser.add_argument('--output', default=None,
+                            help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(
+                DEBUG=False, ALLOWED_HOSTS=['testserver', '127.0.0.1'],
+                PERF_INSTRUMENTATION=False):
+            report = self.run(options)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def run(self, options):
+        start = time.time()
+        users = seed_tracker_data(options['users'],
+                                  options['orders_per_user'],
+                                  options['products_per_order'],
+                                  inactive_users=options['inactive_users'])
+        seed_time = time.time() - start
+
+        selected = [s for s in scenarios()
+                    if not options['scenarios'] or
+                    s[0] in options['scenarios']]
+        return {
+            'meta': self.meta(options, seed_time),
+            'client': self.run_client(selected, users, options),
+            'wsgi': self.run_wsgi(selected, users, options),
+        }
+
+    def meta(self, options, seed_time):
+        try:
+            commit = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'],
+                stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.platform(),
+            'seed_seconds': round(seed_time, 2),
+            'users': options['users'],
+            'orders_per_user': options['orders_per_user'],
+            'products_per_order': options['products_per_order'],
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+        }
+
+    def run_client(self, selected, users, options):
+        """Sequential requests through the Django test client."""
+        results = {}
+        for name, method, url, data, logged_in in selected:
+            client = Client()
+            if logged_in:
+                client.force_login(users[0])
+
+            def request(i):
+                if method == 'GET':
+                    response = client.get(url)
+                else:
+                    response = client.post(url, dict(
+                        (k, v % {'i': i}) for k, v in data.items()))
+                assert response.status_code < 500, (name,
+                                                    response.status_code)
+
+            begin = time.time()
+            samples = []
+            for i in range(options['requests']):
+                request_start = time.time()
+                request(i)
+                samples.append(time.time() - request_start)
+            results[name] = summarize(samples)
+            results[name]['rps'] = round(
+                options['requests'] / (time.time() - begin), 1)
+        return results
+
+    def run_wsgi(self, selected, users, options):
+        """
+        Concurrent GET requests against a threaded local WSGI server.
+        POST scenarios need CSRF tokens and are left to the test client.
+        """
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=ThreadingWSGIServer,
+                             handler_class=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        port = server.server_address[1]
+
+        cookies = []
+        for user in users[:options['concurrency']]:
+            client = Client()
+            client.force_login(user)
+            cookies.append('%s=%s' % (
+                settings.SESSION_COOKIE_NAME,
+                client.cookies[settings.SESSION_COOKIE_NAME].value))
+
+        results = {}
+        try:
+            for name, method, url, data, logged_in in selected:
+                if method != 'GET':
+                    continue
+                results[name] = self.run_concurrent(
+                    port, url, cookies if logged_in else None, options)
+        finally:
+            server.shutdown()
+            server.server_close()
+        return results
+
+    def run_concurrent(self, port, url, cookies, options):
+        concurrency = options['concurrency']
+        per_client = max(1, options['requests'] // concurrency)
+        samples = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(n):
+            headers = {}
+            if cookies:
+                headers['Cookie'] = cookies[n % len(cookies)]
+            local_samples = []
+            for _ in range(per_client):
+                start = time.time()
+                conn = HTTPConnection('127.0.0.1', port, timeout=30)
+                conn.request('GET', url, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                local_samples.append(time.time() - start)
+                if response.status >= 400:
+                    errors.append(response.status)
+            with lock:
+                samples.extend(local_samples)
+
+        threads = [threading.Thread(target=worker, args=(n, ))
+                   for n in range(concurrency)]
+        begin = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - begin
+
+        result = summarize(samples)
+        result['rps'] = round(len(samples) / elapsed, 1)
+        result['errors'] = len(errors)
+        return result
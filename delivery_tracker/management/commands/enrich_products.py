@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.enrichment import enrich_products
+from delivery_tracker.models import Product
+
+
+class Command(BaseCommand):
+    help = ('Fetches the product pages and fills empty names, vendor codes '
+            'and prices from them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, default=None,
+                            help='Only the products of this user id')
+        parser.add_argument('--concurrency', type=int, default=None)
+        parser.add_argument('--host-interval', type=float, default=None)
+        parser.add_argument('--timeout', type=float, default=None)
+
+    def handle(self, *args, **options):
+        products = None
+        if options['user']:
+            products = Product.objects.filter(user_id=options['user'])
+        result = enrich_products(products,
+                                 concurrency=options['concurrency'],
+                                 host_interval=options['host_interval'],
+                                 timeout=options['timeout'])
+        self.stdout.write(
+            'Links: %d, fetched: %d, cached: %d, failed: %d, updated: %d' % (
+                result.links, result.fetched, result.cached, result.failed,
+                result.updated))
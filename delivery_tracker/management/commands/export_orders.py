@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from delivery_tracker import exports
+
+
+class Command(BaseCommand):
+    help = ('Exports all purchase orders with their products, statuses and '
+            'users as CSV (or XLSX when xlsxwriter is installed)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-',
+                            help='File to write, standard output by default')
+        parser.add_argument('--format', choices=('csv', 'xlsx'),
+                            default='csv')
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rows = exports.export_rows(chunk_size=options['chunk_size'])
+        if options['format'] == 'xlsx':
+            if exports.xlsxwriter is None:
+                raise CommandError('XLSX export needs the xlsxwriter package')
+            if options['output'] == '-':
+                raise CommandError('XLSX can only be written to a file')
+            exports.write_xlsx(rows, options['output'])
+        elif options['output'] == '-':
+            for line in exports.csv_lines(rows):
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as f:
+                csv.writer(f).writerows(rows)
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from delivery_tracker.importers import FORMATS, guess_format, import_products
+from delivery_tracker.models import PurchaseOrder
+
+
+class Command(BaseCommand):
+    help = 'Imports products for a user from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True,
+                            help='Email of the products owner')
+        parser.add_argument('--format', choices=FORMATS, default=None)
+        parser.add_argument('--order', type=int, default=None,
+                            help='Attach products to this purchase order')
+        parser.add_argument('--new-order', action='store_true',
+                            help='Create a purchase order for the products')
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('No user with email %s' % options['user'])
+
+        purchase_order = None
+        if options['order'] is not None:
+            try:
+                purchase_order = PurchaseOrder.objects.get(
+                    pk=options['order'], user=user)
+            except PurchaseOrder.DoesNotExist:
+                raise CommandError('No order %s for this user' %
+                                   options['order'])
+
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError('JSON documents are not supported, convert '
+                               'the file to JSON Lines or pass --format')
+        with open(options['path'], 'rb') as f:
+            result = import_products(
+                f, fmt, user,
+                purchase_order=purchase_order,
+                new_order=options['new_order'],
+                chunk_size=options['chunk_size'],
+            )
+
+        for line_no, errors in result.errors:
+            for field, messages in sorted(errors.items()):
+                self.stderr.write('line %d: %s: %s' %
+                                  (line_no, field, ' '.join(messages)))
+        if result.purchase_order is not None:
+            self.stdout.write('Purchase order: %d' % result.purchase_order.pk)
+        self.stdout.write('Imported: %d, rejected: %d' %
+                          (result.created, result.error_count))
@@ -0,0 +1,64 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.bench import percentile
+
+
+METRICS = ('total_ms', 'db_ms', 'queries', 'template_ms',
+           'mail_queue_ms')
+
+
+class Command(BaseCommand):
+    help = ('Aggregates the request log written by PerformanceMiddleware '
+            'into per-view percentiles')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Log files, PERF_LOG_FILE by default')
+        parser.add_argument('--view', action='append', dest='views',
+                            help='Only report this url name, can be repeated')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        samples = {}
+        for path in options['paths'] or [settings.PERF_LOG_FILE]:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(entry, dict) or 'view' not in entry:
+                        continue
+                    views = options['views']
+                    if views and entry['view'] not in views:
+                        continue
+                    view_samples = samples.setdefault(
+                        entry['view'], dict((m, []) for m in METRICS))
+                    for metric in METRICS:
+                        view_samples[metric].append(entry.get(metric, 0))
+
+        report = {}
+        for view, view_samples in sorted(samples.items()):
+            report[view] = {'count': len(view_samples['total_ms'])}
+            for metric in METRICS:
+                for p in (50, 95, 99):
+                    report[view]['%s_p%d' % (metric, p)] = percentile(
+                        view_samples[metric], p)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+            return
+
+        header = '%-24s %7s %9s %9s %9s %8s %8s %8s' % (
+            'view', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'db p95',
+            'queries', 'tpl p95')
+        self.stdout.write(header)
+        for view, row in sorted(report.items()):
+            self.stdout.write('%-24s %7d %9.1f %9.1f %9.1f %8.1f %8d %8.1f' % (
+                view, row['count'], row['total_ms_p50'], row['total_ms_p95'],
+                row['total_ms_p99'], row['db_ms_p95'], row['queries_p95'],
+                row['template_ms_p95']))
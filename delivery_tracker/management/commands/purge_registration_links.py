@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.registration import purge_expired_links
+
+
+class Command(BaseCommand):
+    help = ('Deletes expired registration links and the users that never '
+            'activated their account')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        total_links = total_users = 0
+        while True:
+            links, users = purge_expired_links(options['batch_size'])
+            if not links:
+                break
+            total_links += links
+            total_users += users
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write('Deleted links: %d, users: %d' % (total_links,
+                                                            total_users))
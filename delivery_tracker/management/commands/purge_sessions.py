@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Deletes expired rows of django_session in small transactions, '
+            'unlike clearsessions which removes them in one statement')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in (
+                settings.SESSION_ENGINES['db'],
+                settings.SESSION_ENGINES['cached_db']):
+            self.stdout.write('%s sessions expire by themselves'
+                              % settings.SESSION_STRATEGY)
+            return
+
+        batch_size = (options['batch_size'] or
+                      settings.SESSION_PURGE_BATCH_SIZE)
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                keys = list(
+                    Session.objects.filter(expire_date__lt=now)
+                    .values_list('session_key', flat=True)[:batch_size]
+                )
+                if not keys:
+                    break
+                Session.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write('Deleted sessions: %d' % deleted)
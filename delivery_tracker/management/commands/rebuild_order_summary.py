@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.summary import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the cabinet order counters from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='user_ids',
+                            help='Rebuild only this user id, can be repeated')
+
+    def handle(self, *args, **options):
+        count = rebuild_summaries(options['user_ids'])
+        self.stdout.write('Rebuilt %d summary rows' % count)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.models import PurchaseOrder
+from delivery_tracker.shipping import requote_orders
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the shipping cost of unpaid orders with parcel data '
+            'from the current tariffs')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--all-statuses', action='store_true',
+                            help='Also requote paid and finished orders')
+
+    def handle(self, *args, **options):
+        orders = None
+        if options['all_statuses']:
+            orders = PurchaseOrder.objects.all()
+        updated, unknown = requote_orders(orders, options['batch_size'])
+        self.stdout.write('Updated: %d, unknown zone: %d' % (updated,
+                                                             unknown))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from delivery_tracker.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Sends emails waiting in the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the outbox instead of exiting when it is empty'
+        )
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to sleep between polls in --loop')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_mail(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write('Sent: %d, failed: %d' % (total_sent, total_failed))
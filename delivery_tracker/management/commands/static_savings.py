@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+
+from delivery_tracker.storage import CompressedManifestStaticFilesStorage
+
+
+class Command(BaseCommand):
+    help = ('Compares the collected static files (hashed, optimized and '
+            'precompressed) with their sources and reports the byte savings')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true',
+                            help='Print the per file numbers as JSON')
+
+    def handle(self, *args, **options):
+        storage = CompressedManifestStaticFilesStorage()
+        hashed_files = storage.load_manifest()
+        if not hashed_files:
+            raise CommandError('No %s in STATIC_ROOT, run collectstatic '
+                               'with the compressed manifest storage first'
+                               % storage.manifest_name)
+
+        rows = []
+        for name, hashed_name in sorted(hashed_files.items()):
+            source = finders.find(name)
+            if not source or not storage.exists(hashed_name):
+                continue
+            with open(source, 'rb') as f:
+                source_size = len(f.read())
+            row = {
+                'name': hashed_name,
+                'source': source_size,
+                'collected': storage.size(hashed_name),
+            }
+            for suffix in ('.gz', '.br'):
+                if storage.exists(hashed_name + suffix):
+                    row[suffix[1:]] = storage.size(hashed_name + suffix)
+            # what a client that accepts every encoding downloads
+            row['served'] = min(row[key] for key in ('collected', 'gz', 'br')
+                                if key in row)
+            rows.append(row)
+
+        totals = dict((key, sum(r[key] for r in rows))
+                      for key in ('source', 'collected', 'served'))
+        if options['json']:
+            self.stdout.write(json.dumps({'files': rows, 'totals': totals},
+                                         indent=2, sort_keys=True))
+            return
+
+        for row in rows:
+            variants = ', '.join('%s %d' % (key, row[key])
+                                 for key in ('gz', 'br') if key in row)
+            self.stdout.write('%-60s %9d -> %9d %s' % (
+                row['name'], row['source'], row['served'], variants))
+        saved = totals['source'] - totals['served']
+        self.stdout.write('Total: %d -> %d bytes, %d saved (%.1f%%)' % (
+            totals['source'], totals['served'], saved,
+            100.0 * saved / (totals['source'] or 1)))
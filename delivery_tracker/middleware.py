@@ -0,0 +1,107 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from delivery_tracker import perf, routers
+
+
+logger = logging.getLogger('delivery_tracker.perf')
+
+
+class PerformanceMiddleware(object):
+    """
+    Records wall time, DB queries, template time and the time spent queueing
+    emails of every request when PERF_INSTRUMENTATION is on. The numbers go
+    to a Server-Timing header and to one JSON line of the
+    ``delivery_tracker.perf`` logger, which the perf_report command
+    aggregates.
+    """
+
+    def process_request(self, request):
+        if not settings.PERF_INSTRUMENTATION:
+            return
+        perf.start_record()
+        request._perf_queries = {}
+        for connection in connections.all():
+            request._perf_queries[connection.alias] = (
+                connection.force_debug_cursor, len(connection.queries_log))
+            connection.force_debug_cursor = True
+
+    def process_response(self, request, response):
+        record = perf.finish_record()
+        if record is None or not hasattr(request, '_perf_queries'):
+            return response
+
+        total = time.time() - record.start
+        query_count, db_time = self._collect_queries(request)
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = (resolver_match and resolver_match.url_name) or 'unresolved'
+        template_time = record.timings.get('template', 0)
+        mail_queue_time = record.timings.get('mail_queue', 0)
+
+        response['Server-Timing'] = ', '.join([
+            'total;dur=%.1f' % (total * 1000),
+            'db;dur=%.1f;desc="%d queries"' % (db_time * 1000, query_count),
+            'tpl;dur=%.1f' % (template_time * 1000),
+            'mailq;dur=%.1f' % (mail_queue_time * 1000),
+        ])
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(db_time * 1000, 2),
+            'queries': query_count,
+            'template_ms': round(template_time * 1000, 2),
+            'mail_queue_ms': round(mail_queue_time * 1000, 2),
+        }, sort_keys=True))
+
+        budget = settings.PERF_QUERY_BUDGETS.get(
+            view, settings.PERF_DEFAULT_QUERY_BUDGET)
+        if budget is not None and query_count > budget:
+            logger.warning('%s made %d queries, budget is %d',
+                           view, query_count, budget)
+        return response
+
+    def _collect_queries(self, request):
+        query_count = 0
+        db_time = 0.0
+        for connection in connections.all():
+            if connection.alias not in request._perf_queries:
+                continue
+            forced, start = request._perf_queries[connection.alias]
+            queries = list(connection.queries_log)[start:]
+            query_count += len(queries)
+            db_time += sum(float(q['time']) for q in queries)
+            connection.force_debug_cursor = forced
+            if not (forced or settings.DEBUG):
+                # nobody else reads the log, keep it short
+                connection.queries_log.clear()
+        return query_count, db_time
+
+
+class ReplicaPinMiddleware(object):
+    """
+    Starts every request unpinned, see delivery_tracker.routers. A
+    request that wrote sets a short lived cookie so the next one (usually
+    the redirect after a POST) keeps reading from the primary until the
+    replica caught up. Requests pinned by the cookie without writing do
+    not renew it, so it expires REPLICA_PIN_SECONDS after the last write.
+    """
+
+    def process_request(self, request):
+        routers.reset()
+        if (settings.REPLICA_DATABASE and
+                settings.REPLICA_PIN_COOKIE_NAME in request.COOKIES):
+            routers.pin_to_primary()
+
+    def process_response(self, request, response):
+        if settings.REPLICA_DATABASE and routers.wrote():
+            response.set_cookie(settings.REPLICA_PIN_COOKIE_NAME, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        routers.reset()
+        return response
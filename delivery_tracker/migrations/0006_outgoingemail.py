@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 06:35
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0005_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField()),
+                ('send_after', models.DateTimeField()),
+                ('sent_date', models.DateTimeField(blank=True, null=True)),
+                ('status', models.SmallIntegerField(choices=[(0, 'Pending'), (1, 'Sent'), (2, 'Failed')], default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('subject', models.CharField(max_length=255)),
+                ('from_email', models.CharField(max_length=254)),
+                ('recipients', models.TextField()),
+                ('body_text', models.TextField()),
+                ('body_html', models.TextField(blank=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'outgoing_email',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='outgoingemail',
+            index_together=set([('status', 'send_after')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 06:35
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('delivery_tracker', '0006_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserOrderSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='delivery_tracker.PurchaseOrderStatus')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_order_summary',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='userordersummary',
+            unique_together=set([('user', 'status')]),
+        ),
+    ]
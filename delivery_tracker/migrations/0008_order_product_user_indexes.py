@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 06:39
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0007_userordersummary'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='product',
+            index_together=set([('user', 'purchase_order')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='purchaseorder',
+            index_together=set([('user', 'status')]),
+        ),
+    ]
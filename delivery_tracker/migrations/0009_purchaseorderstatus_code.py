@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+STATUSES = (
+    (1, 'draft', u'Черновик'),
+    (2, 'cancelled', u'Отменено'),
+    (3, 'requested', u'Запрошено'),
+    (4, 'awaiting_payment', u'Ожидает оплаты'),
+    (5, 'in_progress', u'Заказ исполняется'),
+    (6, 'awaiting_delivery', u'Ожидается поступление на склад'),
+    (7, 'partially_received', u'Частично получено'),
+    (8, 'received', u'Получено на склад'),
+)
+
+
+def create_statuses(apps, schema_editor):
+    # Statuses used to be created by hand in this order, so existing rows
+    # only get their codes.
+    PurchaseOrderStatus = apps.get_model('delivery_tracker',
+                                         'PurchaseOrderStatus')
+    for pk, code, description in STATUSES:
+        updated = PurchaseOrderStatus.objects.filter(pk=pk).update(code=code)
+        if not updated:
+            PurchaseOrderStatus.objects.create(pk=pk, code=code,
+                                               description=description)
+    for status in PurchaseOrderStatus.objects.filter(code__isnull=True):
+        status.code = 'status_%d' % status.pk
+        status.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0008_order_product_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorderstatus',
+            name='code',
+            field=models.SlugField(max_length=32, null=True),
+        ),
+        migrations.RunPython(create_statuses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='purchaseorderstatus',
+            name='code',
+            field=models.SlugField(max_length=32, unique=True),
+        ),
+    ]
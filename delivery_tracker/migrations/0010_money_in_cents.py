@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def to_cents(table, old, new):
+    return migrations.RunSQL(
+        ['UPDATE %s SET %s = CAST(ROUND(%s * 100) AS INTEGER)' %
+         (table, new, old)],
+        ['UPDATE %s SET %s = %s / 100.0' % (table, old, new)],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0009_purchaseorderstatus_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='price_cents',
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='shipping_cost_cents',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userordersummary',
+            name='total_cents',
+            field=models.IntegerField(default=0),
+        ),
+        to_cents('product', 'price', 'price_cents'),
+        to_cents('purchase_order', 'shipping_cost', 'shipping_cost_cents'),
+        to_cents('user_order_summary', 'total', 'total_cents'),
+        migrations.RemoveField(
+            model_name='product',
+            name='price',
+        ),
+        migrations.RemoveField(
+            model_name='purchaseorder',
+            name='shipping_cost',
+        ),
+        migrations.RemoveField(
+            model_name='userordersummary',
+            name='total',
+        ),
+    ]
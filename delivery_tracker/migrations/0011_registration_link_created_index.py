@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 06:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0010_money_in_cents'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userregistrationlink',
+            name='created_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
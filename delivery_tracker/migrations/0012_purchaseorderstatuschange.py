@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 07:01
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('delivery_tracker', '0011_registration_link_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseOrderStatusChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField()),
+                ('comment', models.CharField(blank=True, max_length=255)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('from_status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_tracker.PurchaseOrderStatus')),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='delivery_tracker.PurchaseOrder')),
+                ('to_status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_tracker.PurchaseOrderStatus')),
+            ],
+            options={
+                'db_table': 'purchase_order_status_change',
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import DatabaseError, migrations
+
+
+# Frozen copy of the DDL in delivery_tracker/search.py as of this migration,
+# so later changes there do not change what this migration does.
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE product_fts USING fts5("
+    "name, vendor_code, shop_link, note, content='product', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO product_fts(product_fts) VALUES ('rebuild')",
+]
+FTS_TRIGGERS_SQL = [
+    "CREATE TRIGGER product_fts_insert AFTER INSERT ON product BEGIN "
+    "INSERT INTO product_fts(rowid, name, vendor_code, shop_link, note) "
+    "VALUES (new.id, new.name, new.vendor_code, new.shop_link, new.note); "
+    "END",
+    "CREATE TRIGGER product_fts_delete AFTER DELETE ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, vendor_code, "
+    "shop_link, note) VALUES ('delete', old.id, old.name, old.vendor_code, "
+    "old.shop_link, old.note); "
+    "END",
+    "CREATE TRIGGER product_fts_update AFTER UPDATE ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, vendor_code, "
+    "shop_link, note) VALUES ('delete', old.id, old.name, old.vendor_code, "
+    "old.shop_link, old.note); "
+    "INSERT INTO product_fts(rowid, name, vendor_code, shop_link, note) "
+    "VALUES (new.id, new.name, new.vendor_code, new.shop_link, new.note); "
+    "END",
+]
+DROP_FTS_SQL = [
+    'DROP TRIGGER IF EXISTS product_fts_insert',
+    'DROP TRIGGER IF EXISTS product_fts_delete',
+    'DROP TRIGGER IF EXISTS product_fts_update',
+    'DROP TABLE IF EXISTS product_fts',
+]
+
+
+def create_index(apps, schema_editor):
+    # SQLite builds without FTS5 are left alone, search falls back to LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        for sql in DROP_FTS_SQL + FTS_SQL + FTS_TRIGGERS_SQL:
+            schema_editor.execute(sql)
+    except DatabaseError:
+        # no fts5 module
+        for sql in DROP_FTS_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_FTS_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0012_purchaseorderstatuschange'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 07:09
+from __future__ import unicode_literals
+
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import DatabaseError, migrations, models
+
+
+BATCH_SIZE = 1000
+
+# Frozen copies of delivery_tracker.utils.link_hash and of the search index
+# DDL of delivery_tracker/search.py as of this migration, so later changes
+# there do not change what this migration writes.
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+TRACKING_PARAMS = frozenset([
+    'gclid', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'igshid', 'ref', 'ref_src',
+    'spm', 'srsltid',
+])
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_')
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE product_fts USING fts5("
+    "name, vendor_code, shop_link, note, content='product', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO product_fts(product_fts) VALUES ('rebuild')",
+]
+FTS_TRIGGERS_SQL = [
+    "CREATE TRIGGER product_fts_insert AFTER INSERT ON product BEGIN "
+    "INSERT INTO product_fts(rowid, name, vendor_code, shop_link, note) "
+    "VALUES (new.id, new.name, new.vendor_code, new.shop_link, new.note); "
+    "END",
+    "CREATE TRIGGER product_fts_delete AFTER DELETE ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, vendor_code, "
+    "shop_link, note) VALUES ('delete', old.id, old.name, old.vendor_code, "
+    "old.shop_link, old.note); "
+    "END",
+    "CREATE TRIGGER product_fts_update AFTER UPDATE ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, vendor_code, "
+    "shop_link, note) VALUES ('delete', old.id, old.name, old.vendor_code, "
+    "old.shop_link, old.note); "
+    "INSERT INTO product_fts(rowid, name, vendor_code, shop_link, note) "
+    "VALUES (new.id, new.name, new.vendor_code, new.shop_link, new.note); "
+    "END",
+]
+DROP_FTS_SQL = [
+    'DROP TRIGGER IF EXISTS product_fts_insert',
+    'DROP TRIGGER IF EXISTS product_fts_delete',
+    'DROP TRIGGER IF EXISTS product_fts_update',
+    'DROP TABLE IF EXISTS product_fts',
+]
+
+
+def link_hash(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = '%s:%d' % (host, parts.port)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and
+        not name.lower().startswith(TRACKING_PREFIXES)
+    ]
+    canonical = urlunsplit((scheme, netloc, parts.path or '/',
+                            urlencode(query), ''))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def fill_link_hashes(apps, schema_editor):
+    Product = apps.get_model('delivery_tracker', 'Product')
+    products = Product.objects.using(schema_editor.connection.alias)
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(products.filter(id__gt=last_id).order_by('id')
+                         .values_list('id', 'product_link')[:BATCH_SIZE])
+            if not batch:
+                break
+            cursor.executemany(
+                'UPDATE product SET link_hash = %s WHERE id = %s',
+                [(link_hash(link), product_id) for product_id, link in batch])
+            last_id = batch[-1][0]
+
+
+def reinstall_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        for sql in DROP_FTS_SQL + FTS_SQL + FTS_TRIGGERS_SQL:
+            schema_editor.execute(sql)
+    except DatabaseError:
+        # no fts5 module
+        for sql in DROP_FTS_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_tracker', '0014_purchaseorder_parcel'),
+    ]
+
+    # SQLite adds and removes columns by copying the table, which drops the
+    # triggers that keep the search index in sync: they are reinstalled
+    # after the copy either way
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_fts),
+        migrations.AddField(
+            model_name='product',
+            name='link_hash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=40),
+        ),
+        migrations.RunPython(fill_link_hashes, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_fts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 07:15
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def date_status_changes(apps, schema_editor):
+    # the new column holds the migration time, orders with an audit trail
+    # get the date of their last status change instead
+    schema_editor.execute(
+        'UPDATE purchase_order SET status_changed_date = ('
+        'SELECT MAX(created_date) FROM purchase_order_status_change c '
+        'WHERE c.purchase_order_id = purchase_order.id) '
+        'WHERE id IN (SELECT purchase_order_id '
+        'FROM purchase_order_status_change)'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('delivery_tracker', '0015_product_link_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProduct',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('shop_link', models.CharField(blank=True, max_length=1024, null=True)),
+                ('product_link', models.CharField(max_length=1024)),
+                ('vendor_code', models.CharField(blank=True, max_length=64, null=True)),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+                ('color', models.CharField(max_length=32)),
+                ('size', models.CharField(max_length=32)),
+                ('quantity', models.IntegerField()),
+                ('price_cents', models.IntegerField()),
+                ('discount_code', models.CharField(blank=True, max_length=64, null=True)),
+                ('discount_in_shop', models.CharField(blank=True, max_length=64, null=True)),
+                ('note', models.CharField(blank=True, max_length=255, null=True)),
+                ('link_hash', models.CharField(db_index=True, default='', max_length=40)),
+            ],
+            options={
+                'db_table': 'product_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPurchaseOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('shipping_cost_cents', models.IntegerField(default=0)),
+                ('shipping_zone', models.CharField(blank=True, default='', max_length=16)),
+                ('weight_grams', models.IntegerField(blank=True, null=True)),
+                ('volume_cm3', models.IntegerField(blank=True, null=True)),
+                ('coupon', models.CharField(max_length=64)),
+                ('user_comment', models.CharField(max_length=255)),
+                ('admin_comment', models.CharField(max_length=255)),
+                ('status_changed_date', models.DateTimeField()),
+                ('archived_date', models.DateTimeField()),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='delivery_tracker.PurchaseOrderStatus')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'purchase_order_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPurchaseOrderStatusChange',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('created_date', models.DateTimeField()),
+                ('comment', models.CharField(blank=True, max_length=255)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('from_status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_tracker.PurchaseOrderStatus')),
+                ('purchase_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='delivery_tracker.ArchivedPurchaseOrder')),
+                ('to_status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='delivery_tracker.PurchaseOrderStatus')),
+            ],
+            options={
+                'db_table': 'purchase_order_status_change_archive',
+            },
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='status_changed_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterIndexTogether(
+            name='purchaseorder',
+            index_together=set([('status', 'status_changed_date'), ('user', 'status')]),
+        ),
+        migrations.AddField(
+            model_name='archivedproduct',
+            name='purchase_order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_set', to='delivery_tracker.ArchivedPurchaseOrder'),
+        ),
+        migrations.AddField(
+            model_name='archivedproduct',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterIndexTogether(
+            name='archivedpurchaseorder',
+            index_together=set([('user', 'status')]),
+        ),
+        migrations.RunPython(date_status_changes, migrations.RunPython.noop),
+    ]
@@ -1,22 +1,66 @@
-from django.db import models
+import datetime
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from delivery_tracker.utils import link_hash
+
+
+def registration_link_expiry_date():
+    """Links created before this moment are expired."""
+    return timezone.now() - datetime.timedelta(
+        days=settings.REGISTRATION_LINK_TTL_DAYS)
+
+
+class UserRegistrationLinkQuerySet(models.QuerySet):
+
+    def expired(self):
+        return self.filter(created_date__lt=registration_link_expiry_date())
+
+    def create_for(self, user, attempts=5):
+        """
+        Create a link with a random slug. A clash with an existing slug is
+        left to the unique constraint instead of being checked beforehand.
+        """
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    return self.create(user=user, slug=uuid4().hex,
+                                       created_date=timezone.now())
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
 
 
 class UserRegistrationLink(models.Model):
-    created_date = models.DateTimeField()
+    created_date = models.DateTimeField(db_index=True)
     user = models.ForeignKey('auth.User')
     slug = models.CharField(max_length=32, unique=True)
 
+    objects = UserRegistrationLinkQuerySet.as_manager()
+
     class Meta:
         db_table = 'user_registration_link'
 
+    def is_expired(self):
+        return self.created_date < registration_link_expiry_date()
+
 
 class PurchaseOrderStatus(models.Model):
-    # Table init
-    # statuses = (
-    #   "Черновик", "Отменено", "Запрошено", "Ожидает оплаты",
-    #   "Заказ исполнятеся", "Ожидается послупление на склад",
-    #   "Частично получено", "Получено насклад")
-    # [PurchaseOrderStatus.objects.create(description=s) for s in statuses]
+    # Stable codes, the rows themselves are created by migration 0009.
+    # Use delivery_tracker.statuses to resolve them without a query.
+    DRAFT = 'draft'
+    CANCELLED = 'cancelled'
+    REQUESTED = 'requested'
+    AWAITING_PAYMENT = 'awaiting_payment'
+    IN_PROGRESS = 'in_progress'
+    AWAITING_DELIVERY = 'awaiting_delivery'
+    PARTIALLY_RECEIVED = 'partially_received'
+    RECEIVED = 'received'
+
+    code = models.SlugField(max_length=32, unique=True)
     description = models.CharField(max_length=64)
 
     class Meta:
@@ -26,13 +70,50 @@ class PurchaseOrderStatus(models.Model):
 class PurchaseOrder(models.Model):
     user = models.ForeignKey('auth.User')
     status = models.ForeignKey(PurchaseOrderStatus)
-    shipping_cost = models.FloatField(default=0)
+    # euro cents
+    shipping_cost_cents = models.IntegerField(default=0)
+    # parcel data for delivery_tracker.shipping, empty until it is packed
+    shipping_zone = models.CharField(max_length=16, blank=True, default='')
+    weight_grams = models.IntegerField(blank=True, null=True)
+    volume_cm3 = models.IntegerField(blank=True, null=True)
     coupon = models.CharField(max_length=64)
     user_comment = models.CharField(max_length=255)
     admin_comment = models.CharField(max_length=255)
+    # set whenever the status changes, delivery_tracker.archive moves
+    # finished orders by it
+    status_changed_date = models.DateTimeField(default=timezone.now,
+                                               editable=False)
 
     class Meta:
         db_table = 'purchase_order'
+        index_together = [('user', 'status'),
+                          ('status', 'status_changed_date')]
+
+
+# link hashes per ProductQuerySet.same_items query
+LOOKUP_BATCH_SIZE = 500
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def same_item(self, link):
+        """Products whose link is ``link`` up to case and tracking noise."""
+        return self.filter(link_hash=link_hash(link))
+
+    def same_items(self, links, hashed=False):
+        """
+        Iterate over the products matching any of ``links`` (``link_hash``
+        values if ``hashed``), LOOKUP_BATCH_SIZE links per query so any
+        number of links stays under SQLite's 999 parameters. Filters,
+        ordering and ``values_list`` of the queryset apply to every query;
+        the products of one link always come from the same query.
+        """
+        hashes = sorted(set(
+            links if hashed else (link_hash(link) for link in links)))
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            for item in self.filter(
+                    link_hash__in=hashes[start:start + LOOKUP_BATCH_SIZE]):
+                yield item
 
 
 class Product(models.Model):
@@ -45,10 +126,152 @@ class Product(models.Model):
     color = models.CharField(max_length=32)
     size = models.CharField(max_length=32)
     quantity = models.IntegerField()
-    price = models.FloatField()
+    # euro cents
+    price_cents = models.IntegerField()
     discount_code = models.CharField(max_length=64, blank=True, null=True)
     discount_in_shop = models.CharField(max_length=64, blank=True, null=True)
     note = models.CharField(max_length=255, blank=True, null=True)
+    # delivery_tracker.utils.link_hash of product_link, set by save();
+    # bulk_create and update() callers have to fill it themselves
+    link_hash = models.CharField(max_length=40, db_index=True, editable=False,
+                                 default='')
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         db_table = 'product'
+        index_together = [('user', 'purchase_order')]
+
+    def save(self, *args, **kwargs):
+        self.link_hash = link_hash(self.product_link)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'product_link' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'link_hash'}
+        super(Product, self).save(*args, **kwargs)
+
+
+class UserOrderSummary(models.Model):
+    """
+    Denormalized order counters for the cabinet sidebar, one row per user
+    and status. Kept up to date by delivery_tracker.signals, rebuilt with
+    the rebuild_order_summary command.
+    """
+    user = models.ForeignKey('auth.User')
+    status = models.ForeignKey(PurchaseOrderStatus)
+    order_count = models.IntegerField(default=0)
+    # euro cents, products price * quantity plus shipping
+    total_cents = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'user_order_summary'
+        unique_together = [('user', 'status')]
+
+
+class PurchaseOrderStatusChange(models.Model):
+    """
+    Audit history of order statuses, written in bulk by
+    delivery_tracker.transitions.
+    """
+    purchase_order = models.ForeignKey(PurchaseOrder)
+    from_status = models.ForeignKey(PurchaseOrderStatus, related_name='+')
+    to_status = models.ForeignKey(PurchaseOrderStatus, related_name='+')
+    changed_by = models.ForeignKey('auth.User', blank=True, null=True)
+    created_date = models.DateTimeField()
+    comment = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        db_table = 'purchase_order_status_change'
+
+
+class ArchivedPurchaseOrder(models.Model):
+    """
+    A finished order moved out of ``purchase_order`` by
+    delivery_tracker.archive, under its original id. Read only.
+    """
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey('auth.User')
+    status = models.ForeignKey(PurchaseOrderStatus)
+    # euro cents
+    shipping_cost_cents = models.IntegerField(default=0)
+    shipping_zone = models.CharField(max_length=16, blank=True, default='')
+    weight_grams = models.IntegerField(blank=True, null=True)
+    volume_cm3 = models.IntegerField(blank=True, null=True)
+    coupon = models.CharField(max_length=64)
+    user_comment = models.CharField(max_length=255)
+    admin_comment = models.CharField(max_length=255)
+    status_changed_date = models.DateTimeField()
+    archived_date = models.DateTimeField()
+
+    class Meta:
+        db_table = 'purchase_order_archive'
+        index_together = [('user', 'status')]
+
+
+class ArchivedProduct(models.Model):
+    id = models.IntegerField(primary_key=True)
+    # same accessor as on PurchaseOrder, so templates take either order
+    purchase_order = models.ForeignKey(ArchivedPurchaseOrder,
+                                       related_name='product_set')
+    user = models.ForeignKey('auth.User')
+    shop_link = models.CharField(max_length=1024, blank=True, null=True)
+    product_link = models.CharField(max_length=1024)
+    vendor_code = models.CharField(max_length=64, blank=True, null=True)
+    name = models.CharField(max_length=255, blank=True, null=True)
+    color = models.CharField(max_length=32)
+    size = models.CharField(max_length=32)
+    quantity = models.IntegerField()
+    # euro cents
+    price_cents = models.IntegerField()
+    discount_code = models.CharField(max_length=64, blank=True, null=True)
+    discount_in_shop = models.CharField(max_length=64, blank=True, null=True)
+    note = models.CharField(max_length=255, blank=True, null=True)
+    link_hash = models.CharField(max_length=40, db_index=True, default='')
+
+    class Meta:
+        db_table = 'product_archive'
+
+
+class ArchivedPurchaseOrderStatusChange(models.Model):
+    id = models.IntegerField(primary_key=True)
+    purchase_order = models.ForeignKey(ArchivedPurchaseOrder)
+    from_status = models.ForeignKey(PurchaseOrderStatus, related_name='+')
+    to_status = models.ForeignKey(PurchaseOrderStatus, related_name='+')
+    changed_by = models.ForeignKey('auth.User', blank=True, null=True,
+                                   related_name='+')
+    created_date = models.DateTimeField()
+    comment = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        db_table = 'purchase_order_status_change_archive'
+
+
+class OutgoingEmail(models.Model):
+    STATUS_PENDING = 0
+    STATUS_SENT = 1
+    STATUS_FAILED = 2
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    created_date = models.DateTimeField()
+    send_after = models.DateTimeField()
+    sent_date = models.DateTimeField(blank=True, null=True)
+    status = models.SmallIntegerField(choices=STATUS_CHOICES,
+                                      default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254)
+    # comma separated list of addresses
+    recipients = models.TextField()
+    body_text = models.TextField()
+    body_html = models.TextField(blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'outgoing_email'
+        index_together = [('status', 'send_after')]
+
+    def recipient_list(self):
+        return [r for r in self.recipients.split(',') if r]
@@ -0,0 +1,75 @@
+"""
+Per-request performance records filled by PerformanceMiddleware.
+
+Code that wants its time accounted for wraps itself in ``timer(name)``;
+template rendering is timed by ``install_template_timer`` which the app
+config calls on startup.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+class RequestRecord(object):
+
+    def __init__(self):
+        self.start = time.time()
+        self.timings = {}
+        self.depth = {}
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0) + seconds
+
+
+def start_record():
+    _local.record = RequestRecord()
+    return _local.record
+
+
+def finish_record():
+    record = getattr(_local, 'record', None)
+    _local.record = None
+    return record
+
+
+def current_record():
+    return getattr(_local, 'record', None)
+
+
+@contextmanager
+def timer(name):
+    """
+    Add the time spent in the block to ``name`` of the current request.
+    Nested blocks with the same name are only counted once.
+    """
+    record = current_record()
+    if record is None:
+        yield
+        return
+    depth = record.depth.get(name, 0)
+    record.depth[name] = depth + 1
+    start = time.time()
+    try:
+        yield
+    finally:
+        record.depth[name] = depth
+        if not depth:
+            record.add(name, time.time() - start)
+
+
+def install_template_timer():
+    from django.template.base import Template
+
+    if getattr(Template.render, 'perf_timed', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        with timer('template'):
+            return original_render(self, context)
+
+    render.perf_timed = True
+    Template.render = render
@@ -0,0 +1,41 @@
+"""
+Cleanup of expired registration links.
+
+A user that registered but never followed the link is inactive and has
+never logged in; once the link expires the account is removed with it.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from delivery_tracker.models import UserRegistrationLink
+
+
+def purge_expired_links(batch_size=None):
+    """
+    Delete one batch of expired links and their never activated users in a
+    single transaction. Returns ``(links deleted, users deleted)``, call
+    again until it returns ``(0, 0)``.
+    """
+    batch_size = batch_size or settings.REGISTRATION_PURGE_BATCH_SIZE
+    with transaction.atomic():
+        batch = list(
+            UserRegistrationLink.objects.expired()
+            .order_by('created_date')
+            .values_list('id', 'user_id')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+        link_ids = [link_id for link_id, _ in batch]
+        user_ids = set(user_id for _, user_id in batch)
+        UserRegistrationLink.objects.filter(id__in=link_ids).delete()
+        stale_users = (
+            User.objects.filter(id__in=user_ids, is_active=False,
+                                last_login__isnull=True)
+            # another, still valid link keeps the account
+            .exclude(userregistrationlink__isnull=False)
+        )
+        users_deleted = len(stale_users.values_list('id', flat=True))
+        if users_deleted:
+            stale_users.delete()
+    return len(link_ids), users_deleted
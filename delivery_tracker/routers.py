@@ -0,0 +1,70 @@
+"""
+Read/write split between the default database and REPLICA_DATABASE.
+
+Reads of the order models go to the replica until the current thread
+writes anything; from then on it stays on the primary so that it reads its
+own writes. ReplicaPinMiddleware resets the pin for every request and
+carries it over the redirect that usually follows a POST. Only a write
+starts that carry-over: a request pinned by the cookie alone does not
+extend it.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+REPLICATED_MODELS = {'purchaseorder', 'product', 'purchaseorderstatus'}
+
+_local = threading.local()
+
+
+def pin_to_primary():
+    _local.pinned = True
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False)
+
+
+def wrote():
+    """Whether the current thread wrote since the last ``reset``."""
+    return getattr(_local, 'wrote', False)
+
+
+def reset():
+    _local.pinned = False
+    _local.wrote = False
+
+
+class ReplicaRouter(object):
+
+    def _replica_for(self, model):
+        alias = settings.REPLICA_DATABASE
+        if (alias and model._meta.app_label == 'delivery_tracker' and
+                model._meta.model_name in REPLICATED_MODELS):
+            return alias
+        return None
+
+    def db_for_read(self, model, **hints):
+        replica = self._replica_for(model)
+        if replica is None:
+            return None
+        return DEFAULT_DB_ALIAS if is_pinned() else replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS if settings.REPLICA_DATABASE else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, settings.REPLICA_DATABASE}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica is a copy of the primary made outside of Django
+        if settings.REPLICA_DATABASE and db == settings.REPLICA_DATABASE:
+            return False
+        return None
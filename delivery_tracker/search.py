@@ -0,0 +1,105 @@
+"""
+Product search.
+
+On SQLite the searchable columns are indexed by the FTS5 table
+``product_fts``, which triggers keep in sync with ``product`` for every
+insert, update and delete, bulk ones included. The table and its triggers
+are part of the schema and belong to the migrations; this module only
+queries them. Results are ranked by bm25 with the name weighted highest.
+Databases without FTS5 fall back to ``icontains`` over the same columns,
+newest products first.
+
+A query that is a whole product link finds the products with the same
+canonical link through the indexed ``product.link_hash`` instead.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from delivery_tracker.models import Product
+
+
+FTS_TABLE = 'product_fts'
+SEARCH_FIELDS = ('name', 'vendor_code', 'shop_link', 'note')
+# bm25 weights, in SEARCH_FIELDS order
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+LINK_QUERY = re.compile(r'^https?://\S+$', re.IGNORECASE)
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite' and
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available
+
+
+def match_expression(query):
+    """
+    FTS5 query for free text: every word has to match as a prefix, and
+    the words are quoted so user input can not use the query syntax.
+    """
+    words = re.findall(r'\w+', query, re.UNICODE)
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def search_products(query, products=None):
+    """
+    ``products`` (all by default) matching ``query``, best matches first.
+    The result is a lazy queryset, slice it for a page.
+    """
+    products = Product.objects.all() if products is None else products
+    if LINK_QUERY.match(query.strip()):
+        return products.same_item(query).order_by('-id')
+    if not fts_available():
+        return fallback_search(query, products)
+    match = match_expression(query)
+    if not match:
+        return products.none()
+    return products.extra(
+        tables=[FTS_TABLE],
+        where=['%s.rowid = product.id' % FTS_TABLE,
+               '%s MATCH %%s' % FTS_TABLE],
+        params=[match],
+        select={'search_rank': 'bm25(%s, %s)' % (
+            FTS_TABLE, ', '.join(str(w) for w in FTS_WEIGHTS))},
+        order_by=['search_rank', '-id'],
+    )
+
+
+def fallback_search(query, products):
+    words = re.findall(r'\w+', query, re.UNICODE)
+    if not words:
+        return products.none()
+    for word in words:
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{'%s__icontains' % field: word})
+        products = products.filter(condition)
+    return products.order_by('-id')
+
+
+def filter_ids(products, query):
+    """
+    Filter a queryset (e.g. an admin changelist) to matching products
+    without changing its ordering.
+    """
+    if LINK_QUERY.match(query.strip()):
+        return products.same_item(query)
+    if not fts_available():
+        return fallback_search(query, products).order_by(
+            *products.query.order_by)
+    match = match_expression(query)
+    if not match:
+        return products.none()
+    return products.extra(
+        where=['product.id IN (SELECT rowid FROM %s WHERE %s MATCH %%s)'
+               % (FTS_TABLE, FTS_TABLE)],
+        params=[match],
+    )
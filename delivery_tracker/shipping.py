@@ -0,0 +1,194 @@
+"""
+Shipping cost calculator.
+
+The tariffs (SHIPPING_TARIFFS_FILE) are read once per process into one
+pair of ``array('i')`` per zone: upper weight limits in grams and their
+prices in cents. A quote is a ``bisect`` over the limits. Parcels are
+charged by the larger of their weight and their volumetric weight,
+anything above the last limit pays ``extra_kg_cents`` per started
+kilogram. Single quotes are memoized by ``(zone, grams, cm3)``.
+"""
+import json
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from delivery_tracker import statuses
+from delivery_tracker.models import PurchaseOrder, PurchaseOrderStatus
+from delivery_tracker.summary import rebuild_summaries
+
+
+# orders that are not paid yet may still get a new shipping cost
+REQUOTE_STATUSES = (PurchaseOrderStatus.DRAFT, PurchaseOrderStatus.REQUESTED,
+                    PurchaseOrderStatus.AWAITING_PAYMENT)
+QUOTE_CACHE_SIZE = 4096
+
+
+class UnknownZone(ValueError):
+    pass
+
+
+class Zone(object):
+    __slots__ = ('code', 'name', 'weights', 'prices', 'extra_kg_cents')
+
+    def __init__(self, code, name, weights, prices, extra_kg_cents):
+        if len(weights) != len(prices) or list(weights) != sorted(weights):
+            raise ValueError('Bad tariff for zone %s' % code)
+        self.code = code
+        self.name = name
+        self.weights = array('i', weights)
+        self.prices = array('i', prices)
+        self.extra_kg_cents = extra_kg_cents
+
+
+class Tariffs(object):
+
+    def __init__(self, zones, volumetric_divisor):
+        self.zones = zones
+        self.volumetric_divisor = volumetric_divisor
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        zones = dict(
+            (code, Zone(code, zone['name'], zone['weights_g'],
+                        zone['prices_cents'], zone['extra_kg_cents']))
+            for code, zone in data['zones'].items()
+        )
+        return cls(zones, data['volumetric_divisor'])
+
+    def chargeable_grams(self, weight_grams, volume_cm3):
+        # cm3 / divisor is kilograms
+        volumetric = (volume_cm3 or 0) * 1000 // self.volumetric_divisor
+        return max(weight_grams or 0, volumetric)
+
+    def quote(self, zone_code, weight_grams, volume_cm3=None):
+        """Shipping cost in cents of one parcel."""
+        try:
+            zone = self.zones[zone_code]
+        except KeyError:
+            raise UnknownZone(zone_code)
+        grams = self.chargeable_grams(weight_grams, volume_cm3)
+        weights = zone.weights
+        i = bisect_left(weights, grams)
+        if i < len(weights):
+            return zone.prices[i]
+        extra_kg = -(-(grams - weights[-1]) // 1000)
+        return zone.prices[-1] + extra_kg * zone.extra_kg_cents
+
+    def quote_batch(self, parcels):
+        """
+        Costs of many ``(zone, grams, cm3)`` parcels in one pass, with the
+        lookups bound to locals and parcels of the same zone sharing the
+        zone's arrays. Unknown zones give None.
+        """
+        zones = self.zones
+        divisor = self.volumetric_divisor
+        costs = []
+        append = costs.append
+        last = (None, None, None, 0)
+        for zone_code, weight_grams, volume_cm3 in parcels:
+            if zone_code != last[0]:
+                zone = zones.get(zone_code)
+                if zone is None:
+                    last = (zone_code, None, None, 0)
+                else:
+                    last = (zone_code, zone.weights, zone.prices,
+                            zone.extra_kg_cents)
+            weights, prices, extra = last[1], last[2], last[3]
+            if weights is None:
+                append(None)
+                continue
+            grams = max(weight_grams or 0,
+                        (volume_cm3 or 0) * 1000 // divisor)
+            i = bisect_left(weights, grams)
+            if i < len(weights):
+                append(prices[i])
+            else:
+                append(prices[-1] +
+                       -(-(grams - weights[-1]) // 1000) * extra)
+        return costs
+
+
+_tariffs = None
+
+
+def get_tariffs():
+    global _tariffs
+    if _tariffs is None:
+        _tariffs = Tariffs.load(settings.SHIPPING_TARIFFS_FILE)
+    return _tariffs
+
+
+@lru_cache(maxsize=QUOTE_CACHE_SIZE)
+def quote(zone_code, weight_grams, volume_cm3=None):
+    """Cached ``Tariffs.quote`` of the loaded tariffs."""
+    return get_tariffs().quote(zone_code, weight_grams, volume_cm3)
+
+
+def quote_batch(parcels):
+    return get_tariffs().quote_batch(parcels)
+
+
+def reload_tariffs():
+    global _tariffs
+    _tariffs = None
+    quote.cache_clear()
+
+
+def requote_orders(orders=None, batch_size=None):
+    """
+    Recompute ``shipping_cost_cents`` of the parcels among ``orders`` (by
+    default every unpaid order) in id chunks: one quote_batch and one
+    UPDATE per distinct new cost per chunk, then the summaries of the
+    affected users. Returns ``(updated, unknown zone)`` counts.
+    """
+    if orders is None:
+        orders = PurchaseOrder.objects.filter(
+            status_id__in=statuses.ids_for(REQUOTE_STATUSES))
+    orders = orders.exclude(shipping_zone='').filter(
+        weight_grams__isnull=False)
+    batch_size = batch_size or settings.SHIPPING_REQUOTE_BATCH_SIZE
+    updated = unknown = 0
+    users = set()
+    after = 0
+    while True:
+        chunk = list(
+            orders.filter(id__gt=after).order_by('id')
+            .values_list('id', 'user_id', 'shipping_zone', 'weight_grams',
+                         'volume_cm3', 'shipping_cost_cents')[:batch_size]
+        )
+        if not chunk:
+            break
+        after = chunk[-1][0]
+        costs = quote_batch([row[2:5] for row in chunk])
+        by_cost = {}
+        for row, cost in zip(chunk, costs):
+            if cost is None:
+                unknown += 1
+            elif cost != row[5]:
+                by_cost.setdefault(cost, []).append(row[0])
+                users.add(row[1])
+        with transaction.atomic():
+            for cost, ids in by_cost.items():
+                # the status is checked again: an order paid since the read
+                # keeps its cost
+                updated += orders.filter(id__in=ids).update(
+                    shipping_cost_cents=cost)
+
+    users = sorted(users)
+    for start in range(0, len(users), batch_size):
+        rebuild_summaries(users[start:start + batch_size])
+    return updated, unknown
+
+
+@receiver(setting_changed)
+def tariffs_changed(setting, **kwargs):
+    if setting == 'SHIPPING_TARIFFS_FILE':
+        reload_tariffs()
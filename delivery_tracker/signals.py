@@ -0,0 +1,130 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from delivery_tracker import statuses
+from delivery_tracker.caching import bump_user_version
+from delivery_tracker.models import (
+    PurchaseOrder, PurchaseOrderStatus, Product
+)
+from delivery_tracker.summary import add_to_summary
+from delivery_tracker.totals import order_totals
+
+
+def _order_key(order_id):
+    if order_id is None:
+        return None
+    return (PurchaseOrder.objects.filter(pk=order_id)
+            .values_list('user_id', 'status_id').first())
+
+
+def _move(old_key, new_key, old_orders, old_cents, new_orders, new_cents):
+    """Take the old values out of the old bucket, add the new ones."""
+    if old_key == new_key:
+        if new_key:
+            add_to_summary(*new_key, orders=new_orders - old_orders,
+                           cents=new_cents - old_cents)
+        return
+    if old_key:
+        add_to_summary(*old_key, orders=-old_orders, cents=-old_cents)
+    if new_key:
+        add_to_summary(*new_key, orders=new_orders, cents=new_cents)
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+def remember_order_bucket(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = (PurchaseOrder.objects.filter(pk=instance.pk)
+               .values_list('user_id', 'status_id', 'shipping_cost_cents')
+               .first())
+    instance._old_summary = old
+    if old is not None and old[1] != instance.status_id:
+        instance.status_changed_date = timezone.now()
+
+
+@receiver(post_save, sender=PurchaseOrder)
+def update_summary_on_order_save(sender, instance, **kwargs):
+    old = getattr(instance, '_old_summary', None)
+    new_key = (instance.user_id, instance.status_id)
+    if old is None:
+        # a new order has no products yet
+        add_to_summary(*new_key, orders=1,
+                       cents=instance.shipping_cost_cents)
+        return
+    old_key, old_shipping = old[:2], old[2]
+    products = 0
+    if old_key != new_key:
+        # the products move along with the order
+        products = (order_totals(PurchaseOrder.objects.filter(
+            pk=instance.pk))[instance.pk] - instance.shipping_cost_cents)
+    _move(old_key, new_key, 1, old_shipping + products,
+          1, instance.shipping_cost_cents + products)
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+def update_summary_on_order_delete(sender, instance, **kwargs):
+    # the products of a deleted order take their own amounts out of the
+    # bucket, see remember_deleted_product_bucket
+    add_to_summary(instance.user_id, instance.status_id, orders=-1,
+                   cents=-instance.shipping_cost_cents)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_bucket(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = (Product.objects.filter(pk=instance.pk)
+               .values_list('purchase_order_id', 'price_cents', 'quantity')
+               .first())
+    if old is None:
+        instance._old_summary = (None, 0)
+    else:
+        instance._old_summary = (_order_key(old[0]), old[1] * old[2])
+
+
+@receiver(post_save, sender=Product)
+def update_summary_on_product_save(sender, instance, **kwargs):
+    old_key, old_cents = getattr(instance, '_old_summary', (None, 0))
+    _move(old_key, _order_key(instance.purchase_order_id), 0, old_cents,
+          0, instance.price_cents * instance.quantity)
+
+
+@receiver(pre_delete, sender=Product)
+def remember_deleted_product_bucket(sender, instance, **kwargs):
+    # all pre_delete signals of a cascade run before the first row goes,
+    # so the order is still there whichever of them is deleted first
+    instance._deleted_summary_key = _order_key(instance.purchase_order_id)
+
+
+@receiver(post_delete, sender=Product)
+def update_summary_on_product_delete(sender, instance, **kwargs):
+    key = getattr(instance, '_deleted_summary_key', None)
+    if key:
+        add_to_summary(*key,
+                       cents=-instance.price_cents * instance.quantity)
+
+
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=PurchaseOrder)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_owner_version(sender, instance, **kwargs):
+    # products outside of orders do not touch the summary, but the
+    # user's cached pages still show them
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def bump_user_version_on_save(sender, instance, **kwargs):
+    # the API serves the profile by this version
+    bump_user_version(instance.pk)
+
+
+@receiver(post_save, sender=PurchaseOrderStatus)
+@receiver(post_delete, sender=PurchaseOrderStatus)
+def invalidate_status_registry(sender, **kwargs):
+    statuses.invalidate()
@@ -0,0 +1,15 @@
+"""
+Per connection SQLite tuning from the SQLITE_PRAGMAS setting.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS:
+            cursor.execute('PRAGMA %s = %s' % (name, value))
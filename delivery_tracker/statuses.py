@@ -0,0 +1,85 @@
+"""
+In-process registry of purchase order statuses.
+
+The status table is tiny and almost never changes, so every process keeps
+all rows in memory and resolves them by id or by code without a query. The
+registry is dropped by the PurchaseOrderStatus signals; other processes
+notice the change through a version stamp in the Django cache, which they
+check at most every ``ORDER_STATUS_REGISTRY_CHECK_INTERVAL`` seconds.
+"""
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from delivery_tracker.models import PurchaseOrderStatus
+
+
+VERSION_CACHE_KEY = 'delivery_tracker:order_status_version'
+
+# replaced as a whole, never mutated, so readers need no lock
+_registry = None
+
+
+class _Registry(object):
+
+    def __init__(self, version, statuses):
+        self.version = version
+        self.checked_at = time.time()
+        self.by_id = dict((s.pk, s) for s in statuses)
+        self.by_code = dict((s.code, s) for s in statuses)
+
+
+def _shared_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def _get_registry():
+    global _registry
+    registry = _registry
+    if registry is not None:
+        interval = settings.ORDER_STATUS_REGISTRY_CHECK_INTERVAL
+        if time.time() - registry.checked_at < interval:
+            return registry
+        if _shared_version() == registry.version:
+            registry.checked_at = time.time()
+            return registry
+
+    version = _shared_version()
+    registry = _Registry(version, PurchaseOrderStatus.objects.all())
+    _registry = registry
+    return registry
+
+
+def invalidate():
+    """Drop the registry here and, through the cache, in other processes."""
+    global _registry
+    _registry = None
+    cache.set(VERSION_CACHE_KEY, uuid4().hex, None)
+
+
+def get(code):
+    """``PurchaseOrderStatus`` by its code, KeyError if there is none."""
+    return _get_registry().by_code[code]
+
+
+def by_id(pk):
+    return _get_registry().by_id[pk]
+
+
+def id_for(code):
+    return get(code).pk
+
+
+def ids_for(codes):
+    registry = _get_registry()
+    return [registry.by_code[code].pk for code in codes]
+
+
+def all_statuses():
+    return sorted(_get_registry().by_id.values(), key=lambda s: s.pk)
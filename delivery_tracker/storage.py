@@ -0,0 +1,130 @@
+"""
+Static files storage for production.
+
+On top of the content hashed names and the manifest of
+ManifestStaticFilesStorage, collectstatic through this storage
+
+* recompresses the image data of PNGs with zlib at the highest level and
+  drops their text and timestamp chunks, which leaves the pixels untouched;
+* writes ``.gz`` and, when the ``brotli`` package is installed, ``.br``
+  files next to every text asset so the front proxy can serve them as is.
+
+The static_savings command reports how many bytes all of this saves.
+"""
+import gzip
+import io
+import struct
+import zlib
+from collections import OrderedDict
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# metadata that does not change how the image looks
+PNG_DROPPED_CHUNKS = {b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json',
+                         '.map', '.xml', '.ico')
+# variants saving less than this fraction of the file are not worth it
+MIN_COMPRESSION_GAIN = 0.05
+
+
+def _png_chunks(data):
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        yield chunk_type, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def _png_chunk(chunk_type, body):
+    crc = zlib.crc32(chunk_type + body) & 0xffffffff
+    return (struct.pack('>I', len(body)) + chunk_type + body +
+            struct.pack('>I', crc))
+
+
+def optimize_png(data):
+    """
+    Losslessly smaller ``data`` of a PNG file, or ``data`` itself when it
+    is not a PNG or can not be made smaller.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    try:
+        chunks = list(_png_chunks(data))
+        image_data = zlib.decompress(b''.join(
+            body for chunk_type, body in chunks if chunk_type == b'IDAT'))
+    except (struct.error, zlib.error):
+        return data
+
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidate = compressor.compress(image_data) + compressor.flush()
+        if best is None or len(candidate) < len(best):
+            best = candidate
+
+    out = [PNG_SIGNATURE]
+    for chunk_type, body in chunks:
+        if chunk_type == b'IDAT':
+            if best is not None:
+                out.append(_png_chunk(b'IDAT', best))
+                best = None
+        elif chunk_type not in PNG_DROPPED_CHUNKS:
+            out.append(_png_chunk(chunk_type, body))
+    optimized = b''.join(out)
+    return optimized if len(optimized) < len(data) else data
+
+
+def gzip_bytes(data):
+    buf = io.BytesIO()
+    # mtime=0 keeps the output identical between deploys
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9,
+                       mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def compressed_variants(data):
+    """``{suffix: bytes}`` of the worthwhile compressed forms of ``data``."""
+    variants = {'.gz': gzip_bytes(data)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    limit = len(data) * (1 - MIN_COMPRESSION_GAIN)
+    return dict((suffix, compressed) for suffix, compressed
+                in variants.items() if len(compressed) < limit)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def _save(self, name, content):
+        if name.lower().endswith('.png'):
+            content = ContentFile(optimize_png(content.read()))
+        return super(CompressedManifestStaticFilesStorage, self)._save(
+            name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = []
+        for name, hashed_name, processed in super(
+                CompressedManifestStaticFilesStorage, self).post_process(
+                    paths, dry_run, **options):
+            processed_names.append(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+
+        for name in OrderedDict.fromkeys(list(paths) + processed_names):
+            if not name.lower().endswith(COMPRESSED_EXTENSIONS):
+                continue
+            with self.open(name) as f:
+                data = f.read()
+            for suffix, compressed in compressed_variants(data).items():
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
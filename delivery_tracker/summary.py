@@ -0,0 +1,109 @@
+"""
+Per-user order counters shown in the cabinet sidebar.
+
+Aggregating orders on every cabinet load does not scale, so the numbers live
+in ``user_order_summary``. Saving or deleting an order or product adds its
+difference to the (user, status) buckets it touches with one UPDATE, without
+aggregating the bucket again; ``refresh_summary`` and ``rebuild_summaries``
+recompute buckets from the order tables after bulk changes and for repair.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from delivery_tracker import statuses
+from delivery_tracker.caching import bump_user_version, get_user_version
+from delivery_tracker.models import PurchaseOrderStatus, UserOrderSummary
+from delivery_tracker.totals import status_totals
+
+
+# Sidebar label -> statuses it sums up. There are no statuses for parcels
+# being shipped yet, so the last two counters stay empty for now.
+CABINET_COUNTERS = (
+    ('Not yet payed bills', (PurchaseOrderStatus.AWAITING_PAYMENT, )),
+    ('Parcels stored', (PurchaseOrderStatus.PARTIALLY_RECEIVED,
+                        PurchaseOrderStatus.RECEIVED)),
+    ('Ready for shipping', ()),
+    ('Shipping', ()),
+)
+
+COUNTERS_CACHE_KEY = 'delivery_tracker:cabinet_counters:%d:%d'
+
+
+def refresh_summary(user_id, status_id):
+    """Recompute one (user, status) bucket from the order tables."""
+    count, total_cents = status_totals([user_id], [status_id]).get(
+        (user_id, status_id), (0, 0))
+    UserOrderSummary.objects.update_or_create(
+        user_id=user_id,
+        status_id=status_id,
+        defaults={'order_count': count, 'total_cents': total_cents}
+    )
+    bump_user_version(user_id)
+
+
+def add_to_summary(user_id, status_id, orders=0, cents=0):
+    """
+    Add ``orders`` and ``cents`` to one bucket in place. A bucket without a
+    row yet is computed from the order tables instead, which already hold
+    the change.
+    """
+    if not orders and not cents:
+        return
+    updated = UserOrderSummary.objects.filter(
+        user_id=user_id, status_id=status_id
+    ).update(order_count=F('order_count') + orders,
+             total_cents=F('total_cents') + cents)
+    if updated:
+        bump_user_version(user_id)
+    else:
+        refresh_summary(user_id, status_id)
+
+
+def rebuild_summaries(user_ids=None):
+    """Recompute the whole table (or the given users) from one aggregate."""
+    buckets = [
+        UserOrderSummary(user_id=user_id, status_id=status_id,
+                         order_count=count, total_cents=total_cents)
+        for (user_id, status_id), (count, total_cents)
+        in status_totals(user_ids).items()
+    ]
+    with transaction.atomic():
+        existing = UserOrderSummary.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        changed_users = set(existing.values_list('user_id', flat=True))
+        existing.delete()
+        UserOrderSummary.objects.bulk_create(buckets)
+    for user_id in changed_users | set(b.user_id for b in buckets):
+        bump_user_version(user_id)
+    return len(buckets)
+
+
+def cabinet_counters(user):
+    """Sidebar counters as ``(label, order_count, total_cents)``."""
+    by_status = dict(
+        (row.status_id, row)
+        for row in UserOrderSummary.objects.filter(user=user)
+    )
+    counters = []
+    for label, codes in CABINET_COUNTERS:
+        rows = [by_status[pk] for pk in statuses.ids_for(codes)
+                if pk in by_status]
+        counters.append((
+            label,
+            sum(r.order_count for r in rows),
+            sum(r.total_cents for r in rows),
+        ))
+    return counters
+
+
+def cached_cabinet_counters(user):
+    """``cabinet_counters`` from the cache, keyed by the user's version."""
+    key = COUNTERS_CACHE_KEY % (user.pk, get_user_version(user.pk))
+    counters = cache.get(key)
+    if counters is None:
+        counters = cabinet_counters(user)
+        cache.set(key, counters, settings.CABINET_CACHE_TIMEOUT)
+    return counters
@@ -0,0 +1,16 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.filter
+def euro(cents):
+    """Format integer cents as euro: 700 -> "7", 1999 -> "19.99"."""
+    if cents is None or cents == '':
+        return ''
+    sign = '-' if cents < 0 else ''
+    whole, rest = divmod(abs(int(cents)), 100)
+    if rest:
+        return '%s%d.%02d' % (sign, whole, rest)
+    return '%s%d' % (sign, whole)
@@ -1,3 +1,1380 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import tracemalloc
+import zlib
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import IntegrityError, connection, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from delivery_tracker import emails, routers, shipping, statuses
+from delivery_tracker.archive import (
+    archivable_orders, archive_batch, archive_orders, order_page
+)
+from delivery_tracker.bench import StubShop, fake_rows, insert_sql
+from delivery_tracker.caching import get_user_version
+from delivery_tracker.checks import check_shared_cache
+from delivery_tracker.emails import render_email
+from delivery_tracker.enrichment import (
+    enrich_products, fetch_pages, parse_price, parse_product_page
+)
+from delivery_tracker.exports import csv_lines, export_rows
+from delivery_tracker.importers import guess_format, import_products
+from delivery_tracker.mail import queue_mail, send_queued_mail
+from delivery_tracker.middleware import ReplicaPinMiddleware
+from delivery_tracker.models import (
+    ArchivedPurchaseOrder, ArchivedPurchaseOrderStatusChange, ArchivedProduct,
+    OutgoingEmail, PurchaseOrder, PurchaseOrderStatus,
+    PurchaseOrderStatusChange, Product, UserOrderSummary, UserRegistrationLink
+)
+from delivery_tracker.registration import purge_expired_links
+from delivery_tracker.search import fallback_search, search_products
+from delivery_tracker.shipping import Tariffs, Zone, requote_orders
+from delivery_tracker.storage import optimize_png
+from delivery_tracker.summary import rebuild_summaries
+from delivery_tracker.templatetags.money import euro
+from delivery_tracker.totals import order_totals, user_total
+from delivery_tracker.utils import canonical_link, link_hash, normalize_url
+from delivery_tracker.transitions import transition_orders
+
+
+class MailQueueTest(TestCase):
+
+    def test_register_queues_email_without_sending(self):
+        response = self.client.post(
+            '/tracker/register/',
+            {'username': 'user@example.com', 'password': 'secret123'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipient_list(), ['user@example.com'])
+        self.assertIn('finish_registration', email.body_html)
+
+    @override_settings(DEBUG=False)
+    def test_email_templates_are_compiled_once(self):
+        with mock.patch('delivery_tracker.emails.get_template',
+                        wraps=emails.get_template) as get_template:
+            for password in ('first', 'second'):
+                text, html = render_email('restore_password',
+                                          {'new_password': password})
+                self.assertIn(password, text)
+                self.assertIn(password, html)
+        self.assertEqual(get_template.call_count, 2)
+
+    def test_worker_drains_outbox_in_batches(self):
+        for i in range(250):
+            queue_mail('Subject', 'Text', 'from@example.com',
+                       ['to%d@example.com' % i], html_message='<b>Html</b>')
+
+        self.assertEqual(send_queued_mail(batch_size=100), (100, 0))
+        self.assertEqual(send_queued_mail(batch_size=100), (100, 0))
+        self.assertEqual(send_queued_mail(batch_size=100), (50, 0))
+        self.assertEqual(send_queued_mail(batch_size=100), (0, 0))
+
+        self.assertEqual(len(mail.outbox), 250)
+        self.assertEqual(mail.outbox[0].alternatives,
+                         [('<b>Html</b>', 'text/html')])
+        self.assertFalse(OutgoingEmail.objects.exclude(
+            status=OutgoingEmail.STATUS_SENT).exists())
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='localhost', EMAIL_PORT=1
+    )
+    def test_unreachable_server_backs_off_without_attempts(self):
+        email = queue_mail('Subject', 'Text', None, ['to@example.com'])
+
+        self.assertEqual(send_queued_mail(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.STATUS_PENDING)
+        self.assertEqual(email.attempts, 0)
+        self.assertTrue(email.last_error)
+        self.assertGreater(email.send_after, email.created_date)
+        # backoff: not due yet
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    @override_settings(EMAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_failed_emails_are_retried_later(self):
+        email = queue_mail('Subject', 'Text', None, ['to@example.com'])
+        connection = mock.Mock()
+        connection.send_messages.side_effect = OSError('rejected')
+
+        self.assertEqual(send_queued_mail(connection=connection), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.STATUS_PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.send_after, email.created_date)
+        # backoff: not due yet
+        self.assertEqual(send_queued_mail(connection=connection), (0, 0))
+
+        OutgoingEmail.objects.update(send_after=email.created_date)
+        send_queued_mail(connection=connection)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.STATUS_FAILED)
+
+    def test_register_keeps_no_user_without_the_email(self):
+        with mock.patch('delivery_tracker.views.queue_mail',
+                        side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(
+                    '/tracker/register/',
+                    {'username': 'user@example.com', 'password': 'secret123'}
+                )
+        self.assertFalse(User.objects.exists())
+
+
+class OrderSummaryTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+
+    def summary(self):
+        return sorted(
+            UserOrderSummary.objects.filter(user=self.user, order_count__gt=0)
+            .values_list('status_id', 'order_count', 'total_cents')
+        )
+
+    def test_summary_follows_orders_and_products(self):
+        awaiting_payment = statuses.id_for(
+            PurchaseOrderStatus.AWAITING_PAYMENT)
+        received = statuses.id_for(PurchaseOrderStatus.RECEIVED)
+        order = PurchaseOrder.objects.create(user=self.user,
+                                             shipping_cost_cents=500,
+                                             status_id=awaiting_payment)
+        Product.objects.create(purchase_order=order, user=self.user,
+                               product_link='http://shop/1', quantity=2,
+                               price_cents=1000)
+        self.assertEqual(self.summary(), [(awaiting_payment, 1, 2500)])
+
+        order.status_id = received
+        order.save()
+        self.assertEqual(self.summary(), [(received, 1, 2500)])
+
+        order.delete()
+        self.assertEqual(self.summary(), [])
+        self.assertEqual(UserOrderSummary.objects.get(
+            user=self.user, status_id=received).total_cents, 0)
+
+    def test_saves_add_deltas_without_aggregating(self):
+        order = PurchaseOrder.objects.create(
+            user=self.user,
+            status_id=statuses.id_for(PurchaseOrderStatus.REQUESTED))
+        product = Product.objects.create(
+            purchase_order=order, user=self.user,
+            product_link='http://shop/1', quantity=1, price_cents=150)
+        product.quantity = 3
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        self.assertFalse([q for q in queries if 'SUM(' in q['sql']])
+        self.assertEqual(self.summary(), [(order.status_id, 1, 450)])
+
+    def test_rebuild_matches_incremental_updates(self):
+        orders = []
+        for code in (PurchaseOrderStatus.REQUESTED,
+                     PurchaseOrderStatus.REQUESTED,
+                     PurchaseOrderStatus.RECEIVED):
+            order = PurchaseOrder.objects.create(
+                user=self.user, status_id=statuses.id_for(code))
+            Product.objects.create(purchase_order=order, user=self.user,
+                                   product_link='http://shop/1', quantity=1,
+                                   price_cents=150)
+            orders.append(order)
+        # reprice, move a product to another order and change shipping
+        product = Product.objects.filter(purchase_order=orders[0]).get()
+        product.price_cents = 990
+        product.purchase_order = orders[2]
+        product.save()
+        orders[1].shipping_cost_cents = 300
+        orders[1].status_id = statuses.id_for(PurchaseOrderStatus.CANCELLED)
+        orders[1].save()
+        Product.objects.create(purchase_order=orders[1], user=self.user,
+                               product_link='http://shop/2', quantity=2,
+                               price_cents=40)
+        orders[2].delete()
+        incremental = self.summary()
+        UserOrderSummary.objects.all().delete()
+        rebuild_summaries()
+        self.assertEqual(self.summary(), incremental)
+
+    def test_cabinet_counters_are_cached_until_orders_change(self):
+        self.client.login(username='user@example.com', password='secret123')
+        self.client.get('/tracker/cabinet/')
+        # the session and the user
+        with self.assertNumQueries(2):
+            response = self.client.get('/tracker/cabinet/')
+        self.assertContains(response, '0 (0 euro)', count=4)
+
+        PurchaseOrder.objects.create(
+            user=self.user, shipping_cost_cents=250,
+            status_id=statuses.id_for(PurchaseOrderStatus.RECEIVED))
+        response = self.client.get('/tracker/cabinet/')
+        self.assertContains(response, '1 (2.50 euro)')
+
+    def test_cabinet_reads_counters(self):
+        PurchaseOrder.objects.create(
+            user=self.user, shipping_cost_cents=700,
+            status_id=statuses.id_for(PurchaseOrderStatus.AWAITING_PAYMENT)
+        )
+        self.client.login(username='user@example.com', password='secret123')
+        response = self.client.get('/tracker/cabinet/')
+        self.assertContains(response, '1 (7 euro)')
+
+
+class ProductImportTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+
+    def test_csv_import_in_chunks_reports_bad_rows(self):
+        lines = ['product_link,name,quantity,price']
+        lines += ['http://shop/%d,Item %d,1,9.99' % (i, i) for i in range(25)]
+        lines.insert(5, 'http://shop/bad,Bad,zero,1')
+        data = io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+        result = import_products(data, 'csv', self.user, new_order=True,
+                                 chunk_size=10)
+
+        self.assertEqual(result.created, 25)
+        self.assertEqual(result.error_count, 1)
+        self.assertEqual(result.errors[0][0], 6)
+        self.assertIn('quantity', result.errors[0][1])
+        self.assertEqual(
+            Product.objects.filter(purchase_order=result.purchase_order)
+            .count(), 25)
+        summary = UserOrderSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_cents, 25 * 999)
+
+    def test_jsonl_import(self):
+        rows = [{'product_link': 'http://shop/1', 'quantity': 2,
+                 'price': 3.5, 'color': 'red'},
+                {'quantity': 1, 'price': 1}]
+        data = io.BytesIO('\n'.join(json.dumps(r) for r in rows).encode())
+
+        version = get_user_version(self.user.pk)
+        result = import_products(data, 'jsonl', self.user)
+
+        self.assertEqual(result.created, 1)
+        # no order: only the version tells cached pages about the product
+        self.assertGreater(get_user_version(self.user.pk), version)
+        self.assertEqual(result.errors, [(2, {'product_link': [
+            'This field is required.']})])
+        product = Product.objects.get()
+        self.assertEqual((product.color, product.shop_link), ('red', None))
+
+    def test_admin_upload_rejects_other_users_orders_and_json(self):
+        other = User.objects.create_user('other@example.com',
+                                         password='secret123')
+        foreign = PurchaseOrder.objects.create(
+            user=other, status_id=statuses.id_for(PurchaseOrderStatus.DRAFT))
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'secret123')
+        self.client.force_login(admin)
+
+        def upload(name, **data):
+            f = io.BytesIO(b'product_link,quantity,price\nhttp://shop/1,1,2')
+            f.name = name
+            data.update(file=f, user_email='user@example.com')
+            return self.client.post('/admin/delivery_tracker/product/import/',
+                                    data)
+
+        for order_id in (foreign.pk, foreign.pk + 100):
+            response = upload('products.csv', purchase_order=order_id)
+            self.assertFormError(response, 'form', 'purchase_order',
+                                 'No order with such id for this user')
+        response = upload('products.json')
+        self.assertFormError(
+            response, 'form', 'file',
+            'JSON documents are not supported, upload JSON Lines (.jsonl)')
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(guess_format('Products.JSONL'), 'jsonl')
+        self.assertIsNone(guess_format('products.json'))
+
+        own = PurchaseOrder.objects.create(
+            user=self.user,
+            status_id=statuses.id_for(PurchaseOrderStatus.DRAFT))
+        upload('products.csv', purchase_order=own.pk)
+        self.assertEqual(Product.objects.get().purchase_order_id, own.pk)
+
+
+class OrderListTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+        requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        for i in range(30):
+            order = PurchaseOrder.objects.create(user=self.user,
+                                                 status_id=requested)
+            for j in range(3):
+                Product.objects.create(
+                    purchase_order=order, user=self.user, quantity=1,
+                    price_cents=100, product_link='http://shop/%d/%d' % (i, j))
+        self.client.login(username='user@example.com', password='secret123')
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for page_size in (5, 25):
+            with self.settings(ORDERS_PAGE_SIZE=page_size):
+                # session, user, orders with statuses, products
+                with self.assertNumQueries(4):
+                    response = self.client.get('/tracker/cabinet/orders/')
+            self.assertEqual(len(response.context['orders']), page_size)
+
+    def test_keyset_pagination_walks_all_orders(self):
+        seen = []
+        url = '/tracker/cabinet/orders/'
+        with self.settings(ORDERS_PAGE_SIZE=7):
+            while url:
+                response = self.client.get(url)
+                seen += [o.id for o in response.context['orders']]
+                next_after = response.context['next_after']
+                url = next_after and '/tracker/cabinet/orders/?after=%d' % (
+                    next_after, )
+        self.assertEqual(
+            seen,
+            list(PurchaseOrder.objects.order_by('-id')
+                 .values_list('id', flat=True))
+        )
+
+
+class StatusRegistryTest(TestCase):
+
+    def tearDown(self):
+        # the rollback does not send signals
+        statuses.invalidate()
+
+    def test_statuses_resolve_without_queries(self):
+        statuses.all_statuses()
+        with self.assertNumQueries(0):
+            status = statuses.get(PurchaseOrderStatus.RECEIVED)
+            self.assertEqual(statuses.by_id(status.pk), status)
+
+    def test_registry_is_reloaded_after_changes(self):
+        status = statuses.get(PurchaseOrderStatus.DRAFT)
+        status.description = 'Changed'
+        status.save()
+        self.assertEqual(
+            statuses.get(PurchaseOrderStatus.DRAFT).description, 'Changed')
+
+        PurchaseOrderStatus.objects.create(code='lost', description='Lost')
+        self.assertEqual(statuses.get('lost').description, 'Lost')
+
+
+class OrderTotalsTest(TestCase):
+
+    def test_totals_are_exact_sums_in_cents(self):
+        user = User.objects.create_user('user@example.com')
+        requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        first = PurchaseOrder.objects.create(user=user, status_id=requested,
+                                             shipping_cost_cents=1)
+        second = PurchaseOrder.objects.create(user=user, status_id=requested)
+        for i in range(10):
+            Product.objects.create(purchase_order=first, user=user,
+                                   product_link='http://shop/1', quantity=3,
+                                   price_cents=10)
+
+        with self.assertNumQueries(1):
+            totals = order_totals(PurchaseOrder.objects.filter(user=user))
+        self.assertEqual(totals, {first.pk: 301, second.pk: 0})
+        with self.assertNumQueries(1):
+            self.assertEqual(user_total(user.pk), 301)
+        self.assertEqual(euro(301), '3.01')
+        self.assertEqual(euro(300), '3')
+
+
+@override_settings(PERF_INSTRUMENTATION=True)
+class PerformanceMiddlewareTest(TestCase):
+
+    def test_server_timing_and_log_line(self):
+        User.objects.create_user('user@example.com', password='secret123')
+        self.client.login(username='user@example.com', password='secret123')
+
+        with self.assertLogs('delivery_tracker.perf', 'INFO') as logs:
+            response = self.client.get('/tracker/cabinet/')
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'cabinet')
+        # the user and the counters, which are cached from now on
+        self.assertEqual(entry['queries'], 3)
+        self.assertGreater(entry['template_ms'], 0)
+
+    @override_settings(PERF_QUERY_BUDGETS={'cabinet': 1})
+    def test_query_budget_warning(self):
+        User.objects.create_user('user@example.com', password='secret123')
+        self.client.login(username='user@example.com', password='secret123')
+
+        with self.assertLogs('delivery_tracker.perf', 'WARNING') as logs:
+            self.client.get('/tracker/cabinet/')
+
+        self.assertIn('budget is 1', logs.output[0])
+
+
+class TemplateBenchTest(TestCase):
+
+    def test_bench_templates_renders_every_page(self):
+        out = io.StringIO()
+        call_command('bench_templates', repeat=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(sorted(report), ['app_directories', 'cached'])
+        self.assertIn('page delivery_tracker/cabinet.html',
+                      report['cached'])
+
+
+@override_settings(LOGIN_THROTTLE_USERNAME_LIMIT=3,
+                   LOGIN_THROTTLE_IP_LIMIT=5,
+                   PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginThrottlingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('user@example.com', password='secret123')
+
+    def tearDown(self):
+        cache.clear()
+
+    def login(self, username='user@example.com', password='wrong'):
+        return self.client.post('/tracker/login/',
+                                {'username': username, 'password': password})
+
+    def test_username_is_throttled_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 200)
+
+        with mock.patch('delivery_tracker.views.authenticate') as auth:
+            response = self.login(password='secret123')
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(auth.called)
+
+    def test_ip_is_throttled_across_usernames(self):
+        for i in range(5):
+            self.login(username='user%d@example.com' % i)
+        self.assertEqual(self.login(username='other@example.com').status_code,
+                         429)
+
+    def test_successful_login_upgrades_work_factor(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = self.login(password='secret123')
+        self.assertRedirects(response, '/tracker/cabinet/')
+        user = User.objects.get()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+class RegistrationLinkTest(TestCase):
+
+    def create_link(self, username, days_old=0, **user_fields):
+        user = User.objects.create_user(username, is_active=False,
+                                        **user_fields)
+        link = UserRegistrationLink.objects.create_for(user)
+        UserRegistrationLink.objects.filter(pk=link.pk).update(
+            created_date=timezone.now() - datetime.timedelta(days=days_old))
+        return link
+
+    def test_finish_registration_rejects_expired_link(self):
+        link = self.create_link('user@example.com', days_old=8)
+        response = self.client.get(
+            '/tracker/finish_registration/%s/' % link.slug)
+        self.assertContains(response, 'expired')
+        self.assertFalse(User.objects.get().is_active)
+
+        fresh = self.create_link('fresh@example.com', days_old=1)
+        self.client.get('/tracker/finish_registration/%s/' % fresh.slug)
+        self.assertTrue(User.objects.get(pk=fresh.user_id).is_active)
+        self.assertFalse(UserRegistrationLink.objects.filter(
+            pk=fresh.pk).exists())
+
+    def test_slug_clash_is_retried(self):
+        existing = self.create_link('user@example.com')
+        user = User.objects.create_user('other@example.com')
+        hexes = [mock.Mock(hex=existing.slug), mock.Mock(hex='b' * 32)]
+        with mock.patch('delivery_tracker.models.uuid4',
+                        side_effect=hexes):
+            link = UserRegistrationLink.objects.create_for(user)
+        self.assertEqual(link.slug, 'b' * 32)
+
+        with mock.patch('delivery_tracker.models.uuid4',
+                        return_value=mock.Mock(hex=existing.slug)):
+            with self.assertRaises(IntegrityError):
+                UserRegistrationLink.objects.create_for(user)
+
+    def test_purge_removes_expired_links_and_inactive_users(self):
+        for i in range(5):
+            self.create_link('old%d@example.com' % i, days_old=30)
+        fresh = self.create_link('fresh@example.com', days_old=1)
+        used = self.create_link('used@example.com', days_old=30,
+                                last_login=timezone.now())
+
+        self.assertEqual(purge_expired_links(batch_size=4), (4, 4))
+        self.assertEqual(purge_expired_links(batch_size=4), (2, 1))
+        self.assertEqual(purge_expired_links(batch_size=4), (0, 0))
+
+        self.assertEqual(
+            list(UserRegistrationLink.objects.values_list('pk', flat=True)),
+            [fresh.pk])
+        self.assertEqual(
+            sorted(User.objects.values_list('pk', flat=True)),
+            sorted([fresh.user_id, used.user_id]))
+
+
+class SessionPurgeTest(TestCase):
+
+    def test_expired_sessions_are_deleted_in_batches(self):
+        now = timezone.now()
+        for i in range(7):
+            Session.objects.create(
+                session_key='expired%d' % i, session_data='',
+                expire_date=now - datetime.timedelta(days=1))
+        Session.objects.create(session_key='alive', session_data='',
+                               expire_date=now + datetime.timedelta(days=1))
+
+        out = io.StringIO()
+        call_command('purge_sessions', batch_size=3, stdout=out)
+
+        self.assertIn('Deleted sessions: 7', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'])
+
+    @override_settings(SESSION_STRATEGY='signed_cookies',
+                       SESSION_ENGINE='django.contrib.sessions.backends.'
+                                      'signed_cookies')
+    def test_signed_cookie_sessions_skip_the_table(self):
+        User.objects.create_user('user@example.com', password='secret123')
+        self.client.login(username='user@example.com', password='secret123')
+        self.assertEqual(self.client.get('/tracker/cabinet/').status_code,
+                         200)
+        self.assertFalse(Session.objects.exists())
+
+
+class SQLiteTuningTest(TestCase):
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        routers.reset()
+        self.router = routers.ReplicaRouter()
+
+    def tearDown(self):
+        routers.reset()
+
+    def test_reads_go_to_replica_until_a_write(self):
+        self.assertEqual(self.router.db_for_read(PurchaseOrder), 'replica')
+        self.assertEqual(self.router.db_for_read(PurchaseOrderStatus),
+                         'replica')
+        self.assertIsNone(self.router.db_for_read(User))
+
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica',
+                                                   'delivery_tracker'))
+
+    def test_middleware_carries_pin_over_redirect(self):
+        middleware = ReplicaPinMiddleware()
+        post = RequestFactory().post('/tracker/cabinet/personal_data/')
+        middleware.process_request(post)
+        self.router.db_for_write(User)
+        response = middleware.process_response(post, HttpResponse())
+        self.assertFalse(routers.is_pinned())
+
+        get = RequestFactory().get('/tracker/cabinet/personal_data/')
+        get.COOKIES = {'pin_primary': response.cookies['pin_primary'].value}
+        middleware.process_request(get)
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+        middleware.process_request(RequestFactory().get('/'))
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaDatabaseTest(TestCase):
+    """
+    The primary is the test database, the replica a second SQLite file
+    holding a stale copy of the order tables.
+    """
+    REPLICATED = (PurchaseOrderStatus, PurchaseOrder, Product)
+
+    def setUp(self):
+        fd, self.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        connections.databases['replica'] = dict(
+            connections['default'].settings_dict, NAME=self.replica_path)
+        self.addCleanup(self.drop_replica)
+        routers.reset()
+
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+        order = PurchaseOrder.objects.create(
+            user=self.user, user_comment='primary',
+            status_id=statuses.id_for(PurchaseOrderStatus.REQUESTED))
+        replica = connections['replica']
+        with replica.schema_editor() as editor:
+            for model in self.REPLICATED:
+                editor.create_model(model)
+        PurchaseOrderStatus.objects.using('replica').bulk_create(
+            PurchaseOrderStatus.objects.using('default').all())
+        order.user_comment = 'replica'
+        order.save(using='replica')
+        routers.reset()
+        self.client.force_login(self.user)
+
+    def drop_replica(self):
+        routers.reset()
+        connections['replica'].close()
+        del connections.databases['replica']
+        if hasattr(connections._connections, 'replica'):
+            delattr(connections._connections, 'replica')
+        os.remove(self.replica_path)
+
+    def comment(self):
+        response = self.client.get('/tracker/api/orders/')
+        return (response.json()['orders'][0]['user_comment'],
+                'pin_primary' in response.cookies)
+
+    def test_reads_follow_writes_until_the_cookie_expires(self):
+        self.assertEqual(self.comment(), ('replica', False))
+
+        response = self.client.post(
+            '/tracker/cabinet/personal_data/',
+            {'profile_changes': '1', 'first_name': 'Anna', 'last_name': '',
+             'email': 'user@example.com'})
+        self.assertEqual(response.cookies['pin_primary']['max-age'], 5)
+
+        # pinned by the cookie, which reads do not renew
+        self.assertEqual(self.comment(), ('primary', False))
+        self.assertEqual(self.comment(), ('primary', False))
+
+        del self.client.cookies['pin_primary']
+        self.assertEqual(self.comment(), ('replica', False))
+
+
+class StaticStorageTest(TestCase):
+
+    def png(self, pixels, level):
+        def chunk(chunk_type, body):
+            return (struct.pack('>I', len(body)) + chunk_type + body +
+                    struct.pack('>I', zlib.crc32(chunk_type + body)))
+        header = struct.pack('>IIBBBBB', 64, 64, 8, 0, 0, 0, 0)
+        return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+                chunk(b'tEXt', b'Comment\x00made by hand') +
+                chunk(b'IDAT', zlib.compress(pixels, level)) +
+                chunk(b'IEND', b''))
+
+    def test_png_optimization_keeps_pixels(self):
+        pixels = b''.join(b'\x00' + bytes(range(64)) for _ in range(64))
+        original = self.png(pixels, 0)
+
+        optimized = optimize_png(original)
+
+        self.assertLess(len(optimized), len(original))
+        self.assertNotIn(b'tEXt', optimized)
+        idat = optimized.index(b'IDAT')
+        length = struct.unpack('>I', optimized[idat - 4:idat])[0]
+        self.assertEqual(
+            zlib.decompress(optimized[idat + 4:idat + 4 + length]), pixels)
+        self.assertEqual(optimize_png(b'not a png'), b'not a png')
+
+    def test_collectstatic_writes_hashed_and_gzipped_files(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with self.settings(
+                STATIC_ROOT=static_root,
+                STATICFILES_STORAGE='delivery_tracker.storage.'
+                                    'CompressedManifestStaticFilesStorage'):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            out = io.StringIO()
+            call_command('static_savings', stdout=out)
+
+        with open(os.path.join(static_root, 'staticfiles.json')) as f:
+            hashed = json.load(f)['paths']['css/custom.css']
+        self.assertTrue(os.path.exists(
+            os.path.join(static_root, hashed + '.gz')))
+        self.assertIn(hashed, out.getvalue())
+        self.assertIn('saved', out.getvalue())
+
+
+class OrderExportTest(TestCase):
+    # EXPORT_TEST_PRODUCTS=1000000 for the full size run
+    products = int(os.environ.get('EXPORT_TEST_PRODUCTS', 100000))
+    products_per_order = 10
+
+    def seed(self):
+        user = User.objects.create_user('user@example.com')
+        orders = self.products // self.products_per_order
+        requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        connection.ensure_connection()
+        db = connection.connection
+        columns, rows = fake_rows(PurchaseOrder, orders, {
+            'user_id': lambda i, rnd: user.pk,
+            'status_id': lambda i, rnd: requested,
+        })
+        db.executemany(insert_sql(PurchaseOrder, columns), rows)
+        first_order = PurchaseOrder.objects.order_by('id')[0].pk
+        columns, rows = fake_rows(Product, self.products, {
+            'purchase_order_id': lambda i, rnd: (
+                first_order + i // self.products_per_order),
+            'user_id': lambda i, rnd: user.pk,
+            'price_cents': lambda i, rnd: 1999,
+        })
+        db.executemany(insert_sql(Product, columns), rows)
+
+    def test_export_streams_in_flat_memory(self):
+        self.seed()
+        rows = bytes_out = 0
+        tracemalloc.start()
+        try:
+            for line in csv_lines(export_rows(chunk_size=200)):
+                rows += 1
+                bytes_out += len(line)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(rows, self.products + 1)
+        self.assertLess(peak, 8 * 1024 * 1024)
+        self.assertLess(peak, bytes_out / 2)
+
+    def test_admin_action_streams_selected_orders(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'secret123')
+        requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        orders = [PurchaseOrder.objects.create(user=admin, status_id=requested,
+                                               shipping_cost_cents=5)
+                  for _ in range(3)]
+        coat = Product.objects.create(
+            purchase_order=orders[0], user=admin,
+            product_link='http://shop/1', name='Coat', quantity=2,
+            price_cents=1999)
+        Product.objects.create(purchase_order=orders[1], user=admin,
+                               product_link='http://shop/2', name='Hat',
+                               quantity=1, price_cents=500)
+        self.client.force_login(admin)
+
+        response = self.client.post(
+            '/admin/delivery_tracker/purchaseorder/',
+            {'action': 'export_orders_csv',
+             '_selected_action': [orders[0].pk, orders[2].pk]})
+
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as queries:
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        # the products of the order that was not selected are not read
+        product_queries = [q['sql'] for q in queries.captured_queries
+                           if 'FROM "product"' in q['sql']]
+        self.assertEqual(len(product_queries), 1)
+        self.assertIn('"purchase_order_id" IN (SELECT', product_queries[0])
+        self.assertEqual(lines[1:], [
+            '%d,requested,admin,0.05,,%d,Coat,,,,2,19.99,http://shop/1' % (
+                orders[0].pk, coat.pk),
+            '%d,requested,admin,0.05,,,,,,,,,' % orders[2].pk,
+        ])
+
+
+class OrderTransitionTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com')
+
+    def create_orders(self, code, count):
+        status_id = statuses.id_for(code)
+        PurchaseOrder.objects.bulk_create([
+            PurchaseOrder(user=self.user, status_id=status_id,
+                          shipping_cost_cents=100)
+            for _ in range(count)
+        ])
+
+    def test_only_allowed_orders_are_moved_and_audited(self):
+        self.create_orders(PurchaseOrderStatus.REQUESTED, 3)
+        self.create_orders(PurchaseOrderStatus.RECEIVED, 2)
+
+        result = transition_orders(PurchaseOrder.objects.all(),
+                                   PurchaseOrderStatus.AWAITING_PAYMENT,
+                                   changed_by=self.user, comment='paid')
+
+        self.assertEqual((result.moved, result.skipped), (3, 2))
+        awaiting = statuses.id_for(PurchaseOrderStatus.AWAITING_PAYMENT)
+        self.assertEqual(
+            PurchaseOrder.objects.filter(status_id=awaiting).count(), 3)
+        changes = PurchaseOrderStatusChange.objects.all()
+        self.assertEqual(len(changes), 3)
+        self.assertEqual(
+            set((c.from_status.code, c.to_status_id, c.comment)
+                for c in changes),
+            {(PurchaseOrderStatus.REQUESTED, awaiting, 'paid')})
+        summary = UserOrderSummary.objects.get(user=self.user,
+                                               status_id=awaiting)
+        self.assertEqual((summary.order_count, summary.total_cents),
+                         (3, 300))
+
+    def test_query_count_does_not_depend_on_order_count(self):
+        counts = []
+        for orders in (5, 50):
+            PurchaseOrder.objects.all().delete()
+            self.create_orders(PurchaseOrderStatus.DRAFT, orders)
+            with CaptureQueriesContext(connection) as queries:
+                transition_orders(PurchaseOrder.objects.all(),
+                                  PurchaseOrderStatus.REQUESTED)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'secret123')
+        self.create_orders(PurchaseOrderStatus.AWAITING_DELIVERY, 2)
+        self.client.force_login(admin)
+
+        response = self.client.post(
+            '/admin/delivery_tracker/purchaseorder/',
+            {'action': 'move_to_received', '_selected_action':
+                list(PurchaseOrder.objects.values_list('pk', flat=True))},
+            follow=True)
+
+        self.assertContains(response, 'Moved to received: 2')
+        self.assertEqual(
+            PurchaseOrderStatusChange.objects.filter(changed_by=admin)
+            .count(), 2)
+
+
+class ProductSearchTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+        self.order = PurchaseOrder.objects.create(
+            user=self.user,
+            status_id=statuses.id_for(PurchaseOrderStatus.REQUESTED))
+        self.products = {}
+        for name, vendor_code, note in (
+                ('Winter jacket', 'JK-100', None),
+                ('Summer dress', 'DR-7', 'goes with the jacket'),
+                ('Rain boots', 'BT-3', None)):
+            self.products[name] = Product.objects.create(
+                user=self.user, purchase_order=self.order, name=name,
+                vendor_code=vendor_code, note=note, quantity=1,
+                price_cents=100, product_link='http://shop/')
+
+    def test_ranked_prefix_search_follows_updates(self):
+        found = list(search_products('jack'))
+        # a match in the name outranks one in the note
+        self.assertEqual([p.name for p in found],
+                         ['Winter jacket', 'Summer dress'])
+        # quotes and operators are not query syntax
+        self.assertEqual(list(search_products('"jack*')), found)
+
+        boots = self.products['Rain boots']
+        boots.name = 'Rain jacket'
+        boots.save()
+        self.products['Winter jacket'].delete()
+        self.assertEqual([p.name for p in search_products('jacket')],
+                         ['Rain jacket', 'Summer dress'])
+        self.assertEqual(
+            list(fallback_search('jacket', Product.objects.all())),
+            [boots, self.products['Summer dress']])
+
+    def test_search_view_and_admin(self):
+        self.client.login(username='user@example.com', password='secret123')
+        response = self.client.get('/tracker/cabinet/search/?q=dr-7')
+        self.assertEqual([p.name for p in response.context['products']],
+                         ['Summer dress'])
+        self.assertContains(response, 'Order')
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'secret123')
+        self.client.force_login(admin)
+        response = self.client.get(
+            '/admin/delivery_tracker/product/?q=boots')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class ShippingTest(TestCase):
+
+    def setUp(self):
+        self.tariffs = Tariffs(
+            {'a': Zone('a', 'A', [500, 1000, 2000], [100, 150, 250], 40)},
+            volumetric_divisor=5000)
+
+    def test_quotes(self):
+        quote = self.tariffs.quote
+        self.assertEqual(quote('a', 1), 100)
+        self.assertEqual(quote('a', 500), 100)
+        self.assertEqual(quote('a', 501), 150)
+        # 30x20x10 cm weigh 1.2 kg volumetric
+        self.assertEqual(quote('a', 300, 6000), 250)
+        # two started kilograms above the table
+        self.assertEqual(quote('a', 3500), 330)
+        parcels = [('a', 1, None), ('x', 1, None), ('a', 3500, None),
+                   ('a', 300, 6000)]
+        self.assertEqual(self.tariffs.quote_batch(parcels),
+                         [100, None, 330, 250])
+
+    def test_requote_updates_unpaid_orders_and_summary(self):
+        user = User.objects.create_user('user@example.com')
+        requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        received = statuses.id_for(PurchaseOrderStatus.RECEIVED)
+        unpaid = PurchaseOrder.objects.create(
+            user=user, status_id=requested, shipping_zone='ru-1',
+            weight_grams=900)
+        paid = PurchaseOrder.objects.create(
+            user=user, status_id=received, shipping_zone='ru-1',
+            weight_grams=900)
+        PurchaseOrder.objects.create(user=user, status_id=requested)
+
+        self.assertEqual(requote_orders(), (1, 0))
+
+        unpaid.refresh_from_db()
+        paid.refresh_from_db()
+        self.assertEqual((unpaid.shipping_cost_cents,
+                          paid.shipping_cost_cents), (1500, 0))
+        self.assertEqual(UserOrderSummary.objects.get(
+            user=user, status_id=requested).total_cents, 1500)
+
+    def test_requote_skips_orders_paid_meanwhile(self):
+        user = User.objects.create_user('user@example.com')
+        requested = statuses.id_for(PurchaseOrderStatus.REQUESTED)
+        order = PurchaseOrder.objects.create(
+            user=user, status_id=requested, shipping_zone='ru-1',
+            weight_grams=900)
+
+        def pay_then_quote(parcels):
+            PurchaseOrder.objects.filter(pk=order.pk).update(
+                status_id=statuses.id_for(PurchaseOrderStatus.IN_PROGRESS))
+            return shipping.get_tariffs().quote_batch(parcels)
+
+        with mock.patch('delivery_tracker.shipping.quote_batch',
+                        side_effect=pay_then_quote):
+            self.assertEqual(requote_orders(), (0, 0))
+        order.refresh_from_db()
+        self.assertEqual(order.shipping_cost_cents, 0)
+
+    def test_calculator_view(self):
+        response = self.client.get('/tracker/calculator/',
+                                   {'zone': 'ru-1', 'weight': '0.9'})
+        self.assertContains(response, 'Shipping: 15 euro')
+        response = self.client.get('/tracker/calculator/',
+                                   {'zone': 'nowhere', 'weight': '1'})
+        self.assertIsNone(response.context['cost'])
+
+
+@override_settings(ENRICHMENT_HOST_INTERVAL=0)
+class ProductEnrichmentTest(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.user = User.objects.create_user('user@example.com')
+
+    def add_product(self, link, **fields):
+        defaults = dict(user=self.user, product_link=link, color='', size='',
+                        quantity=1, price_cents=0)
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+    def test_parsing(self):
+        self.assertEqual(normalize_url('HTTP://Shop.COM:80/a?b=1#top'),
+                         'http://shop.com/a?b=1')
+        self.assertEqual(parse_price('1 299,90 EUR'), 129990)
+        self.assertEqual(parse_price('1,299.90'), 129990)
+        self.assertEqual(parse_price('12,50'), 1250)
+        self.assertIsNone(parse_price('sold out'))
+        self.assertEqual(parse_product_page(
+            '<title>Shop | Jacket</title>'
+            '<meta property="product:price:amount" content="59.00">'),
+            {'name': 'Shop | Jacket', 'price_cents': 5900})
+        self.assertEqual(parse_product_page(StubShop.page(7)), {
+            'name': 'Item 7', 'vendor_code': 'SKU-00007',
+            'price_cents': 799})
+
+    def test_fills_empty_fields_and_caches_pages(self):
+        with StubShop() as shop:
+            blank = self.add_product(shop.url(3))
+            # same page spelled differently, fetched once
+            typed = self.add_product(
+                shop.url(3).replace('http', 'HTTP') + '#reviews',
+                name='My name', vendor_code='MINE', price_cents=100)
+            missing = self.add_product(shop.url(3).replace('item', 'gone'))
+
+            result = enrich_products(cache_dir=self.cache_dir)
+            self.assertEqual((result.links, result.fetched, result.failed),
+                             (2, 1, 1))
+            self.assertEqual(shop.requests, 2)
+
+            blank.refresh_from_db()
+            typed.refresh_from_db()
+            missing.refresh_from_db()
+            self.assertEqual((blank.name, blank.vendor_code,
+                              blank.price_cents), ('Item 3', 'SKU-00003', 399))
+            self.assertEqual((typed.name, typed.vendor_code,
+                              typed.price_cents), ('My name', 'MINE', 100))
+            self.assertIsNone(missing.name)
+
+            result = enrich_products(cache_dir=self.cache_dir)
+            self.assertEqual((result.fetched, result.cached), (0, 1))
+            self.assertEqual(shop.requests, 3)
+
+    def test_bumps_the_versions_of_the_owners(self):
+        with StubShop() as shop:
+            product = self.add_product(shop.url(4), price_cents=100)
+            version = get_user_version(product.user_id)
+            enrich_products(cache_dir=self.cache_dir)
+        # only the name and vendor code changed, the totals did not
+        self.assertGreater(get_user_version(product.user_id), version)
+
+    @override_settings(ENRICHMENT_BATCH_SIZE=1)
+    def test_rebuilds_summaries_in_batches(self):
+        other = User.objects.create_user('other@example.com')
+        with StubShop() as shop:
+            self.add_product(shop.url(1))
+            self.add_product(shop.url(1), user=other)
+            with mock.patch('delivery_tracker.enrichment.rebuild_summaries',
+                            wraps=rebuild_summaries) as rebuild:
+                enrich_products(cache_dir=self.cache_dir)
+        self.assertEqual([c[0][0] for c in rebuild.call_args_list],
+                         [[self.user.pk], [other.pk]])
+
+    def test_reads_large_pages_to_the_end(self):
+        with StubShop(padding=400 * 1024, write_size=8192) as shop:
+            pages, fetched, cached, failed = fetch_pages(
+                [normalize_url(shop.url(5))], 1, 0, 5)
+        page = pages[normalize_url(shop.url(5))]
+        self.assertEqual(len(page), len(StubShop.page(5, 400 * 1024)))
+        self.assertEqual(parse_product_page(page)['vendor_code'], 'SKU-00005')
+
+    def test_fetches_concurrently(self):
+        with StubShop(delay=0.2) as shop:
+            urls = [normalize_url(shop.url(i)) for i in range(20)]
+            start = timezone.now()
+            pages, fetched, cached, failed = fetch_pages(urls, 10, 0, 5)
+            elapsed = (timezone.now() - start).total_seconds()
+        self.assertEqual((fetched, failed), (20, 0))
+        # 4 seconds one after another
+        self.assertLess(elapsed, 2)
+
+    def test_spaces_requests_to_one_host(self):
+        with StubShop() as shop:
+            urls = [normalize_url(shop.url(i)) for i in range(4)]
+            start = timezone.now()
+            fetch_pages(urls, 10, 0.1, 5)
+            elapsed = (timezone.now() - start).total_seconds()
+        self.assertGreaterEqual(elapsed, 0.3)
+
+    def test_timeout(self):
+        with StubShop(delay=1) as shop:
+            pages, fetched, cached, failed = fetch_pages(
+                [normalize_url(shop.url(1))], 1, 0, 0.1)
+        self.assertEqual((pages, failed), ({}, 1))
+
+
+class ProductLinkTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+
+    def add_product(self, link, **fields):
+        defaults = dict(user=self.user, product_link=link, quantity=1,
+                        price_cents=100)
+        defaults.update(fields)
+        return Product.objects.create(**defaults)
+
+    def test_canonical_link(self):
+        self.assertEqual(
+            canonical_link('HTTPS://Shop.example.COM/item/1?color=red&'
+                           'utm_source=mail&UTM_Medium=x&gclid=1&size=M'
+                           '#reviews'),
+            'https://shop.example.com/item/1?color=red&size=M')
+        self.assertEqual(canonical_link('http://shop.example.com?fbclid=1'),
+                         'http://shop.example.com/')
+        self.assertNotEqual(link_hash('http://shop/item?color=red'),
+                            link_hash('http://shop/item?color=blue'))
+
+    def test_same_item_lookup(self):
+        first = self.add_product('http://shop.example.com/item/1?utm_id=4')
+        second = self.add_product('http://SHOP.example.com/item/1#top')
+        other = self.add_product('http://shop.example.com/item/2')
+        other.product_link = 'http://shop.example.com/item/1'
+        other.save(update_fields=['product_link'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                set(Product.objects.same_item(
+                    'http://shop.example.com/item/1?gclid=9')),
+                {first, second, other})
+        self.assertEqual(len(list(Product.objects.same_items(
+            ['http://shop.example.com/item/1', 'http://shop/x']))), 3)
+        with mock.patch('delivery_tracker.models.LOOKUP_BATCH_SIZE', 1):
+            with self.assertNumQueries(2):
+                found = list(Product.objects.same_items(
+                    ['http://shop.example.com/item/1',
+                     'http://shop.example.com/item/2']))
+        self.assertEqual(len(found), 3)
+        self.assertEqual(
+            set(search_products('https://nowhere.example.com/item/1')), set())
+        self.assertEqual(
+            set(search_products('http://shop.example.com/item/1?ref=x')),
+            {first, second, other})
+
+    def test_import_reuses_known_metadata(self):
+        other = User.objects.create_user('other@example.com')
+        self.add_product('http://shop.example.com/item/1', user=other,
+                         name='Jacket', vendor_code='JK-1')
+        lines = ['product_link,name,vendor_code,quantity,price',
+                 'http://shop.example.com/item/1?utm_source=x,,,1,5',
+                 'http://shop.example.com/item/1,Mine,,1,5',
+                 'http://shop.example.com/item/2,,,1,5']
+        data = io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+        import_products(data, 'csv', self.user)
+
+        self.assertEqual(
+            list(Product.objects.filter(user=self.user).order_by('id')
+                 .values_list('name', 'vendor_code', 'link_hash')),
+            [('Jacket', 'JK-1', link_hash('http://shop.example.com/item/1')),
+             ('Mine', 'JK-1', link_hash('http://shop.example.com/item/1')),
+             (None, None, link_hash('http://shop.example.com/item/2'))])
+
+    def test_backfill_migration(self):
+        product = self.add_product('http://Shop.example.com/a?utm_id=1')
+        Product.objects.update(link_hash='')
+        migration = importlib.import_module(
+            'delivery_tracker.migrations.0015_product_link_hash')
+
+        migration.fill_link_hashes(apps, mock.Mock(connection=connection))
+
+        product.refresh_from_db()
+        self.assertEqual(product.link_hash,
+                         link_hash('http://shop.example.com/a'))
+
+
+class JsonApiTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+        self.order = PurchaseOrder.objects.create(
+            user=self.user,
+            status_id=statuses.id_for(PurchaseOrderStatus.REQUESTED))
+        Product.objects.create(user=self.user, purchase_order=self.order,
+                               product_link='http://shop/1', name='Jacket',
+                               quantity=2, price_cents=1000)
+        self.client.login(username='user@example.com', password='secret123')
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/tracker/api/profile/').status_code,
+                         401)
+
+    def test_payloads(self):
+        profile = self.client.get('/tracker/api/profile/').json()
+        self.assertEqual((profile['id'], profile['email']),
+                         (self.user.pk, 'user@example.com'))
+
+        summary = self.client.get('/tracker/api/orders/summary/').json()
+        self.assertEqual(summary['statuses'], [{
+            'status': 'requested', 'order_count': 1, 'total_cents': 2000}])
+
+        orders = self.client.get('/tracker/api/orders/').json()
+        self.assertEqual(orders['next_after'], None)
+        self.assertEqual(orders['orders'][0]['status'], 'requested')
+        self.assertEqual(orders['orders'][0]['products'][0]['name'],
+                         'Jacket')
+        self.assertEqual(self.client.get('/tracker/api/orders/',
+                                         {'status': 'received'}).json(),
+                         {'orders': [], 'next_after': None})
+        response = self.client.get('/tracker/api/orders/', {'status': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_conditional_get(self):
+        response = self.client.get('/tracker/api/orders/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"orders-'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # only the session is read, neither the user nor the orders
+        with self.assertNumQueries(1):
+            response = self.client.get('/tracker/api/orders/',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            '/tracker/api/orders/',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.order.user_comment = 'Please hurry'
+        self.order.save()
+        response = self.client.get('/tracker/api/orders/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = self.client.get('/tracker/api/profile/')['ETag']
+        self.user.first_name = 'Anna'
+        self.user.save()
+        response = self.client.get('/tracker/api/profile/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['first_name'], 'Anna')
+
+    def test_requires_a_shared_cache_outside_debug(self):
+        locmem = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        memcached = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211'}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            self.assertEqual([e.id for e in check_shared_cache(None)],
+                             ['delivery_tracker.E001'])
+        with override_settings(DEBUG=True, CACHES=locmem):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(DEBUG=False, CACHES=memcached):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class OrderArchiveTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com',
+                                             password='secret123')
+        self.received = statuses.id_for(PurchaseOrderStatus.RECEIVED)
+        self.in_progress = statuses.id_for(PurchaseOrderStatus.IN_PROGRESS)
+        old = timezone.now() - datetime.timedelta(days=100)
+        self.old_received = self.add_order(self.received, old)
+        self.new_received = self.add_order(self.received, timezone.now())
+        self.old_in_progress = self.add_order(self.in_progress, old)
+        PurchaseOrderStatusChange.objects.create(
+            purchase_order=self.old_received, from_status_id=self.in_progress,
+            to_status_id=self.received, created_date=old)
+
+    def add_order(self, status_id, status_changed_date):
+        order = PurchaseOrder.objects.create(user=self.user,
+                                             status_id=status_id)
+        Product.objects.create(user=self.user, purchase_order=order,
+                               product_link='http://shop/%d' % order.pk,
+                               name='Archive item %d' % order.pk,
+                               quantity=1, price_cents=500)
+        PurchaseOrder.objects.filter(pk=order.pk).update(
+            status_changed_date=status_changed_date)
+        return order
+
+    def test_status_changed_date_follows_status(self):
+        order = self.old_in_progress
+        transition_orders(PurchaseOrder.objects.filter(pk=order.pk),
+                          PurchaseOrderStatus.AWAITING_DELIVERY)
+        order.refresh_from_db()
+        moved = order.status_changed_date
+        self.assertGreater(moved, timezone.now() - datetime.timedelta(1))
+
+        order.user_comment = 'no status change'
+        order.save()
+        self.assertEqual(order.status_changed_date, moved)
+        order.status_id = self.received
+        order.save()
+        self.assertGreater(order.status_changed_date, moved)
+
+    def test_moves_old_finished_orders_with_their_rows(self):
+        self.assertEqual(archive_orders(days=30, batch_size=1), 1)
+        self.assertEqual(archive_orders(days=30), 0)
+
+        order_id = self.old_received.pk
+        self.assertFalse(PurchaseOrder.objects.filter(pk=order_id).exists())
+        self.assertFalse(Product.objects.filter(
+            purchase_order_id=order_id).exists())
+        archived = ArchivedPurchaseOrder.objects.get()
+        self.assertEqual((archived.pk, archived.status_id),
+                         (order_id, self.received))
+        self.assertEqual(archived.product_set.get().name,
+                         'Archive item %d' % order_id)
+        self.assertEqual(
+            ArchivedPurchaseOrderStatusChange.objects.get().purchase_order_id,
+            order_id)
+        # the search index followed the delete
+        self.assertEqual(
+            [p.purchase_order_id for p in search_products('archive')],
+            [self.old_in_progress.pk, self.new_received.pk])
+        self.assertEqual(UserOrderSummary.objects.get(
+            user=self.user, status_id=self.received).order_count, 1)
+
+    def test_batch_skips_orders_no_longer_archivable(self):
+        orders = archivable_orders(days=30)
+        picked = list(orders.values_list('id', flat=True))
+        # picked, then the order changed before its batch ran
+        PurchaseOrder.objects.filter(pk=self.old_received.pk).update(
+            status_changed_date=timezone.now())
+
+        self.assertEqual(archive_batch(orders, picked), [])
+        self.assertFalse(ArchivedPurchaseOrder.objects.exists())
+        self.assertFalse(ArchivedProduct.objects.exists())
+        self.assertFalse(ArchivedPurchaseOrderStatusChange.objects.exists())
+        self.assertTrue(Product.objects.filter(
+            purchase_order=self.old_received).exists())
+
+        # of a mixed batch only the archivable order and its rows move
+        PurchaseOrder.objects.filter(pk=self.old_received.pk).update(
+            status_changed_date=timezone.now() - datetime.timedelta(days=100))
+        moved = archive_batch(orders, [self.old_received.pk,
+                                       self.new_received.pk,
+                                       self.old_in_progress.pk])
+        self.assertEqual(moved, [(self.old_received.pk, self.user.pk)])
+        self.assertEqual(
+            list(ArchivedProduct.objects.values_list('purchase_order_id',
+                                                     flat=True)),
+            [self.old_received.pk])
+
+    def test_history_with_archived_orders(self):
+        archive_orders(days=30)
+        hot, _ = order_page(self.user)
+        self.assertEqual([o.pk for o in hot],
+                         [self.old_in_progress.pk, self.new_received.pk])
+        merged, next_after = order_page(self.user, include_archived=True,
+                                        page_size=2)
+        self.assertEqual([o.pk for o in merged],
+                         [self.old_in_progress.pk, self.new_received.pk])
+        rest, _ = order_page(self.user, include_archived=True,
+                             after=next_after, page_size=2)
+        self.assertEqual([o.pk for o in rest], [self.old_received.pk])
+
+        self.client.login(username='user@example.com', password='secret123')
+        response = self.client.get('/tracker/cabinet/orders/',
+                                   {'archived': '1'})
+        self.assertContains(response, 'Archive item %d' %
+                            self.old_received.pk)
+        orders = self.client.get('/tracker/api/orders/',
+                                 {'archived': '1'}).json()['orders']
+        self.assertEqual([o['archived'] for o in orders],
+                         [False, False, True])
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                              'secret123')
+        self.client.force_login(admin)
+        response = self.client.get(
+            '/admin/delivery_tracker/archivedpurchaseorder/%d/change/' %
+            self.old_received.pk)
+        self.assertContains(response, 'Archive item %d' %
+                            self.old_received.pk)
@@ -0,0 +1,67 @@
+"""
+Login throttling by client IP and by username.
+
+Failed attempts are counted in the Django cache over a sliding window
+(approximated from the current and the previous fixed window), and
+``is_throttled`` is checked before ``authenticate`` so rejected attempts
+never reach the password hasher.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+KEY_PREFIX = 'delivery_tracker:login_throttle'
+
+
+def _key(scope, value, window):
+    digest = hashlib.md5(value.lower().encode('utf-8')).hexdigest()
+    return '%s:%s:%s:%d' % (KEY_PREFIX, scope, digest, window)
+
+
+def _identities(request, username):
+    identities = [('ip', request.META.get('REMOTE_ADDR') or '',
+                   settings.LOGIN_THROTTLE_IP_LIMIT)]
+    if username:
+        identities.append(('user', username,
+                           settings.LOGIN_THROTTLE_USERNAME_LIMIT))
+    return identities
+
+
+def _sliding_count(scope, value, now):
+    period = settings.LOGIN_THROTTLE_WINDOW
+    window = int(now // period)
+    counts = cache.get_many([_key(scope, value, window),
+                             _key(scope, value, window - 1)])
+    current = counts.get(_key(scope, value, window), 0)
+    previous = counts.get(_key(scope, value, window - 1), 0)
+    elapsed = (now % period) / float(period)
+    return current + previous * (1 - elapsed)
+
+
+def is_throttled(request, username):
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return False
+    now = time.time()
+    return any(
+        _sliding_count(scope, value, now) >= limit
+        for scope, value, limit in _identities(request, username)
+    )
+
+
+def register_failure(request, username):
+    if not settings.LOGIN_THROTTLE_ENABLED:
+        return
+    period = settings.LOGIN_THROTTLE_WINDOW
+    window = int(time.time() // period)
+    for scope, value, _ in _identities(request, username):
+        key = _key(scope, value, window)
+        # the counter has to outlive its window to serve as "previous"
+        cache.add(key, 0, period * 2)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # expired between add and incr
+            cache.set(key, 1, period * 2)
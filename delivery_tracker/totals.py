@@ -0,0 +1,70 @@
+"""
+Order totals in euro cents, computed by the database.
+
+Money is stored as integer cents, so the sums are exact and no model
+instances have to be built to get them.
+"""
+from django.db import connections
+from django.db.models import F, IntegerField, Sum
+
+from delivery_tracker.models import PurchaseOrder, Product
+
+
+PRODUCTS_TOTAL = Sum(F('product__price_cents') * F('product__quantity'),
+                     output_field=IntegerField())
+
+
+def order_totals(orders):
+    """
+    ``{order id: total cents}`` for a PurchaseOrder queryset, products
+    ``price * quantity`` plus shipping, in one grouped query.
+    """
+    return dict(
+        (order_id, shipping + (total or 0))
+        for order_id, shipping, total in (
+            orders.values_list('id', 'shipping_cost_cents')
+            .annotate(total=PRODUCTS_TOTAL)
+            .order_by())
+    )
+
+
+def status_totals(user_ids=None, status_ids=None):
+    """
+    ``{(user id, status id): [order count, total cents]}`` over the orders
+    of the given users and statuses (all of them by default), in one
+    grouped query. The products are summed per order in a subquery, a
+    join would count the shipping of an order once per product.
+    """
+    connection = connections[PurchaseOrder.objects.db]
+    qn = connection.ops.quote_name
+    where, params = [], []
+    for column, ids in (('user_id', user_ids), ('status_id', status_ids)):
+        if ids is not None:
+            if not ids:
+                return {}
+            placeholders = ', '.join(['%s'] * len(ids))
+            where.append('o.%s IN (%s)' % (qn(column), placeholders))
+            params.extend(ids)
+    sql = (
+        'SELECT o.{user_id}, o.{status_id}, COUNT(*), '
+        'SUM(o.{shipping} + COALESCE((SELECT SUM(p.{price} * p.{quantity}) '
+        'FROM {product} p WHERE p.{order_id} = o.{id}), 0)) '
+        'FROM {order} o {where} GROUP BY o.{user_id}, o.{status_id}'
+    ).format(
+        user_id=qn('user_id'), status_id=qn('status_id'), id=qn('id'),
+        shipping=qn('shipping_cost_cents'), price=qn('price_cents'),
+        quantity=qn('quantity'), order_id=qn('purchase_order_id'),
+        product=qn(Product._meta.db_table),
+        order=qn(PurchaseOrder._meta.db_table),
+        where='WHERE ' + ' AND '.join(where) if where else '',
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dict(((user_id, status_id), [count, total or 0])
+                    for user_id, status_id, count, total in cursor.fetchall())
+
+
+def user_total(user_id, status_ids=None):
+    """Total cents of all the user's orders, optionally by status."""
+    return sum(total for _, total in
+               status_totals([user_id], status_ids).values())
@@ -0,0 +1,82 @@
+"""
+Status changes of many purchase orders at once.
+
+``transition_orders`` moves every order of a queryset that may go to the
+target status with one UPDATE, records the changes in
+``purchase_order_status_change`` with ``bulk_create`` and then rebuilds the
+summaries of the affected users. No order is saved one by one, so none of
+the per-order signals run.
+"""
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from delivery_tracker import statuses
+from delivery_tracker.models import (
+    PurchaseOrder, PurchaseOrderStatus as Status, PurchaseOrderStatusChange
+)
+from delivery_tracker.summary import rebuild_summaries
+
+
+# status code -> codes an order in it may be moved to
+ALLOWED_TRANSITIONS = {
+    Status.DRAFT: (Status.REQUESTED, Status.CANCELLED),
+    Status.REQUESTED: (Status.AWAITING_PAYMENT, Status.CANCELLED),
+    Status.AWAITING_PAYMENT: (Status.IN_PROGRESS, Status.CANCELLED),
+    Status.IN_PROGRESS: (Status.AWAITING_DELIVERY, Status.CANCELLED),
+    Status.AWAITING_DELIVERY: (Status.PARTIALLY_RECEIVED, Status.RECEIVED),
+    Status.PARTIALLY_RECEIVED: (Status.RECEIVED, ),
+    Status.RECEIVED: (),
+    Status.CANCELLED: (),
+}
+
+
+class TransitionResult(object):
+
+    def __init__(self, moved, skipped):
+        self.moved = moved
+        self.skipped = skipped
+
+
+def sources_of(to_code):
+    """Codes of the statuses orders may be moved to ``to_code`` from."""
+    return [code for code, targets in sorted(ALLOWED_TRANSITIONS.items())
+            if to_code in targets]
+
+
+def transition_orders(orders, to_code, changed_by=None, comment=''):
+    """
+    Move the orders of the queryset ``orders`` that are allowed to go to
+    ``to_code``; the others are left alone and counted as skipped.
+    """
+    to_status = statuses.get(to_code)
+    from_ids = statuses.ids_for(sources_of(to_code))
+    now = timezone.now()
+    # read the current statuses where they are written, not on a replica
+    db = router.db_for_write(PurchaseOrder)
+    orders = orders.using(db)
+    with transaction.atomic(using=db):
+        movable = orders.filter(status_id__in=from_ids)
+        # the rows stay locked until the UPDATE, so no order changes status
+        # between the read and the audit rows recording it. SQLite has no
+        # row locks: its write transaction fails instead if another one
+        # committed since the read.
+        moved = list(movable.select_for_update()
+                     .values_list('id', 'user_id', 'status_id'))
+        skipped = orders.count() - len(moved)
+        if not moved:
+            return TransitionResult(0, skipped)
+        movable.update(status=to_status, status_changed_date=now)
+        PurchaseOrderStatusChange.objects.bulk_create([
+            PurchaseOrderStatusChange(
+                purchase_order_id=order_id, from_status_id=status_id,
+                to_status=to_status, changed_by=changed_by,
+                created_date=now, comment=comment)
+            for order_id, _, status_id in moved
+        ], batch_size=settings.ORDER_TRANSITION_BATCH_SIZE)
+
+        user_ids = sorted(set(user_id for _, user_id, _ in moved))
+        batch = settings.ORDER_TRANSITION_BATCH_SIZE
+        for start in range(0, len(user_ids), batch):
+            rebuild_summaries(user_ids[start:start + batch])
+    return TransitionResult(len(moved), skipped)
@@ -1,6 +1,6 @@
 from django.conf.urls import url
 
-from delivery_tracker import views
+from delivery_tracker import api, views
 
 
 urlpatterns = [
@@ -16,6 +16,16 @@ urlpatterns = [
         views.user_logout, name='logout'),
     url(r'^tracker/cabinet/$',
         views.cabinet, name='cabinet'),
+    url(r'^tracker/cabinet/orders/$',
+        views.orders, name='cabinet_orders'),
+    url(r'^tracker/calculator/$',
+        views.calculator, name='calculator'),
+    url(r'^tracker/cabinet/search/$',
+        views.search, name='cabinet_search'),
     url(r'^tracker/cabinet/personal_data/$',
         views.personal_data, name='cabinet_personal_data'),
+    url(r'^tracker/api/profile/$', api.profile, name='api_profile'),
+    url(r'^tracker/api/orders/$', api.order_list, name='api_orders'),
+    url(r'^tracker/api/orders/summary/$',
+        api.order_summary, name='api_order_summary'),
 ]
@@ -1,5 +1,8 @@
+from decimal import Decimal, ROUND_HALF_UP
+import hashlib
 from random import SystemRandom
 import string
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 
 def generate_password(length=8):
@@ -10,4 +13,72 @@ def generate_password(length=8):
     choices = choices.replace('l', '')
     choices = choices.replace('I', '')
     choices = choices.replace('1', '')
-    return ''.join(SystemRandom().choice(choices) for _ in range(length))
\ No newline at end of file
+    return ''.join(SystemRandom().choice(choices) for _ in range(length))
+
+
+def keyset_page(queryset, after, page_size):
+    """
+    Return ``(items, next_after)`` for a queryset ordered by descending id.
+
+    Instead of OFFSET the page starts right below the ``after`` id, so the
+    cost of a page does not grow with its number.
+    """
+    if after:
+        queryset = queryset.filter(id__lt=after)
+    items = list(queryset.order_by('-id')[:page_size + 1])
+    next_after = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_after = items[-1].id
+    return items, next_after
+
+
+def to_cents(amount):
+    """Decimal euro amount to integer cents, rounding half up."""
+    return int((amount * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    One spelling per address: lowercase scheme and host, no credentials,
+    no default port, no fragment and at least ``/`` as the path.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = '%s:%d' % (host, parts.port)
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+# query parameters that only tell the shop where the visitor came from
+TRACKING_PARAMS = frozenset([
+    'gclid', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'igshid', 'ref', 'ref_src',
+    'spm', 'srsltid',
+])
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_')
+
+
+def canonical_link(url):
+    """
+    ``normalize_url`` without tracking parameters, the rest of the query
+    keeps its order so links that differ in real parameters stay apart.
+    """
+    parts = urlsplit(normalize_url(url))
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and
+        not name.lower().startswith(TRACKING_PREFIXES)
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def link_hash(url):
+    """40 hex digits identifying the canonical form of ``url``."""
+    return hashlib.sha1(canonical_link(url).encode('utf-8')).hexdigest()
@@ -1,6 +1,3 @@
-import datetime
-from uuid import uuid4
-
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import (
@@ -8,13 +5,22 @@ from django.contrib.auth import (
 )
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.core.urlresolvers import reverse
+from django.db import transaction
 from django.shortcuts import render, redirect, HttpResponse
-from django.template.loader import render_to_string
 
-from delivery_tracker.forms import UserForm, ForgotPasswordForm, UserInfoForm
-from delivery_tracker.models import UserRegistrationLink
+from delivery_tracker import shipping, statuses, throttling
+from delivery_tracker.archive import order_page
+from delivery_tracker.emails import render_email
+from delivery_tracker.forms import (
+    UserForm, ForgotPasswordForm, UserInfoForm, ShippingQuoteForm
+)
+from delivery_tracker.mail import queue_mail
+from delivery_tracker.models import (
+    PurchaseOrderStatus, Product, UserRegistrationLink
+)
+from delivery_tracker.search import search_products
+from delivery_tracker.summary import cached_cabinet_counters
 from delivery_tracker.utils import generate_password
 
 
@@ -29,40 +35,29 @@ def register(request):
         user_form = UserForm(data=request.POST)
 
         if user_form.is_valid():
-            user = user_form.save()
-            user.set_password(user.password)
-            user.is_active = 0
-            user.save()
-            registered = True
+            # a user without the email to activate it can not register again
+            with transaction.atomic():
+                user = user_form.save(commit=False)
+                user.set_password(user.password)
+                user.is_active = 0
+                user.save()
 
-            new_slug = str(uuid4()).replace('-', '')
-            while UserRegistrationLink.objects.filter(slug=new_slug).count():
-                new_slug = str(uuid4()).replace('-', '')
-            UserRegistrationLink.objects.create(
-                user=user,
-                slug=new_slug,
-                created_date=datetime.datetime.now()
-            )
+                registration_link = UserRegistrationLink.objects.create_for(
+                    user)
 
-            # TODO: fix texts and link
-            link = ('%s/tracker/finish_registration/%s/' %
-                    (request.get_host(), new_slug, ))
-            text_msg = render_to_string(
-                'delivery_tracker/email/finish_registration.txt',
-                {'registration_link': link}
-            )
-            html_msg = render_to_string(
-                'delivery_tracker/email/finish_registration.html',
-                {'registration_link': link}
-            )
-            send_mail(
-                'Finish your registration at EuroDelivery',
-                text_msg,
-                settings.EMAIL_HOST_USER,
-                [user.username, ],
-                fail_silently=False,
-                html_message=html_msg
-            )
+                # TODO: fix texts and link
+                link = ('%s/tracker/finish_registration/%s/' %
+                        (request.get_host(), registration_link.slug, ))
+                text_msg, html_msg = render_email(
+                    'finish_registration', {'registration_link': link})
+                queue_mail(
+                    'Finish your registration at EuroDelivery',
+                    text_msg,
+                    settings.EMAIL_HOST_USER,
+                    [user.username, ],
+                    html_message=html_msg
+                )
+            registered = True
 
     else:
         user_form = UserForm()
@@ -76,9 +71,13 @@ def register(request):
 
 def finish_registration(request, slug):
     try:
-        link = UserRegistrationLink.objects.get(slug=slug)
+        link = UserRegistrationLink.objects.select_related('user').get(
+            slug=slug)
+        if link.is_expired():
+            return HttpResponse('Sorry, but your link has expired.')
         link.user.is_active = 1
         link.user.save()
+        link.delete()
         return HttpResponse('Congratz! Registration finished!')
     except UserRegistrationLink.DoesNotExist:
         return HttpResponse('Sorry, but your link is incorrect.')
@@ -93,24 +92,18 @@ def forgot_password(request):
             try:
                 user = User.objects.get(username=username)
                 new_password = generate_password()
-                text_msg = render_to_string(
-                    'delivery_tracker/email/restore_password.txt',
-                    {'new_password': new_password}
-                )
-                html_msg = render_to_string(
-                    'delivery_tracker/email/restore_password.html',
-                    {'new_password': new_password}
-                )
-                send_mail(
-                    'Your new password at EuroDelivery',
-                    text_msg,
-                    settings.EMAIL_HOST_USER,
-                    [user.username, ],
-                    fail_silently=False,
-                    html_message=html_msg
-                )
-                user.set_password(new_password)
-                user.save()
+                text_msg, html_msg = render_email(
+                    'restore_password', {'new_password': new_password})
+                with transaction.atomic():
+                    user.set_password(new_password)
+                    user.save()
+                    queue_mail(
+                        'Your new password at EuroDelivery',
+                        text_msg,
+                        settings.EMAIL_HOST_USER,
+                        [user.username, ],
+                        html_message=html_msg
+                    )
                 password_restore_message = (
                     'We have sent a new password to the specified email'
                 )
@@ -138,6 +131,13 @@ def user_login(request):
         username = request.POST.get('username')
         password = request.POST.get('password')
 
+        if throttling.is_throttled(request, username):
+            context['status_message'] = (
+                'Too many login attempts, please try again later'
+            )
+            return render(request, 'delivery_tracker/login.html', context,
+                          status=429)
+
         user = authenticate(username=username, password=password)
 
         if user:
@@ -147,6 +147,7 @@ def user_login(request):
             else:
                 context['status_message'] = 'Your account has been expired'
         else:
+            throttling.register_failure(request, username)
             context['status_message'] = 'Invalid username or password'
 
     return render(request, 'delivery_tracker/login.html', context)
@@ -160,7 +161,84 @@ def user_logout(request):
 
 @login_required
 def cabinet(request):
-    return render(request, 'delivery_tracker/cabinet.html')
+    context = {
+        'counters': cached_cabinet_counters(request.user),
+        'awaiting_payment': statuses.id_for(
+            PurchaseOrderStatus.AWAITING_PAYMENT),
+        'cabinet_cache_timeout': settings.CABINET_CACHE_TIMEOUT,
+    }
+    return render(request, 'delivery_tracker/cabinet.html', context)
+
+
+@login_required
+def orders(request):
+    status = request.GET.get('status', '')
+    after = request.GET.get('after', '')
+    archived = request.GET.get('archived') == '1'
+    page, next_after = order_page(
+        request.user,
+        status_id=int(status) if status.isdigit() else None,
+        after=int(after) if after.isdigit() else None,
+        include_archived=archived,
+    )
+    for order in page:
+        order.status = statuses.by_id(order.status_id)
+    context = {
+        'orders': page,
+        'next_after': next_after,
+        'status': status,
+        'archived': archived,
+        'awaiting_payment': statuses.id_for(
+            PurchaseOrderStatus.AWAITING_PAYMENT),
+    }
+    return render(request, 'delivery_tracker/orders.html', context)
+
+
+def calculator(request):
+    tariffs = shipping.get_tariffs()
+    cost = None
+    if 'zone' in request.GET:
+        form = ShippingQuoteForm(request.GET, zones=tariffs.zones)
+        if form.is_valid():
+            cost = shipping.quote(*form.parcel())
+    else:
+        form = ShippingQuoteForm(zones=tariffs.zones)
+    zones = [
+        (zone, list(zip(zone.weights, zone.prices)))
+        for zone in sorted(tariffs.zones.values(), key=lambda z: z.code)
+    ]
+    context = {'form': form, 'cost': cost, 'zones': zones}
+    return render(request, 'delivery_tracker/calculator.html', context)
+
+
+@login_required
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = request.GET.get('page', '')
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+    page_size = settings.SEARCH_PAGE_SIZE
+    products = []
+    if query:
+        found = search_products(
+            query,
+            Product.objects.filter(user=request.user)
+            .select_related('purchase_order')
+        )
+        products = list(found[(page - 1) * page_size:page * page_size + 1])
+    has_next = len(products) > page_size
+    products = products[:page_size]
+    for product in products:
+        if product.purchase_order is not None:
+            product.purchase_order.status = statuses.by_id(
+                product.purchase_order.status_id)
+    context = {
+        'query': query,
+        'products': products,
+        'page': page,
+        'previous_page': page - 1,
+        'next_page': page + 1 if has_next else None,
+    }
+    return render(request, 'delivery_tracker/search.html', context)
 
 
 @login_required
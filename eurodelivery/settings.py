@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'delivery_tracker.middleware.PerformanceMiddleware',
+    'delivery_tracker.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,9 +81,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # seconds to keep a connection open between requests
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Alias in DATABASES of a read replica of 'default'. Reads of orders,
+# products and statuses go there unless the request already wrote, see
+# delivery_tracker/routers.py. None keeps everything on 'default'.
+REPLICA_DATABASE = None
+DATABASE_ROUTERS = ['delivery_tracker.routers.ReplicaRouter']
+# after a write the client reads from the primary for this many seconds
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE_NAME = 'pin_primary'
+
+# PRAGMAs run in this order on every new SQLite connection, see
+# delivery_tracker/sqlite.py. WAL lets readers work while one writer
+# commits, busy_timeout (ms) makes writers wait for the lock instead of
+# failing with "database is locked". Override in local_settings.py.
+SQLITE_PRAGMAS = [
+    ('busy_timeout', 5000),
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    # negative: KiB instead of pages
+    ('cache_size', -16000),
+    ('mmap_size', 64 * 1024 * 1024),
+]
+
+
+PASSWORD_HASHERS = [
+    'delivery_tracker.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# Work factor of new hashes; older hashes are upgraded on the next login
+PASSWORD_PBKDF2_ITERATIONS = 24000
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -124,7 +157,153 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 LOGIN_URL = '/tracker/login/'
 
+# Outgoing email queue, see delivery_tracker/mail.py
+EMAIL_QUEUE_BATCH_SIZE = 100
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+# seconds, doubled after every failed attempt
+EMAIL_QUEUE_RETRY_DELAY = 60
+EMAIL_QUEUE_MAX_RETRY_DELAY = 60 * 60
+
+# Rows per bulk_create transaction in delivery_tracker/importers.py
+PRODUCT_IMPORT_CHUNK_SIZE = 2000
+# Shipping tariffs of delivery_tracker/shipping.py, read once per process
+SHIPPING_TARIFFS_FILE = os.path.join(BASE_DIR, 'delivery_tracker', 'data',
+                                     'tariffs.json')
+# Orders per chunk of the requote_shipping command
+SHIPPING_REQUOTE_BATCH_SIZE = 500
+
+# Product page fetching of delivery_tracker/enrichment.py: requests in
+# flight, seconds between two requests to the same shop, seconds before a
+# request is given up
+ENRICHMENT_CONCURRENCY = 10
+ENRICHMENT_HOST_INTERVAL = 0.5
+ENRICHMENT_TIMEOUT = 15
+ENRICHMENT_USER_AGENT = 'eurodelivery-tracker/1.0'
+# Fetched pages are kept here for ENRICHMENT_CACHE_TTL seconds
+ENRICHMENT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'product_pages')
+ENRICHMENT_CACHE_TTL = 24 * 60 * 60
+# Product ids per UPDATE and users per summary rebuild query
+ENRICHMENT_BATCH_SIZE = 500
+
+# Orders per query of the streaming export, see delivery_tracker/exports.py
+ORDER_EXPORT_CHUNK_SIZE = 500
+# Audit rows per INSERT and users per summary rebuild query of
+# delivery_tracker/transitions.py
+ORDER_TRANSITION_BATCH_SIZE = 500
+# Received and cancelled orders move to the archive tables this many days
+# after their last status change, ORDER_ARCHIVE_BATCH_SIZE orders per
+# transaction (archive_orders command, delivery_tracker/archive.py)
+ORDER_ARCHIVE_AFTER_DAYS = 180
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+ORDERS_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 20
+
+# seconds the cabinet menu fragment and the per-user counters stay cached,
+# the counters are invalidated earlier through delivery_tracker.caching
+CABINET_CACHE_TIMEOUT = 60 * 60
+
+# Registration links older than this are rejected and purged together with
+# the users that never followed them (purge_registration_links command)
+REGISTRATION_LINK_TTL_DAYS = 7
+REGISTRATION_PURGE_BATCH_SIZE = 500
+
+# Where sessions live, one of SESSION_ENGINES. 'cached_db' reads sessions
+# from the cache and only writes django_session on changes, but needs a
+# cache shared by all processes (see CACHES); 'signed_cookies' keeps them in
+# the client (no server side logout of other devices) and 'cache' drops
+# them with the cache. SESSION_ENGINE is derived from it after
+# local_settings are applied, unless they set SESSION_ENGINE themselves.
+SESSION_STRATEGY = 'db'
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+# Expired rows deleted per transaction by the purge_sessions command
+SESSION_PURGE_BATCH_SIZE = 1000
+
+# Process local stand-in for development; use memcached or redis when
+# running several processes, otherwise the 'cache' sessions, the throttling
+# counters and the version stamps behind the API's ETags are not shared
+# between them. The delivery_tracker.E001 check rejects a process local
+# cache outside of DEBUG.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eurodelivery',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# seconds between checks of the shared version of delivery_tracker.statuses
+ORDER_STATUS_REGISTRY_CHECK_INTERVAL = 5
+
+# Failed logins allowed per LOGIN_THROTTLE_WINDOW seconds before
+# delivery_tracker.throttling rejects attempts without checking passwords
+LOGIN_THROTTLE_ENABLED = True
+LOGIN_THROTTLE_WINDOW = 5 * 60
+LOGIN_THROTTLE_IP_LIMIT = 50
+LOGIN_THROTTLE_USERNAME_LIMIT = 10
+
+# Request timings, see delivery_tracker/middleware.py
+PERF_INSTRUMENTATION = False
+PERF_LOG_FILE = os.path.join(BASE_DIR, 'perf.log')
+# url name -> max number of queries before a warning is logged
+PERF_QUERY_BUDGETS = {
+    'cabinet': 4,
+    'cabinet_orders': 4,
+    'cabinet_personal_data': 6,
+}
+PERF_DEFAULT_QUERY_BUDGET = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'perf_file': {
+            'class': 'logging.FileHandler',
+            'filename': PERF_LOG_FILE,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'delivery_tracker.perf': {
+            'handlers': ['perf_file'],
+            'level': 'INFO',
+        },
+    },
+}
+
 try:
     from local_settings import *
 except ImportError:
     pass
+
+if 'SESSION_ENGINE' not in globals():
+    SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
+
+# Outside of DEBUG compile every template once per process. Django 1.9 does
+# not enable the cached loader by itself, and loaders can not be combined
+# with APP_DIRS.
+if not DEBUG and 'loaders' not in TEMPLATES[0]['OPTIONS']:
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+if 'loaders' in TEMPLATES[0]['OPTIONS']:
+    TEMPLATES[0].pop('APP_DIRS', None)
+
+# Content hashed and precompressed static files, see
+# delivery_tracker/storage.py. The hashed names only exist after
+# collectstatic, so development keeps the plain storage.
+if not DEBUG:
+    STATICFILES_STORAGE = (
+        'delivery_tracker.storage.CompressedManifestStaticFilesStorage')
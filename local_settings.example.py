@@ -8,3 +8,27 @@ EMAIL_PORT = 587
 EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''
 
+
+# SQLite connection tuning, see SQLITE_PRAGMAS in eurodelivery/settings.py
+# SQLITE_PRAGMAS = [
+#     ('busy_timeout', 10000),
+#     ('journal_mode', 'WAL'),
+#     ('synchronous', 'NORMAL'),
+# ]
+
+# Read replica, see delivery_tracker/routers.py. With SQLite a copy of
+# db.sqlite3 can stand in for it locally.
+# DATABASES = {
+#     'default': {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': 'db.sqlite3',
+#         'CONN_MAX_AGE': 60,
+#     },
+#     'replica': {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': 'replica.sqlite3',
+#         'CONN_MAX_AGE': 60,
+#         'TEST': {'MIRROR': 'default'},
+#     },
+# }
+# REPLICA_DATABASE = 'replica'